@@ -0,0 +1,22 @@
+"""
+Hatch build hook compiling c8y-oas.yml into the OpenAPI operation index of
+the package (see scripts/compile_oas.py).
+"""
+
+import os
+import runpy
+
+from hatchling.builders.hooks.plugin.interface import BuildHookInterface
+
+INDEX = "src/mcp_server_c8y/oas_index.pickle"
+
+
+class CustomBuildHook(BuildHookInterface):
+    def initialize(self, version, build_data):
+        compile_oas = runpy.run_path(
+            os.path.join(self.root, "scripts", "compile_oas.py")
+        )
+        compile_oas["compile_file"](
+            os.path.join(self.root, "c8y-oas.yml"), os.path.join(self.root, INDEX)
+        )
+        build_data["artifacts"].append(INDEX)
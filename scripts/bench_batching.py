@@ -0,0 +1,116 @@
+"""
+Compare the upstream round trips of concurrent single managed object
+lookups fetched one GET each and coalesced by the inventory batch loader,
+against a local stand-in for the inventory API with added latency.
+
+    python scripts/bench_batching.py [lookups] [latency_ms]
+"""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+LATENCY = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.05
+requests_total = 0
+
+
+class InventoryStandIn(BaseHTTPRequestHandler):
+    """Answers single and ids= managed object queries after LATENCY seconds."""
+
+    def do_GET(self):
+        global requests_total
+        requests_total += 1
+        time.sleep(LATENCY)
+        url = urlsplit(self.path)
+        if url.path.startswith("/inventory/managedObjects/"):
+            object_id = url.path.rsplit("/", 1)[1]
+            body = {"id": object_id, "name": f"Device {object_id}"}
+        else:
+            ids = parse_qs(url.query).get("ids", [""])[0].split(",")
+            body = {
+                "managedObjects": [
+                    {"id": object_id, "name": f"Device {object_id}"}
+                    for object_id in ids
+                ]
+            }
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+stand_in = ThreadingHTTPServer(("127.0.0.1", 0), InventoryStandIn)
+threading.Thread(target=stand_in.serve_forever, daemon=True).start()
+
+# The server module reads its configuration when imported
+os.environ.update(
+    C8Y_BASEURL=f"http://127.0.0.1:{stand_in.server_port}",
+    C8Y_TENANT="t0",
+    C8Y_USER="bench",
+    C8Y_PASSWORD="bench",
+    MCP_HEDGE_PERCENTILE="0",
+)
+
+from mcp_server_c8y import settings  # noqa: E402
+
+settings.init()
+settings.selected_transport = "stdio"
+
+from mcp_server_c8y import cache, server  # noqa: E402
+
+
+async def get_one(object_id):
+    c8y = server.get_c8y()
+    return await asyncio.to_thread(
+        c8y.get,
+        f"/inventory/managedObjects/{object_id}",
+        params={"withChildren": "false"},
+    )
+
+
+async def run(label, lookup, object_ids, ticks=1):
+    global requests_total
+    cache._caches.clear()
+    requests_total = 0
+
+    async def one(n, object_id):
+        # Spread the lookups over several event loop iterations
+        await asyncio.sleep(0.01 * (n % ticks))
+        return await lookup(object_id)
+
+    start = time.monotonic()
+    await asyncio.gather(*(one(n, i) for n, i in enumerate(object_ids)))
+    print(
+        f"{label:<34}{len(object_ids):>8}{requests_total:>10}"
+        f"{time.monotonic() - start:>9.2f}s"
+    )
+
+
+async def main():
+    lookups = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    object_ids = [str(1000 + i) for i in range(lookups)]
+    print(f"{lookups} concurrent lookups, {LATENCY * 1000:.0f} ms upstream latency")
+    print(f"{'':<34}{'lookups':>8}{'requests':>10}{'time':>10}")
+    await run("one GET per object", get_one, object_ids)
+    await run("batch loader", server.get_managed_object, object_ids)
+    await run("batch loader, every ID twice", server.get_managed_object, object_ids * 2)
+    await run(
+        "batch loader, 5 ticks 10 ms apart",
+        server.get_managed_object,
+        object_ids,
+        ticks=5,
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
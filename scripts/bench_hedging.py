@@ -0,0 +1,93 @@
+"""
+Compare the latency percentiles of GET requests with and without hedging,
+against a local stand-in which answers a few requests much more slowly
+than the others.
+
+    python scripts/bench_hedging.py [requests] [slow_percent]
+"""
+
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REQUESTS = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+SLOW_SHARE = float(sys.argv[2]) / 100 if len(sys.argv) > 2 else 0.03
+FAST = 0.01
+SLOW = 0.5
+latencies = random.Random(1)
+
+
+class SlowResponder(BaseHTTPRequestHandler):
+    """Answers after FAST seconds, or SLOW seconds for SLOW_SHARE of the requests."""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        time.sleep(SLOW if latencies.random() < SLOW_SHARE else FAST)
+        data = b'{"alarms": []}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+stand_in = ThreadingHTTPServer(("127.0.0.1", 0), SlowResponder)
+stand_in.daemon_threads = True
+threading.Thread(target=stand_in.serve_forever, daemon=True).start()
+
+# The server modules read their configuration when imported
+os.environ.update(C8Y_BASEURL="http://127.0.0.1:1", C8Y_TENANT="t0")
+
+import requests  # noqa: E402
+
+from mcp_server_c8y import governor, resilience, settings  # noqa: E402
+
+
+def percentile(samples, percent):
+    return sorted(samples)[min(int(len(samples) * percent / 100), len(samples) - 1)]
+
+
+def run(label, hedge_percentile):
+    settings.init()
+    settings.hedge_percentile = hedge_percentile
+    governor._governors.clear()
+    governor._adapters.clear()
+    resilience._latencies.clear()
+    session = requests.Session()
+    governor.install(session, "t0")
+    url = f"http://127.0.0.1:{stand_in.server_port}/alarm/alarms"
+
+    samples = []
+    for _ in range(REQUESTS):
+        start = time.monotonic()
+        session.get(url).raise_for_status()
+        samples.append(time.monotonic() - start)
+    session.close()
+    hedged = governor.get_governor("t0").hedged_total
+    print(
+        f"{label:<12}"
+        + "".join(f"{percentile(samples, p) * 1000:>9.0f}ms" for p in (50, 95, 99, 100))
+        + f"{hedged:>9}"
+    )
+
+
+def main():
+    print(
+        f"{REQUESTS} requests, {SLOW_SHARE:.0%} answered after {SLOW * 1000:.0f} ms "
+        f"instead of {FAST * 1000:.0f} ms"
+    )
+    print(f"{'':<12}{'p50':>11}{'p95':>11}{'p99':>11}{'max':>11}{'hedged':>9}")
+    run("no hedging", 0)
+    run("hedging", 95)
+
+
+if __name__ == "__main__":
+    main()
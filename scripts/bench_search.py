@@ -0,0 +1,76 @@
+"""
+Build the device search index for a generated fleet and compare its
+estimated size (used for MCP_SEARCH_MAX_BYTES) with the memory it actually
+allocates, then measure the search latency.
+
+    python scripts/bench_search.py [devices]
+"""
+
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+# The server modules read their configuration when imported
+os.environ.setdefault("C8Y_BASEURL", "http://127.0.0.1:1")
+os.environ.setdefault("C8Y_TENANT", "t0")
+
+from mcp_server_c8y import search  # noqa: E402
+
+KINDS = ["Pump", "Valve", "Compressor", "Boiler", "Sensor", "Meter", "Gateway"]
+SITES = ["Berlin", "Hamburg", "Lyon", "Porto", "Austin", "Osaka", "Perth"]
+
+
+def fleet(count):
+    rng = random.Random(1)
+    for number in range(count):
+        kind = rng.choice(KINDS)
+        yield (
+            str(100000 + number),
+            f"{kind}-{rng.choice(SITES)}-{number:05}",
+            f"c8y_{kind}",
+            f"SN{rng.randrange(16**8):08X}",
+            "2026-01-01T00:00:00.000Z",
+        )
+
+
+def build(devices):
+    index = search.DeviceIndex(0)
+    # In pages, like the index is loaded
+    for offset in range(0, len(devices), 2000):
+        index.add(devices[offset : offset + 2000])
+    return index
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    devices = list(fleet(count))
+
+    start = time.monotonic()
+    build(devices)
+    elapsed = time.monotonic() - start
+
+    # Built again, as tracing the allocations slows indexing down
+    tracemalloc.start()
+    index = build(devices)
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    print(f"{count} devices indexed in {elapsed:.1f}s")
+    print(f"estimated size  {index.size / 2**20:8.1f} MB")
+    print(f"allocated       {allocated / 2**20:8.1f} MB")
+    print(f"bytes per device{allocated / count:8.0f}")
+
+    queries = ["pmp berlin 4711", "Valve-Osaka", "sn1a2b", "compresor", "gateway 99"]
+    start = time.monotonic()
+    rounds = 20
+    for _ in range(rounds):
+        for query in queries:
+            index.search(query)
+    per_search = (time.monotonic() - start) / (rounds * len(queries))
+    print(f"search          {per_search * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Compare the size of the list tool output in the 'tsv' and 'compact' table
+formats on generated pages resembling real tenants (a few device types and
+owners, repeated alarm texts, measurements with units).
+
+    python scripts/bench_tablefmt.py [rows]
+
+Token counts use tiktoken (cl100k_base) if it is available, otherwise the
+pieces of the cl100k pre-tokenizer (words, groups of up to three digits,
+punctuation and whitespace runs), which slightly undercounts long words.
+"""
+
+import os
+import random
+import re
+import sys
+
+# The formatters are imported through the package, which expects these
+os.environ.setdefault("C8Y_BASEURL", "http://localhost")
+os.environ.setdefault("C8Y_TENANT", "t0")
+
+from mcp_server_c8y.formatters import (  # noqa: E402
+    AlarmFormatter,
+    DeviceFormatter,
+    EventFormatter,
+    MeasurementFormatter,
+)
+from mcp_server_c8y.records import (  # noqa: E402
+    AlarmRecord,
+    DeviceRecord,
+    EventRecord,
+    MeasurementRecord,
+)
+
+try:
+    import tiktoken
+
+    _encoding = tiktoken.get_encoding("cl100k_base")
+
+    def count_tokens(text):
+        return len(_encoding.encode(text))
+
+    TOKENIZER = "cl100k_base"
+except Exception:  # not installed, or the encoding cannot be downloaded
+    _piece = re.compile(
+        r"(?:[^\r\n\w]|_)?[^\W\d_]+|\d{1,3}| ?(?:[^\s\w]|_)+[\r\n]*"
+        r"|\s*[\r\n]+|\s+(?!\S)|\s+"
+    )
+
+    def count_tokens(text):
+        return len(_piece.findall(text))
+
+    TOKENIZER = "approximate (cl100k pre-tokenizer pieces)"
+
+
+def timestamp(i):
+    return f"2025-03-{1 + i // 1440 % 28:02d}T{i // 60 % 24:02d}:{i % 60:02d}:00.000Z"
+
+
+def devices(n, rng):
+    types = ["c8y_Linux", "c8y_SmartPump", "thin-edge.io", "c8y_EnergyMeter"]
+    for i in range(n):
+        alarms = rng.choices([0, 0, 0, 1, 2], k=4)
+        yield DeviceRecord.from_json(
+            {
+                "id": str(8000 + i * 17),
+                "name": f"Plant-{i // 50:02d}-Device-{i:04d}",
+                "type": rng.choice(types),
+                "owner": rng.choice(["device_plant01", "device_plant02", "service_x"]),
+                "c8y_Availability": {
+                    "status": rng.choice(["AVAILABLE"] * 8 + ["UNAVAILABLE"])
+                },
+                "c8y_ActiveAlarmsStatus": dict(
+                    zip(("critical", "major", "minor", "warning"), alarms)
+                ),
+            }
+        )
+
+
+def alarms(n, rng):
+    kinds = [
+        ("c8y_TemperatureAlarm", "MAJOR", "Temperature above threshold"),
+        ("c8y_UnavailabilityAlarm", "CRITICAL", "No data received from device"),
+        ("c8y_PressureAlarm", "MINOR", "Pressure below minimum"),
+        ("c8y_BatteryAlarm", "WARNING", "Battery level low"),
+    ]
+    for i in range(n):
+        type, severity, text = rng.choice(kinds)
+        yield AlarmRecord.from_json(
+            {
+                "id": str(1200000 + i),
+                "source": {"id": str(8000 + rng.randrange(40) * 17)},
+                "type": type,
+                "severity": severity,
+                "status": rng.choice(["ACTIVE"] * 4 + ["ACKNOWLEDGED"]),
+                "time": timestamp(i * 7),
+                "count": rng.choice([1, 1, 1, 2, 5]),
+                "text": text,
+            }
+        )
+
+
+def events(n, rng):
+    kinds = [
+        ("c8y_LocationUpdate", "Location updated"),
+        ("c8y_ConnectionEvent", "Device connected"),
+        ("c8y_DoorOpened", "Door opened"),
+    ]
+    source = str(8000 + rng.randrange(40) * 17)
+    for i in range(n):
+        type, text = rng.choice(kinds)
+        yield EventRecord.from_json(
+            {
+                "id": str(3400000 + i),
+                "source": {"id": source},
+                "type": type,
+                "time": timestamp(i * 3),
+                "creationTime": timestamp(i * 3 + 1),
+                "text": text,
+            }
+        )
+
+
+def measurements(n, rng):
+    source = str(8000 + rng.randrange(40) * 17)
+    for i in range(n):
+        yield MeasurementRecord.from_json(
+            {
+                "id": str(5600000 + i),
+                "source": {"id": source},
+                "type": "c8y_Environment",
+                "time": timestamp(i),
+                "c8y_Temperature": {
+                    "T": {"value": round(rng.uniform(18, 26), 1), "unit": "C"}
+                },
+                "c8y_Pressure": {
+                    "P": {"value": round(rng.uniform(0.9, 1.1), 3), "unit": "bar"}
+                },
+                "c8y_Humidity": {
+                    "H": {"value": round(rng.uniform(30, 60), 1), "unit": "%RH"}
+                },
+            }
+        )
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    rng = random.Random(42)
+    tables = [
+        ("devices", DeviceFormatter().devices_to_table, devices),
+        ("alarms", AlarmFormatter().alarms_to_table, alarms),
+        ("events", EventFormatter().events_to_table, events),
+        (
+            "measurements",
+            MeasurementFormatter().measurements_to_table,
+            measurements,
+        ),
+    ]
+    print(f"{rows} rows per page, tokens: {TOKENIZER}")
+    print(
+        f"{'table':<14}{'tsv bytes':>10}{'compact':>10}{'saved':>7}"
+        f"{'tsv tokens':>12}{'compact':>10}{'saved':>7}"
+    )
+    for name, to_table, generate in tables:
+        items = list(generate(rows, rng))
+        tsv = to_table(items, "tsv")
+        compact = to_table(items, "compact")
+        tsv_bytes, compact_bytes = len(tsv.encode()), len(compact.encode())
+        tsv_tokens, compact_tokens = count_tokens(tsv), count_tokens(compact)
+        print(
+            f"{name:<14}{tsv_bytes:>10}{compact_bytes:>10}"
+            f"{1 - compact_bytes / tsv_bytes:>7.0%}"
+            f"{tsv_tokens:>12}{compact_tokens:>10}"
+            f"{1 - compact_tokens / tsv_tokens:>7.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
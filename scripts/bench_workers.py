@@ -0,0 +1,183 @@
+"""
+Measure the throughput of the streamable HTTP transport with one worker
+process and with several (--workers), against a local stand-in for the
+inventory API. Every call lists a page of devices with get_assets, which
+mostly costs CPU time for decoding and rendering the page.
+
+    python scripts/bench_workers.py [workers] [clients] [seconds] [page_size]
+
+workers defaults to the number of CPU cores. The clients are spread over
+several driver processes, so the load generator does not limit the
+result. On a single core both runs reach about the same throughput.
+"""
+
+import asyncio
+import base64
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve_inventory(port: int, page_size: int) -> None:
+    """Answer every request with the same pre-encoded page of devices."""
+    body = json.dumps(
+        {
+            "managedObjects": [
+                {
+                    "id": str(1000 + i),
+                    "name": f"Plant-{i // 50:02d}-Device-{i:04d}",
+                    "type": "c8y_SmartPump" if i % 2 else "c8y_Linux",
+                    "owner": "device_plant01",
+                    "lastUpdated": "2025-03-01T12:00:00.000Z",
+                    "c8y_IsDevice": {},
+                    "c8y_Availability": {"status": "AVAILABLE"},
+                    "c8y_ActiveAlarmsStatus": {"major": i % 3},
+                    "c8y_Hardware": {"serialNumber": f"SN{i:06d}"},
+                }
+                for i in range(page_size)
+            ],
+            "statistics": {"pageSize": page_size, "currentPage": 1},
+        }
+    ).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    ThreadingHTTPServer(("127.0.0.1", port), Handler).serve_forever()
+
+
+def start_server(port: int, workers: int, inventory_port: int) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        C8Y_BASEURL=f"http://127.0.0.1:{inventory_port}",
+        C8Y_TENANT="t0",
+        C8Y_USER="bench",
+        C8Y_PASSWORD="bench",
+        MCP_WARMERS="",
+    )
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-c",
+            "from mcp_server_c8y import main; main()",
+            "--transport",
+            "streamable-http",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+        ],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1)
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("The server did not start within 60s")
+
+
+async def drive(url: str, clients: int, seconds: float, page_size: int) -> int:
+    """Call get_assets from several sessions until the time is up."""
+    from fastmcp import Client
+    from fastmcp.client.transports import StreamableHttpTransport
+
+    authorization = "Basic " + base64.b64encode(b"t0/bench:bench").decode()
+    end = time.monotonic() + seconds
+
+    async def client() -> int:
+        calls = 0
+        transport = StreamableHttpTransport(
+            url, headers={"Authorization": authorization}
+        )
+        async with Client(transport) as session:
+            while time.monotonic() < end:
+                await session.call_tool("get_assets", {"page_size": page_size})
+                calls += 1
+        return calls
+
+    return sum(await asyncio.gather(*(client() for _ in range(clients))))
+
+
+def run_driver(args) -> int:
+    return asyncio.run(drive(*args))
+
+
+def measure(workers, clients, seconds, page_size, inventory_port) -> float:
+    port = free_port()
+    server = start_server(port, workers, inventory_port)
+    try:
+        url = f"http://127.0.0.1:{port}/mcp/"
+        drivers = max(min(clients, os.cpu_count() or 1), 1)
+        shares = [clients // drivers + (i < clients % drivers) for i in range(drivers)]
+        # Warm up the connections and caches of all workers
+        with multiprocessing.Pool(drivers) as pool:
+            pool.map(run_driver, [(url, share, 2.0, page_size) for share in shares])
+            start = time.monotonic()
+            calls = sum(
+                pool.map(
+                    run_driver, [(url, share, seconds, page_size) for share in shares]
+                )
+            )
+        return calls / (time.monotonic() - start)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count() or 1
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 4 * max(workers, 2)
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 10.0
+    page_size = int(sys.argv[4]) if len(sys.argv) > 4 else 200
+
+    inventory_port = free_port()
+    inventory = multiprocessing.Process(
+        target=serve_inventory, args=(inventory_port, page_size), daemon=True
+    )
+    inventory.start()
+
+    print(
+        f"{os.cpu_count()} cores, {clients} clients, {seconds:.0f}s per run, "
+        f"get_assets with {page_size} devices per call"
+    )
+    print(f"{'workers':>8}{'calls/s':>10}{'speedup':>9}")
+    baseline = None
+    for count in sorted({1, workers}):
+        rate = measure(count, clients, seconds, page_size, inventory_port)
+        baseline = baseline or rate
+        print(f"{count:>8}{rate:>10.1f}{rate / baseline:>8.2f}x")
+    inventory.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Compile the Cumulocity OpenAPI specification (c8y-oas.yml) into the
+operation index loaded by the server (src/mcp_server_c8y/oas_index.pickle).
+
+The index only contains what the generic API tools need: method, path,
+summary, tags, parameters and a summary of the response schema of each
+operation, keyed by operation ID. It is built by the hatch build hook
+(hatch_build.py) and can be rebuilt manually with:
+
+    python scripts/compile_oas.py [c8y-oas.yml] [src/mcp_server_c8y/oas_index.pickle]
+
+Requires PyYAML (build time only).
+"""
+
+import hashlib
+import os
+import pickle
+import re
+import sys
+
+# Must match INDEX_FORMAT in src/mcp_server_c8y/openapi.py
+INDEX_FORMAT = 1
+
+METHODS = ("get", "post", "put", "patch", "delete")
+
+# Maximum length of the parameter descriptions kept in the index
+DESCRIPTION_LENGTH = 200
+
+
+def _resolve(spec, node):
+    """Follow local $ref pointers ('#/components/...')."""
+    while isinstance(node, dict) and "$ref" in node:
+        target = spec
+        for part in node["$ref"].lstrip("#/").split("/"):
+            target = target[part]
+        node = target
+    return node
+
+
+def _short_description(text):
+    text = re.sub(r"<[^>]+>|&#\d+;|[*`>]", "", text or "")
+    text = " ".join(text.split())
+    if len(text) > DESCRIPTION_LENGTH:
+        text = text[: DESCRIPTION_LENGTH - 3].rstrip() + "..."
+    return text
+
+
+def _type_name(spec, schema):
+    schema = _resolve(spec, schema) or {}
+    if "enum" in schema:
+        return f"{schema.get('type', 'string')} ({'|'.join(map(str, schema['enum']))})"
+    if schema.get("type") == "array":
+        items = schema.get("items") or {}
+        name = items["$ref"].rsplit("/", 1)[-1] if "$ref" in items else None
+        return f"array<{name or _type_name(spec, items)}>"
+    return schema.get("type", "object")
+
+
+def _properties(spec, schema):
+    """Top-level properties of a schema, merging allOf parts."""
+    schema = _resolve(spec, schema) or {}
+    properties = dict(schema.get("properties") or {})
+    for part in schema.get("allOf") or []:
+        properties.update(_properties(spec, part))
+    return properties
+
+
+def _response(spec, operation):
+    response = None
+    for status in ("200", "201", "2XX"):
+        if status in operation.get("responses", {}):
+            response = _resolve(spec, operation["responses"][status])
+            break
+    if not response or not response.get("content"):
+        return ()
+    schema = next(iter(response["content"].values())).get("schema")
+    if schema is None:
+        return ()
+    properties = _properties(spec, schema)
+    return tuple(
+        (name, _type_name(spec, prop)) for name, prop in sorted(properties.items())
+    )
+
+
+def _parameters(spec, path_item, operation):
+    parameters = {}
+    for parameter in (path_item.get("parameters") or []) + (
+        operation.get("parameters") or []
+    ):
+        parameter = _resolve(spec, parameter)
+        if parameter.get("in") not in ("path", "query"):
+            continue
+        parameters[(parameter["name"], parameter["in"])] = (
+            parameter["name"],
+            parameter["in"],
+            bool(parameter.get("required") or parameter["in"] == "path"),
+            _type_name(spec, parameter.get("schema") or {}),
+            _short_description(parameter.get("description")),
+        )
+    return tuple(parameters.values())
+
+
+def compile_spec(spec):
+    """Build the index of all operations of a parsed specification."""
+    operations = {}
+    for path, path_item in spec["paths"].items():
+        for method in METHODS:
+            operation = path_item.get(method)
+            if operation is None:
+                continue
+            operation_id = operation.get("operationId") or f"{method} {path}"
+            operations[operation_id] = (
+                method,
+                path,
+                operation.get("summary", ""),
+                tuple(operation.get("tags") or ()),
+                _parameters(spec, path_item, operation),
+                _response(spec, operation),
+            )
+    return operations
+
+
+def compile_file(source, target):
+    """Compile source (YAML) into target, unless target is up to date."""
+    import yaml
+
+    with open(source, "rb") as f:
+        content = f.read()
+    digest = hashlib.sha256(content).hexdigest()
+    try:
+        with open(target, "rb") as f:
+            existing = pickle.load(f)
+        if existing.get("format") == INDEX_FORMAT and existing.get("sha256") == digest:
+            return
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        pass
+
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    spec = yaml.load(content, Loader=loader)
+    index = {
+        "format": INDEX_FORMAT,
+        "sha256": digest,
+        "operations": compile_spec(spec),
+    }
+    tmp_path = target + ".tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, target)
+    print(f"Compiled {len(index['operations'])} operations from {source} to {target}")
+
+
+if __name__ == "__main__":
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    source = sys.argv[1] if len(sys.argv) > 1 else os.path.join(root, "c8y-oas.yml")
+    target = (
+        sys.argv[2]
+        if len(sys.argv) > 2
+        else os.path.join(root, "src", "mcp_server_c8y", "oas_index.pickle")
+    )
+    compile_file(source, target)
@@ -7,13 +7,12 @@ import logging
 
 import click
 import uvicorn
-from starlette.applications import Starlette
-from starlette.responses import JSONResponse
-from starlette.routing import BaseRoute, Mount, Route
 
 from . import settings
+from .app import background_services, create_app
 from .logging_setup import setup_logging
-from .server import mcp
+from .server import mcp, remove_blacklisted_tools
+from .workers import run_workers
 
 logger = logging.getLogger("mcp_server_c8y")
 
@@ -37,7 +36,15 @@ logger = logging.getLogger("mcp_server_c8y")
     default="",
     help="Root path to mount the application (for reverse proxies)",
 )
-def main(verbose: int, host: str, port: int, transport: str, root_path: str) -> None:
+@click.option(
+    "--workers",
+    default=1,
+    show_default=True,
+    help="Number of worker processes serving the HTTP transports",
+)
+def main(
+    verbose: int, host: str, port: int, transport: str, root_path: str, workers: int
+) -> None:
     """MCP Cumulocity Server - Cumulocity functionality for MCP"""
 
     setup_logging(verbose)
@@ -45,36 +52,19 @@ def main(verbose: int, host: str, port: int, transport: str, root_path: str) ->
 
     settings.init()
     settings.selected_transport = transport
+    remove_blacklisted_tools()
 
     if transport == "stdio":
-        asyncio.run(mcp.run_async(transport=transport))
-    else:
 
-        def health(request):
-            return JSONResponse({"status": "up"})
-
-        routes: list[BaseRoute] = [Route("/health", health)]
-        lifespan = None
-        if transport == "sse":
-            appSSE = mcp.sse_app(path="/")
-            routes.insert(0, Mount("/sse", app=appSSE))
-            lifespan = appSSE.lifespan
-        elif transport == "streamable-http":
-            appHttp = mcp.streamable_http_app(path="/")
-            routes.insert(0, Mount("/mcp", app=appHttp))
-            lifespan = appHttp.lifespan
-        elif transport == "hybrid":
-            appHttp = mcp.streamable_http_app(path="/")
-            appSSE = mcp.sse_app(path="/")
-            routes.insert(0, Mount("/mcp", app=appHttp))
-            routes.insert(1, Mount("/sse", app=appSSE))
-            lifespan = appHttp.lifespan
-
-        app = Starlette(
-            routes=routes,
-            lifespan=lifespan,
-        )
+        async def run_stdio():
+            async with background_services(warm_up=False):
+                await mcp.run_async(transport=transport)
 
+        asyncio.run(run_stdio())
+    elif workers > 1:
+        run_workers(transport, host, port, root_path, workers, verbose)
+    else:
+        app = create_app(transport)
         uvicorn.run(app, host=host, port=port, root_path=root_path)
 
 
@@ -0,0 +1,123 @@
+"""
+Starlette application for the HTTP based transports (sse, streamable-http, hybrid).
+"""
+
+import logging
+from contextlib import asynccontextmanager
+
+import httpx
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import BaseRoute, Mount, Route
+
+from . import (
+    batching,
+    deadlines,
+    governor,
+    operations,
+    realtime,
+    settings,
+    tenancy,
+    warmup,
+)
+from .server import C8Y_BASEURL, C8Y_PASSWORD, C8Y_TENANT, C8Y_USER, mcp
+
+logger = logging.getLogger("mcp_server_c8y")
+
+
+def health(request):
+    return JSONResponse({"status": "up"})
+
+
+def ready(request):
+    """Readiness: up and done with the startup warmers (or out of time for them)."""
+    report = warmup.state.report()
+    return JSONResponse(report, status_code=200 if warmup.state.finished else 503)
+
+
+def metrics(request):
+    return PlainTextResponse(
+        governor.render_metrics()
+        + batching.render_metrics()
+        + tenancy.render_metrics()
+        + deadlines.render_metrics()
+        + operations.render_metrics()
+        + warmup.render_metrics(),
+        media_type="text/plain; version=0.0.4",
+    )
+
+
+@asynccontextmanager
+async def background_services(warm_up: bool = True):
+    """Run the optional background services for the lifetime of the server.
+
+    Args:
+        warm_up: Whether to start the cache warmers, which only pay off for
+            the long-running HTTP transports
+    """
+    subscriber = None
+    if settings.realtime_enabled:
+        if C8Y_USER and C8Y_PASSWORD:
+            auth = httpx.BasicAuth(f"{C8Y_TENANT}/{C8Y_USER}", C8Y_PASSWORD)
+            subscriber = realtime.start(C8Y_BASEURL, auth)
+        else:
+            logger.warning(
+                "Realtime notifications need C8Y_USER and C8Y_PASSWORD, not starting"
+            )
+    warmers = warmup.start() if warm_up else None
+    try:
+        yield
+    finally:
+        if warmers is not None:
+            warmers.cancel()
+        if subscriber is not None:
+            await subscriber.stop()
+
+
+def with_background_services(lifespan):
+    """Extend the lifespan of an MCP app with the background services."""
+
+    @asynccontextmanager
+    async def combined_lifespan(app):
+        async with lifespan(app), background_services():
+            yield
+
+    return combined_lifespan
+
+
+def create_app(transport: str, sse_message_path: str = "/messages/") -> Starlette:
+    """Create the Starlette application serving the MCP server.
+
+    Args:
+        transport: One of 'sse', 'streamable-http' or 'hybrid'
+        sse_message_path: Path (below /sse) the SSE clients post their messages to.
+            Worker processes use a per-worker path to keep session affinity.
+
+    Returns:
+        Starlette application including the health, readiness and metrics endpoints
+    """
+    routes: list[BaseRoute] = [
+        Route("/health", health),
+        Route("/ready", ready),
+        Route("/metrics", metrics),
+    ]
+    lifespan = None
+    if transport == "sse":
+        appSSE = mcp.sse_app(path="/", message_path=sse_message_path)
+        routes.insert(0, Mount("/sse", app=appSSE))
+        lifespan = appSSE.lifespan
+    elif transport == "streamable-http":
+        appHttp = mcp.streamable_http_app(path="/")
+        routes.insert(0, Mount("/mcp", app=appHttp))
+        lifespan = appHttp.lifespan
+    elif transport == "hybrid":
+        appHttp = mcp.streamable_http_app(path="/")
+        appSSE = mcp.sse_app(path="/", message_path=sse_message_path)
+        routes.insert(0, Mount("/mcp", app=appHttp))
+        routes.insert(1, Mount("/sse", app=appSSE))
+        lifespan = appHttp.lifespan
+
+    return Starlette(
+        routes=routes,
+        lifespan=with_background_services(lifespan),
+    )
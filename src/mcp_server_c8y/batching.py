@@ -0,0 +1,131 @@
+"""
+Coalescing of individual lookups into batched requests.
+
+A ``BatchLoader`` collects the keys requested with ``load`` during one
+iteration of the event loop, from any tool call or session, and resolves
+them with a single call of its batch function (e.g. one ``ids=`` query for
+up to 200 managed objects). Keys requested several times in the same
+iteration are fetched once. Keys of different scopes (e.g. credentials)
+are never mixed in a batch, as the batch function runs with the context,
+and thereby the credentials, of the first caller of its scope. The sizes of the batches are exported as
+Prometheus metrics, see ``render_metrics``.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from . import deadlines
+
+# Upper bounds of the batch size histogram buckets
+BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+
+def _retrieve(future: asyncio.Future) -> None:
+    # Avoid "exception was never retrieved" if all callers were cancelled
+    if not future.cancelled():
+        future.exception()
+
+
+class BatchLoader:
+    """Resolves keys requested in the same event loop iteration with one batch call."""
+
+    def __init__(
+        self,
+        name: str,
+        load_batch: Callable[[List[str]], Awaitable[Dict[str, Any]]],
+        max_batch: int = 200,
+        scope: Callable[[], str] = lambda: "",
+    ):
+        self.name = name
+        self.load_batch = load_batch
+        self.max_batch = max_batch
+        self.scope = scope
+        # Keys waiting for the next batch per scope
+        self._queues: Dict[str, Dict[str, asyncio.Future]] = {}
+        self.lookups_total = 0
+        self.batches_total = 0
+        self.keys_total = 0
+        self.bucket_counts = [0] * len(BUCKETS)
+        _loaders.append(self)
+
+    async def load(self, key: str) -> Optional[Any]:
+        """The value of a key, None if the batch function did not return it."""
+        self.lookups_total += 1
+        scope = self.scope()
+        queue = self._queues.get(scope)
+        loop = asyncio.get_running_loop()
+        if queue is None:
+            # The batch is loaded in the context of the first caller of the scope
+            queue = self._queues[scope] = {}
+            loop.call_soon(self._dispatch, scope)
+        future = queue.get(key)
+        if future is None:
+            future = queue[key] = loop.create_future()
+            future.add_done_callback(_retrieve)
+        # Shielded, as other callers may wait for the same key
+        return await asyncio.shield(future)
+
+    def _dispatch(self, scope: str) -> None:
+        queue = self._queues.pop(scope)
+        keys = list(queue)
+        for i in range(0, len(keys), self.max_batch):
+            batch = {key: queue[key] for key in keys[i : i + self.max_batch]}
+            asyncio.get_running_loop().create_task(self._run(batch))
+
+    async def _run(self, batch: Dict[str, asyncio.Future]) -> None:
+        # The batch is shared, so it must not stop with the call which started it
+        deadlines.current_scope.set(None)
+        self.batches_total += 1
+        self.keys_total += len(batch)
+        for index, bound in enumerate(BUCKETS):
+            if len(batch) <= bound:
+                self.bucket_counts[index] += 1
+        try:
+            results = await self.load_batch(list(batch))
+        except asyncio.CancelledError:
+            for future in batch.values():
+                future.cancel()
+            raise
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(results.get(key))
+
+
+_loaders: List[BatchLoader] = []
+
+
+def render_metrics() -> str:
+    """Render the batch metrics of all loaders in the Prometheus text format."""
+    lines = [
+        "# HELP mcp_batch_lookups_total Individual lookups requested from batch loaders",
+        "# TYPE mcp_batch_lookups_total counter",
+    ]
+    for loader in _loaders:
+        lines.append(
+            f'mcp_batch_lookups_total{{loader="{loader.name}"}} {loader.lookups_total}'
+        )
+    lines += [
+        "# HELP mcp_batch_size Distinct keys per batch request",
+        "# TYPE mcp_batch_size histogram",
+    ]
+    for loader in _loaders:
+        for bound, count in zip(BUCKETS, loader.bucket_counts):
+            lines.append(
+                f'mcp_batch_size_bucket{{loader="{loader.name}",le="{bound}"}} {count}'
+            )
+        lines.append(
+            f'mcp_batch_size_bucket{{loader="{loader.name}",le="+Inf"}} '
+            f"{loader.batches_total}"
+        )
+        lines.append(
+            f'mcp_batch_size_sum{{loader="{loader.name}"}} {loader.keys_total}'
+        )
+        lines.append(
+            f'mcp_batch_size_count{{loader="{loader.name}"}} {loader.batches_total}'
+        )
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,486 @@
+"""
+Caches for Cumulocity data used by the MCP tools.
+
+Three backends are available:
+
+- ``MemoryCache`` keeps entries in the current process.
+- ``FileCache`` keeps entries as small JSON files in a directory, so several
+  worker processes can share one warm copy of the data.
+- ``SqliteCache`` keeps entries in a SQLite database which survives restarts.
+
+Entries older than the TTL are not discarded right away. ``cached`` serves
+them for up to ``MCP_CACHE_MAX_STALE`` seconds while refreshing them in the
+background, so a restarted server answers from its persisted cache at once.
+``mark_stale`` turns all current entries of a cache into such stale entries,
+e.g. when changes may have been missed; only lookups passing ``stale=True``
+return them then.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from . import deadlines, settings
+from .resilience import UNAVAILABLE_ERRORS
+from .tenancy import scoped
+
+logger = logging.getLogger("mcp_server_c8y")
+
+
+class MemoryCache:
+    """In-process LRU cache with a time-to-live per entry."""
+
+    def __init__(self, ttl: float, maxsize: int = 2048):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._stale_before = 0.0
+
+    def get(
+        self, key: str, max_age: Optional[float] = None, stale: bool = False
+    ) -> Optional[Any]:
+        """Return the cached value or None if it is missing or older than max_age (default: ttl).
+
+        Entries marked stale are only returned if stale is set.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.time() - stored_at > (max_age or self.ttl):
+                return None
+            if not stale and stored_at <= self._stale_before:
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def mark_stale(self) -> None:
+        with self._lock:
+            self._stale_before = time.time()
+
+
+class FileCache:
+    """Cache storing one JSON file per entry in a directory.
+
+    Writes go to a temporary file which is atomically renamed, so concurrent
+    readers in other processes never see partial entries.
+    """
+
+    # Number of writes between two checks of the directory size
+    PRUNE_INTERVAL = 64
+
+    def __init__(self, directory: str, ttl: float, maxsize: int = 2048):
+        self.directory = directory
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._writes = 0
+        # Its modification time is the time of the last mark_stale
+        self._stale_marker = os.path.join(directory, "stale")
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def get(
+        self, key: str, max_age: Optional[float] = None, stale: bool = False
+    ) -> Optional[Any]:
+        """Return the cached value or None if it is missing or older than max_age (default: ttl).
+
+        Entries marked stale are only returned if stale is set.
+        """
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("key") != key:
+            return None
+        if time.time() - entry["stored_at"] > (max_age or self.ttl):
+            return None
+        if not stale:
+            try:
+                if entry["stored_at"] <= os.stat(self._stale_marker).st_mtime:
+                    return None
+            except OSError:
+                pass
+        return entry["value"]
+
+    def set(self, key: str, value: Any) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"key": key, "stored_at": time.time(), "value": value}, f)
+            os.replace(tmp_path, self._path(key))
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Could not write cache entry {key}: {str(e)}")
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return
+
+        self._writes += 1
+        if self._writes % self.PRUNE_INTERVAL == 0:
+            self._prune()
+
+    def delete(self, key: str) -> None:
+        try:
+            os.unlink(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self) -> None:
+        for name in os.listdir(self.directory):
+            try:
+                os.unlink(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def mark_stale(self) -> None:
+        now = time.time()
+        try:
+            with open(self._stale_marker, "w"):
+                pass
+            os.utime(self._stale_marker, (now, now))
+        except OSError as e:
+            logger.warning(f"Could not mark cache {self.directory} stale: {str(e)}")
+
+    def _prune(self) -> None:
+        """Remove the oldest entries once the directory exceeds maxsize."""
+        try:
+            entries = [
+                entry
+                for entry in os.scandir(self.directory)
+                if entry.is_file() and entry.name.endswith(".json")
+            ]
+        except OSError:
+            return
+        if len(entries) <= self.maxsize:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[: len(entries) - self.maxsize]:
+            try:
+                os.unlink(entry.path)
+            except OSError:
+                pass
+
+
+class SqliteCache:
+    """Persistent cache for one namespace in a SQLite database shared by all namespaces.
+
+    The database records its schema version; a database written by another
+    version is emptied on open. The total size of all entries is capped at
+    max_bytes by removing the oldest entries. The time of the last
+    mark_stale of each namespace is kept in the database as well, so entries
+    stay stale across restarts and for all workers.
+    """
+
+    SCHEMA_VERSION = 1
+
+    # Number of writes between two checks of the size caps
+    PRUNE_INTERVAL = 64
+
+    def __init__(
+        self,
+        path: str,
+        namespace: str,
+        ttl: float,
+        maxsize: int = 2048,
+        max_bytes: int = 64 * 1024 * 1024,
+    ):
+        self.path = path
+        self.directory = os.path.dirname(path)
+        self.namespace = namespace
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self._writes = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        self._db = sqlite3.connect(
+            path, timeout=10.0, isolation_level=None, check_same_thread=False
+        )
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+            )
+            row = self._db.execute(
+                "SELECT value FROM meta WHERE key = 'schema_version'"
+            ).fetchone()
+            if row is None or int(row[0]) != self.SCHEMA_VERSION:
+                if row is not None:
+                    logger.info(
+                        f"Discarding cache {path} written with schema version {row[0]}"
+                    )
+                self._db.execute("DROP TABLE IF EXISTS entries")
+                self._db.execute(
+                    "INSERT OR REPLACE INTO meta VALUES ('schema_version', ?)",
+                    (str(self.SCHEMA_VERSION),),
+                )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " namespace TEXT NOT NULL,"
+                " key TEXT NOT NULL,"
+                " stored_at REAL NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " value TEXT NOT NULL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS entries_stored_at ON entries (stored_at)"
+            )
+
+    def get(
+        self, key: str, max_age: Optional[float] = None, stale: bool = False
+    ) -> Optional[Any]:
+        """Return the cached value or None if it is missing or older than max_age (default: ttl).
+
+        Entries marked stale are only returned if stale is set.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT stored_at, value,"
+                " (SELECT value FROM meta WHERE key = ?)"
+                " FROM entries WHERE namespace = ? AND key = ?",
+                (f"stale_before:{self.namespace}", self.namespace, key),
+            ).fetchone()
+        if row is None or time.time() - row[0] > (max_age or self.ttl):
+            return None
+        if not stale and row[2] is not None and row[0] <= float(row[2]):
+            return None
+        return json.loads(row[1])
+
+    def set(self, key: str, value: Any) -> None:
+        try:
+            data = json.dumps(value)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Could not write cache entry {key}: {str(e)}")
+            return
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, time.time(), len(data), data),
+            )
+        self._writes += 1
+        if self._writes % self.PRUNE_INTERVAL == 0:
+            self._prune()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM entries WHERE namespace = ?", (self.namespace,)
+            )
+
+    def mark_stale(self) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                (f"stale_before:{self.namespace}", str(time.time())),
+            )
+
+    def _prune(self) -> None:
+        """Enforce the entry limit of the namespace and the size limit of the database."""
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM entries WHERE namespace = ? AND key NOT IN ("
+                " SELECT key FROM entries WHERE namespace = ?"
+                " ORDER BY stored_at DESC LIMIT ?)",
+                (self.namespace, self.namespace, self.maxsize),
+            )
+            total = self._db.execute("SELECT SUM(size) FROM entries").fetchone()[0]
+            if total is None or total <= self.max_bytes:
+                return
+            # Remove the oldest entries until the total size is below 90% of the cap
+            excess = total - int(self.max_bytes * 0.9)
+            removed = 0
+            rows = self._db.execute(
+                "SELECT namespace, key, size FROM entries ORDER BY stored_at"
+            ).fetchall()
+            for namespace, key, size in rows:
+                if removed >= excess:
+                    break
+                self._db.execute(
+                    "DELETE FROM entries WHERE namespace = ? AND key = ?",
+                    (namespace, key),
+                )
+                removed += size
+
+
+_caches: Dict[str, Any] = {}
+
+
+def default_cache_dir() -> str:
+    """Directory used by the file backend if MCP_CACHE_DIR is not set.
+
+    /dev/shm is preferred where available so that the shared cache lives in
+    memory rather than on disk.
+    """
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "mcp-server-c8y-cache")
+
+
+def get_cache(namespace: str):
+    """Get the cache for a namespace (e.g. 'inventory'), creating it on first use.
+
+    In multi-tenant mode every tenant has its own cache per namespace.
+    """
+    namespace = scoped(namespace)
+    cache = _caches.get(namespace)
+    if cache is None:
+        if settings.cache_backend == "sqlite":
+            directory = settings.cache_dir or os.path.join(
+                tempfile.gettempdir(), "mcp-server-c8y-cache"
+            )
+            cache = SqliteCache(
+                os.path.join(directory, "cache.sqlite3"),
+                namespace,
+                ttl=settings.cache_ttl,
+                maxsize=settings.cache_maxsize,
+                max_bytes=settings.cache_max_bytes,
+            )
+        elif settings.cache_backend == "file":
+            directory = settings.cache_dir or default_cache_dir()
+            cache = FileCache(
+                os.path.join(directory, namespace),
+                ttl=settings.cache_ttl,
+                maxsize=settings.cache_maxsize,
+            )
+        else:
+            cache = MemoryCache(ttl=settings.cache_ttl, maxsize=settings.cache_maxsize)
+        _caches[namespace] = cache
+    return cache
+
+
+# Keys currently refreshed in the background, to refresh each key only once
+_revalidating: Set[str] = set()
+
+
+def revalidate(key: str, refresh: Callable[[], Awaitable[Any]]) -> None:
+    """Run refresh in the background unless a refresh of key is already running."""
+    key = scoped(key)
+    if key in _revalidating:
+        return
+    _revalidating.add(key)
+
+    async def run():
+        # Not cancelled together with the tool call which started it
+        deadlines.current_scope.set(None)
+        try:
+            await refresh()
+        except Exception as e:
+            logger.info(f"Could not revalidate cache entry {key}: {str(e)}")
+        finally:
+            _revalidating.discard(key)
+
+    asyncio.get_running_loop().create_task(run())
+
+
+async def cached(
+    namespace: str,
+    key: str,
+    loader: Callable[[], Awaitable[Any]],
+    max_age: Optional[float] = None,
+) -> Any:
+    """Get a value from the cache, loading it on a miss.
+
+    Entries older than max_age (default: the cache TTL) but younger than
+    MCP_CACHE_MAX_STALE are returned as they are and refreshed in the background.
+    If the platform is unavailable, an entry of any age is returned instead of
+    failing.
+    """
+    cache = get_cache(namespace)
+    value = cache.get(key, max_age=max_age)
+    if value is not None:
+        return value
+
+    async def load():
+        value = await loader()
+        cache.set(key, value)
+        return value
+
+    if settings.cache_max_stale > 0:
+        value = cache.get(key, max_age=settings.cache_max_stale, stale=True)
+        if value is not None:
+            revalidate(f"{namespace}:{key}", load)
+            return value
+
+    try:
+        return await load()
+    except UNAVAILABLE_ERRORS as e:
+        value = cache.get(key, max_age=float("inf"), stale=True)
+        if value is None:
+            raise
+        logger.warning(f"Serving stale {namespace} entry {key}: {str(e)}")
+        return value
+
+
+def results_key(
+    namespace: str,
+    device_id: Optional[str],
+    include_children: bool,
+    params: Dict[str, Any],
+) -> str:
+    """Build the cache key of a tool result (e.g. an alarm table).
+
+    The key contains the generation of the queried scope, so invalidating a
+    scope makes all results computed before unreachable. Queries covering
+    several devices (platform wide or including children) use the global
+    scope, which is invalidated by every change.
+    """
+    generations = get_cache(f"{namespace}_generations")
+    # Generations never expire; a device generation which got evicted falls
+    # back to the global one, which is at least as recent
+    global_generation = generations.get("*", max_age=float("inf")) or 0
+    if device_id and not include_children:
+        scope = device_id
+        generation = generations.get(device_id, max_age=float("inf"))
+        if generation is None:
+            generation = global_generation
+    else:
+        scope = "*"
+        generation = global_generation
+    return f"{scope}:{generation}:{json.dumps(params, sort_keys=True)}"
+
+
+def invalidate_results(namespace: str, source_id: Optional[str]) -> None:
+    """Invalidate cached tool results affected by a change of a source device."""
+    generations = get_cache(f"{namespace}_generations")
+    # Timestamps instead of counters, so a generation never repeats
+    generation = time.time()
+    generations.set("*", generation)
+    if source_id:
+        generations.set(source_id, generation)
@@ -0,0 +1,133 @@
+"""
+Compact, dictionary-encoded rendering of tables (``tablefmt="compact"``).
+
+List tool results repeat the same strings on every row: device types,
+owners, severities, alarm texts, and the unit in every measurement cell.
+``compact_table`` renders the rows as unpadded tab-separated values and
+removes that repetition:
+
+- columns with the same value in all rows are hoisted into a
+  ``# Column: value`` line above the table, and empty columns are only
+  listed by name;
+- a unit shared by all cells of a column moves into its header, e.g.
+  ``c8y_Temperature->T [C]`` with plain numbers below;
+- text values repeated often enough to pay for a legend entry are replaced
+  by codes ``$1``, ``$2``, ... defined in ``# $1: value`` lines. Whether a
+  value pays off is estimated in tokens rather than bytes, so single words
+  like ``MAJOR`` stay as they are.
+
+Numbers are never encoded, so they can be read directly.
+"""
+
+import re
+from typing import Any, Dict, List, Sequence
+
+# A number followed by a unit, e.g. "23.4 C" or "-1e-3 kWh"
+_WITH_UNIT = re.compile(r"(-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?) (\S.*)")
+
+# Cells which would be mistaken for codes
+_CODE = re.compile(r"\$\d+")
+
+# Rough token boundaries of common LLM tokenizers: words, groups of up to
+# three digits and punctuation characters
+_TOKEN = re.compile(r"[^\W\d_]+|\d{1,3}|[^\w\s]|_")
+
+# Tokens of a code ('$', digits) and of the rest of its legend line
+CODE_TOKENS = 2
+LEGEND_TOKENS = 4
+
+
+def _cell(value: Any) -> str:
+    if value is None:
+        return ""
+    # Keep the row and column structure intact
+    return str(value).replace("\t", " ").replace("\n", " ")
+
+
+def _is_number(value: str) -> bool:
+    try:
+        float(value)
+    except ValueError:
+        return False
+    return True
+
+
+def _common_unit(values: List[str]) -> str:
+    """The unit of all non-empty values of a column ('' if there is none)."""
+    unit = ""
+    for value in values:
+        if not value:
+            continue
+        match = _WITH_UNIT.fullmatch(value)
+        if match is None or (unit and match.group(2) != unit):
+            return ""
+        unit = match.group(2)
+    return unit
+
+
+def compact_table(headers: Sequence[str], rows: Sequence[Sequence[Any]]) -> str:
+    """Render a table in the compact format described in the module docstring."""
+    rows = [[_cell(value) for value in row] for row in rows]
+    width = max((len(row) for row in rows), default=len(headers))
+    # Like tabulate, label the columns present in the rows
+    headers = list(headers)[:width]
+    headers += [""] * (width - len(headers))
+    columns = [[row[i] if i < len(row) else "" for row in rows] for i in range(width)]
+
+    lines: List[str] = []
+    empty: List[str] = []
+    kept: List[int] = []
+    for i, values in enumerate(columns):
+        if len(rows) > 1 and not any(values):
+            empty.append(headers[i])
+        elif len(rows) > 1 and all(value == values[0] for value in values):
+            lines.append(f"# {headers[i]}: {values[0]}")
+        else:
+            kept.append(i)
+    if empty:
+        lines.append(f"# Empty: {', '.join(empty)}")
+
+    for i in kept:
+        unit = _common_unit(columns[i])
+        if unit:
+            headers[i] = f"{headers[i]} [{unit}]"
+            columns[i] = [
+                value[: -len(unit) - 1] if value else "" for value in columns[i]
+            ]
+
+    # Count the text values of the columns which cannot contain codes
+    counts: Dict[str, int] = {}
+    encoded = set()
+    for i in kept:
+        if any(_CODE.fullmatch(value) for value in columns[i]):
+            continue
+        encoded.add(i)
+        for value in columns[i]:
+            if value and not _is_number(value):
+                counts[value] = counts.get(value, 0) + 1
+
+    # Encode a value if its occurrences shrink by more than its legend line adds
+    codes: Dict[str, str] = {}
+    for value, count in counts.items():
+        tokens = len(_TOKEN.findall(value))
+        if (tokens - CODE_TOKENS) * count > tokens + LEGEND_TOKENS:
+            code = f"${len(codes) + 1}"
+            codes[value] = code
+            lines.append(f"# {code}: {value}")
+
+    if not kept:
+        lines.append(f"# Rows: {len(rows)}")
+        return "\n".join(lines)
+    lines.append("\t".join(headers[i] for i in kept))
+    for r in range(len(rows)):
+        lines.append(
+            "\t".join(
+                (
+                    codes.get(columns[i][r], columns[i][r])
+                    if i in encoded
+                    else columns[i][r]
+                )
+                for i in kept
+            )
+        )
+    return "\n".join(lines)
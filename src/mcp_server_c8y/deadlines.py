@@ -0,0 +1,189 @@
+"""
+Deadlines and cancellation of tool calls.
+
+Every tool call runs in a ``CallScope`` with a deadline: MCP_TOOL_TIMEOUT,
+overridden per tool by MCP_TOOL_TIMEOUTS, and shortened by the client with
+a ``timeout`` (seconds) in the ``_meta`` of the request. The scope is a
+context variable, so it is also visible in the worker threads running the
+synchronous c8y_api calls.
+
+When the client cancels the request or disconnects, or the deadline
+passes, the scope is cancelled. Upstream requests not sent yet are then
+skipped, including those waiting for a governor slot, response bodies
+being read are closed, and pagination stops. Requests never wait longer
+than the remaining time of their call. The work avoided this way is
+counted in the metrics, see ``render_metrics``.
+"""
+
+import asyncio
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from fastmcp.exceptions import ToolError
+
+from . import settings
+
+
+class CallCancelled(Exception):
+    """Raised for upstream work of a tool call which was cancelled or timed out."""
+
+
+class CallScope:
+    """Deadline and cancellation state of a tool call."""
+
+    def __init__(self, tool: str, timeout: float):
+        self.tool = tool
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout if timeout > 0 else None
+        self.reason: Optional[str] = None
+
+    @property
+    def cancelled(self) -> bool:
+        if self.reason is None and self.deadline is not None:
+            if time.monotonic() >= self.deadline:
+                self.cancel("deadline")
+        return self.reason is not None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left until the deadline (None without deadline)."""
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0.0)
+
+    def cancel(self, reason: str) -> None:
+        if self.reason is None:
+            self.reason = reason
+            count("cancelled_calls", reason)
+            for callback in _cancel_callbacks:
+                callback()
+
+    def check(self, work: str = "skipped_requests") -> None:
+        """Raise CallCancelled (counting the avoided work) if the call was cancelled."""
+        if self.cancelled:
+            count(work)
+            raise CallCancelled(
+                f"{self.tool} was cancelled ({self.reason}), not continuing"
+            )
+
+
+current_scope: ContextVar[Optional[CallScope]] = ContextVar(
+    "current_scope", default=None
+)
+
+# Called when any scope is cancelled, e.g. to wake requests waiting for a slot
+_cancel_callbacks: List[Callable[[], None]] = []
+
+
+def on_cancel(callback: Callable[[], None]) -> None:
+    _cancel_callbacks.append(callback)
+
+
+def check() -> None:
+    """Raise CallCancelled if the current tool call was cancelled."""
+    scope = current_scope.get()
+    if scope is not None:
+        scope.check()
+
+
+def cap_timeout(timeout: Optional[float]) -> Optional[float]:
+    """A timeout capped at the time remaining for the current tool call."""
+    scope = current_scope.get()
+    remaining = scope.remaining() if scope is not None else None
+    if remaining is None:
+        return timeout
+    return remaining if timeout is None else min(timeout, remaining)
+
+
+def timeout_for(tool: str, requested: Optional[float] = None) -> float:
+    """Deadline of a tool call in seconds (0: none).
+
+    A timeout requested by the client may shorten, but not extend, the
+    configured one.
+    """
+    timeout = settings.tool_timeouts.get(tool, settings.tool_timeout)
+    if requested is not None and requested > 0:
+        timeout = min(timeout, requested) if timeout > 0 else requested
+    return timeout
+
+
+async def run(
+    tool: str, requested: Optional[float], call: Callable[[], Awaitable[Any]]
+) -> Any:
+    """Run a tool call in a new scope, cancelling it at its deadline.
+
+    Raises:
+        ToolError: if the call did not complete within its deadline
+    """
+    scope = CallScope(tool, timeout_for(tool, requested))
+    token = current_scope.set(scope)
+    try:
+        if scope.deadline is None:
+            return await call()
+        return await asyncio.wait_for(call(), scope.timeout)
+    except asyncio.TimeoutError:
+        scope.cancel("deadline")
+        raise ToolError(
+            f"{tool} did not complete within its deadline of {scope.timeout:g}s"
+        )
+    except asyncio.CancelledError:
+        # The client cancelled the request or disconnected
+        scope.cancel("client")
+        raise
+    finally:
+        current_scope.reset(token)
+
+
+# Metrics: counter name -> label -> value
+_counters: Dict[str, Dict[str, int]] = {
+    "cancelled_calls": {},
+    "skipped_requests": {},
+    "aborted_responses": {},
+    "skipped_pages": {},
+}
+_counters_lock = threading.Lock()
+
+
+def count(name: str, label: str = "", amount: int = 1) -> None:
+    with _counters_lock:
+        values = _counters[name]
+        values[label] = values.get(label, 0) + amount
+
+
+def render_metrics() -> str:
+    """Render the cancellation metrics in the Prometheus text format."""
+    metrics = [
+        (
+            "mcp_cancelled_calls_total",
+            "Tool calls cancelled by the client or their deadline",
+            "cancelled_calls",
+        ),
+        (
+            "mcp_cancelled_skipped_requests_total",
+            "Upstream requests of cancelled tool calls which were not sent",
+            "skipped_requests",
+        ),
+        (
+            "mcp_cancelled_aborted_responses_total",
+            "Upstream responses of cancelled tool calls closed before being read",
+            "aborted_responses",
+        ),
+        (
+            "mcp_cancelled_skipped_pages_total",
+            "Pages of cancelled tool calls which were not fetched",
+            "skipped_pages",
+        ),
+    ]
+    lines = []
+    with _counters_lock:
+        for name, description, counter in metrics:
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} counter")
+            values = _counters[counter]
+            if counter == "cancelled_calls":
+                for reason in ("client", "deadline"):
+                    lines.append(f'{name}{{reason="{reason}"}} {values.get(reason, 0)}')
+            else:
+                lines.append(f"{name} {sum(values.values())}")
+    return "\n".join(lines) + "\n"
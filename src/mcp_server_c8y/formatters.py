@@ -9,6 +9,8 @@ from typing import Any, Dict, List, Optional, Sequence
 from c8y_api.model import Alarm, Device, ManagedObject, Measurement
 from tabulate import tabulate
 
+from .compact import compact_table
+
 
 def clean_text(text):
     # Normalize Unicode characters
@@ -83,18 +85,53 @@ class DeviceFormatter:
                 else "Unknown"
             ),
         },
+        # Top-level managed object fragments read by the extractors
+        "fragments": {
+            "Device ID": ["id"],
+            "Device Name": ["name"],
+            "Device Type": ["type"],
+            "Device Owner": ["owner"],
+            "Device Availability": ["c8y_Availability"],
+            "Critical Alarms": ["c8y_ActiveAlarmsStatus"],
+            "Major Alarms": ["c8y_ActiveAlarmsStatus"],
+            "Minor Alarms": ["c8y_ActiveAlarmsStatus"],
+            "Warning Alarms": ["c8y_ActiveAlarmsStatus"],
+        },
     }
 
     def __init__(self, config: Dict[str, Any] | None = None):
         """Initialize the formatter with optional configuration.
 
         Args:
-            config: Optional configuration dictionary with 'columns' and 'extractors' keys.
-                   If None, uses DEFAULT_CONFIG.
+            config: Optional configuration dictionary with 'columns' and 'extractors' keys
+                   and optionally 'fragments' (see project). If None, uses DEFAULT_CONFIG.
         """
         self.config = config or self.DEFAULT_CONFIG
         self.columns = self.config["columns"]
         self.extractors = self.config["extractors"]
+        self.fragments = self.config.get("fragments")
+
+    def project(self, data: Dict[str, Any], columns: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """Reduce the JSON of a managed object to the fragments needed for the given columns.
+
+        Dropping large fragments (e.g. c8y_SoftwareList or child references) before
+        parsing keeps the parsed objects small. Without a 'fragments' configuration
+        the data is returned unchanged.
+
+        Args:
+            data: Managed object JSON from Cumulocity API
+            columns: Optional list of column names to be rendered. If None, uses all columns.
+
+        Returns:
+            Managed object JSON containing only the required fragments
+        """
+        use_columns = columns if columns is not None else self.columns
+        if self.fragments is None or any(col not in self.fragments for col in use_columns):
+            return data
+        keep = {"id", "self"}
+        for col in use_columns:
+            keep.update(self.fragments[col])
+        return {key: value for key, value in data.items() if key in keep}
 
     def device_to_row(self, device: Device | ManagedObject, columns: Optional[Sequence[str]] = None) -> List[str]:
         """Convert a Device object to a list of values.
@@ -122,6 +159,7 @@ class DeviceFormatter:
             devices: List of Device objects from Cumulocity API
             tablefmt: Table format to use (default: 'tsv').
                      See tabulate documentation for available formats.
+                     'compact' dictionary-encodes repeated values (see compact.py).
             columns: Optional list of column names to include. If None, uses all columns.
 
         Returns:
@@ -133,6 +171,8 @@ class DeviceFormatter:
         rows = [self.device_to_row(device, valid_columns) for device in devices]
         if tablefmt == "json":
             return json.dumps(rows)
+        if tablefmt == "compact":
+            return compact_table(valid_columns, rows)
         return tabulate(rows, headers=valid_columns, tablefmt=tablefmt)
 
     def device_to_formatted_string(
@@ -234,6 +274,7 @@ class MeasurementFormatter:
             measurements: List of Measurement objects from Cumulocity API
             tablefmt: Table format to use (default: 'tsv').
                      See tabulate documentation for available formats.
+                     'compact' dictionary-encodes repeated values (see compact.py).
 
         Returns:
             Formatted string containing the complete table with header and data rows
@@ -284,6 +325,8 @@ class MeasurementFormatter:
 
         if tablefmt == "json":
             return json.dumps(rows)
+        if tablefmt == "compact":
+            return compact_table(columns, rows)
         return tabulate(rows, headers=columns, tablefmt=tablefmt)
 
 
@@ -347,6 +390,7 @@ class AlarmFormatter:
             alarms: List of Alarm objects from Cumulocity API
             tablefmt: Table format to use (default: 'tsv').
                      See tabulate documentation for available formats.
+                     'compact' dictionary-encodes repeated values (see compact.py).
 
         Returns:
             Formatted string containing the complete table with header and data rows
@@ -354,6 +398,8 @@ class AlarmFormatter:
         rows = [self.alarm_to_row(alarm) for alarm in alarms]
         if tablefmt == "json":
             return json.dumps(rows)
+        if tablefmt == "compact":
+            return compact_table(self.columns, rows)
         return tabulate(rows, headers=self.columns, tablefmt=tablefmt)
 
     def alarm_to_formatted_string(self, alarm: Any) -> str:
@@ -436,6 +482,7 @@ class EventFormatter:
             events: List of Event objects from Cumulocity API
             tablefmt: Table format to use (default: 'tsv').
                      See tabulate documentation for available formats.
+                     'compact' dictionary-encodes repeated values (see compact.py).
 
         Returns:
             Formatted string containing the complete table with header and data rows
@@ -443,6 +490,8 @@ class EventFormatter:
         rows = [self.event_to_row(event) for event in events]
         if tablefmt == "json":
             return json.dumps(rows)
+        if tablefmt == "compact":
+            return compact_table(self.columns, rows)
         return tabulate(rows, headers=self.columns, tablefmt=tablefmt)
 
     def event_to_formatted_string(self, event: Any) -> str:
@@ -531,6 +580,7 @@ class OperationFormatter:
             operations: List of Operation objects from Cumulocity API
             tablefmt: Table format to use (default: 'tsv').
                      See tabulate documentation for available formats.
+                     'compact' dictionary-encodes repeated values (see compact.py).
 
         Returns:
             Formatted string containing the complete table with header and data rows
@@ -538,6 +588,8 @@ class OperationFormatter:
         rows = [self.operation_to_row(operation) for operation in operations]
         if tablefmt == "json":
             return json.dumps(rows)
+        if tablefmt == "compact":
+            return compact_table(self.columns, rows)
         return tabulate(rows, headers=self.columns, tablefmt=tablefmt)
 
     def operation_to_formatted_string(self, operation: Any) -> str:
@@ -631,6 +683,7 @@ class AuditLogFormatter:
             audit_logs: List of Audit Log objects from Cumulocity API
             tablefmt: Table format to use (default: 'tsv').
                      See tabulate documentation for available formats.
+                     'compact' dictionary-encodes repeated values (see compact.py).
 
         Returns:
             Formatted string containing the complete table with header and data rows
@@ -638,6 +691,8 @@ class AuditLogFormatter:
         rows = [self.audit_log_to_row(audit_log) for audit_log in audit_logs]
         if tablefmt == "json":
             return json.dumps(rows)
+        if tablefmt == "compact":
+            return compact_table(self.columns, rows)
         return tabulate(rows, headers=self.columns, tablefmt=tablefmt)
 
     def audit_log_to_formatted_string(self, audit_log: Any) -> str:
@@ -670,10 +725,13 @@ class TableFormatter:
             rows: List of rows, where each row is a list of values
             tablefmt: Table format to use (default: 'tsv').
                      See tabulate documentation for available formats.
+                     'compact' dictionary-encodes repeated values (see compact.py).
 
         Returns:
             Formatted string containing the complete table with header and data rows
         """
         if tablefmt == "json":
             return json.dumps(rows)
+        if tablefmt == "compact":
+            return compact_table(headers, rows)
         return tabulate(rows, headers=headers, tablefmt=tablefmt)
@@ -0,0 +1,507 @@
+"""
+Admission control for the requests sent to Cumulocity.
+
+Every upstream request passes a per-tenant ``Governor`` combining a token
+bucket (request rate) with a concurrency limit. Both limits adapt to the
+responses: they are cut on 429 and 5xx responses and grow back slowly while
+requests succeed (additive increase, multiplicative decrease). A
+``Retry-After`` header pauses all requests of the tenant. Waiting requests
+are admitted in arrival order. Requests of a tool call which was
+cancelled leave the queue without being sent (see ``deadlines``).
+
+The governor is installed as a transport adapter on the requests session of
+the Cumulocity client, so it covers all calls made through c8y_api. The
+requests run in worker threads, hence the thread-based synchronization.
+"""
+
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import deadlines, resilience, settings
+
+logger = logging.getLogger("mcp_server_c8y")
+
+# Longest pause honoured from a Retry-After header
+MAX_RETRY_AFTER = 60.0
+
+# Pause after a 429 response without Retry-After header
+DEFAULT_RETRY_AFTER = 1.0
+
+
+# Governor of the requests made with credentials whose tenant was not verified yet
+UNVERIFIED = "unverified"
+
+
+class QueueTimeout(Exception):
+    """Raised if a request waited too long for an upstream slot."""
+
+
+class Governor:
+    """Adaptive rate and concurrency limit for the requests to one tenant."""
+
+    def __init__(self, rate: float, burst: float, concurrency: int):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.max_concurrency = concurrency
+        self.concurrency = float(concurrency)
+        self.active = 0
+        self.paused_until = 0.0
+        self._updated = time.monotonic()
+        self._queue: deque = deque()
+        self._condition = threading.Condition()
+
+        # Metrics
+        self.requests_total = 0
+        self.throttled_total = 0
+        self.errors_total = 0
+        self.queue_timeouts_total = 0
+        self.hedged_total = 0
+        self.wait_seconds_total = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, timeout: Optional[float] = None) -> None:
+        """Wait until the request may be sent.
+
+        Raises:
+            QueueTimeout: if no slot became available within timeout seconds
+            CallCancelled: if the tool call of the request was cancelled
+        """
+        scope = deadlines.current_scope.get()
+        ticket = object()
+        start = time.monotonic()
+        with self._condition:
+            self._queue.append(ticket)
+            try:
+                while True:
+                    if scope is not None:
+                        scope.check()
+                    now = time.monotonic()
+                    self._refill(now)
+                    wait = None
+                    admissible = self.active < int(self.concurrency)
+                    if self._queue[0] is ticket and admissible:
+                        if now < self.paused_until:
+                            wait = self.paused_until - now
+                        elif self.tokens < 1:
+                            wait = (1 - self.tokens) / self.rate
+                        else:
+                            self.tokens -= 1
+                            self.active += 1
+                            self.wait_seconds_total += now - start
+                            return
+                    if timeout is not None:
+                        remaining = start + timeout - now
+                        if remaining <= 0:
+                            self.queue_timeouts_total += 1
+                            raise QueueTimeout(
+                                f"No upstream slot available within {timeout:.0f}s "
+                                f"({len(self._queue)} requests queued)"
+                            )
+                        wait = remaining if wait is None else min(wait, remaining)
+                    if scope is not None and scope.deadline is not None:
+                        remaining = scope.deadline - now
+                        wait = remaining if wait is None else min(wait, remaining)
+                    self._condition.wait(wait)
+            finally:
+                self._queue.remove(ticket)
+                self._condition.notify_all()
+
+    def try_acquire(self, hedge: bool = False) -> bool:
+        """Take a slot only if one is free right away and nobody is waiting.
+
+        Slots taken for hedged requests are counted in ``hedged_total``.
+        """
+        with self._condition:
+            now = time.monotonic()
+            self._refill(now)
+            if (
+                len(self._queue) > 0
+                or self.active >= int(self.concurrency)
+                or now < self.paused_until
+                or self.tokens < 1
+            ):
+                return False
+            self.tokens -= 1
+            self.active += 1
+            if hedge:
+                self.hedged_total += 1
+            return True
+
+    def give_back(self) -> None:
+        """Return a slot which was not used, without recording an outcome."""
+        with self._condition:
+            self.active -= 1
+            self.tokens = min(self.burst, self.tokens + 1)
+            self._condition.notify_all()
+
+    def release(
+        self, status: Optional[int], retry_after: Optional[float] = None
+    ) -> None:
+        """Record the outcome of a request and adapt the limits."""
+        with self._condition:
+            self.active -= 1
+            self.requests_total += 1
+            if status == 429:
+                self.throttled_total += 1
+                self.rate = max(self.rate / 2, 1.0)
+                self.concurrency = max(self.concurrency / 2, 1.0)
+                pause = min(retry_after or DEFAULT_RETRY_AFTER, MAX_RETRY_AFTER)
+                self.paused_until = max(self.paused_until, time.monotonic() + pause)
+                logger.warning(
+                    f"Throttled by Cumulocity, pausing {pause:.1f}s and reducing to "
+                    f"{self.rate:.1f} requests/s, {int(self.concurrency)} concurrent"
+                )
+            elif status is None or status >= 500:
+                self.errors_total += 1
+                self.concurrency = max(self.concurrency * 0.75, 1.0)
+            else:
+                # Grow back by about one request/s per second of successful requests
+                self.rate = min(self.rate + 1.0 / max(self.rate, 1.0), self.max_rate)
+                self.concurrency = min(
+                    self.concurrency + 1.0 / self.concurrency, self.max_concurrency
+                )
+            self._condition.notify_all()
+
+
+_governors: Dict[str, Governor] = {}
+_governors_lock = threading.Lock()
+
+
+def get_governor(tenant: str) -> Governor:
+    with _governors_lock:
+        governor = _governors.get(tenant)
+        if governor is None:
+            governor = Governor(
+                settings.upstream_rate,
+                settings.upstream_burst,
+                settings.upstream_concurrency,
+            )
+            _governors[tenant] = governor
+        return governor
+
+
+def _wake_waiters() -> None:
+    """Let the queued requests of a cancelled tool call give up their place."""
+    with _governors_lock:
+        governors = list(_governors.values())
+    for governor in governors:
+        with governor._condition:
+            governor._condition.notify_all()
+
+
+deadlines.on_cancel(_wake_waiters)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given in seconds or as HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class GovernedAdapter(HTTPAdapter):
+    """Transport adapter sending all requests of a tenant through its governor.
+
+    Idempotent requests answered with 429 are retried (after the pause
+    requested by the platform) up to MCP_UPSTREAM_RETRIES times. Requests
+    are also subject to the deadlines, hedging and circuit breakers of
+    ``resilience``.
+    """
+
+    def __init__(self, tenant: str, **kwargs):
+        super().__init__(**kwargs)
+        self.tenant = tenant
+        # Threads sending the admitted requests of the tenant (and their
+        # hedges), so a slow tenant cannot occupy the threads of the others
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.upstream_concurrency,
+            thread_name_prefix=f"c8y-request-{tenant}",
+        )
+
+    def _send_once(self, request, **kwargs):
+        """Send a request which already holds a governor slot."""
+        governor = get_governor(self.tenant)
+        status = None
+        retry_after = None
+        start = time.monotonic()
+        try:
+            response = super().send(request, **kwargs)
+            status = response.status_code
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        finally:
+            governor.release(status, retry_after)
+        if status is not None and status < 500:
+            resilience.get_latency_tracker(
+                self.tenant, resilience.endpoint_key(request)
+            ).record(time.monotonic() - start)
+        return response
+
+    def _acquire(self, expires: float) -> None:
+        """Wait for a slot, at most until the deadline of the request expires.
+
+        Raises:
+            QueueTimeout: if the deadline expired before a slot became free
+            CallCancelled: if the tool call gave up while the request was queued
+        """
+        governor = get_governor(self.tenant)
+        remaining = expires - time.monotonic()
+        governor.acquire(
+            timeout=max(min(remaining, settings.upstream_queue_timeout), 0.0)
+        )
+        # Skip the send if the caller gave up while the request was queued
+        try:
+            deadlines.check()
+            if time.monotonic() >= expires:
+                raise QueueTimeout(
+                    f"Deadline of {remaining:.1f}s expired while waiting for a slot"
+                )
+        except Exception:
+            governor.give_back()
+            raise
+
+    def _send_governed(
+        self, request, deadline: float, retries: int, hedge: bool, **kwargs
+    ):
+        """Send a request once admitted, retrying it after 429 responses.
+
+        The deadline covers the time spent in the queue and upstream.
+        """
+        expires = time.monotonic() + deadline
+        for attempt in range(retries + 1):
+            self._acquire(expires)
+            if hedge:
+                response = self._send_hedged(request, expires, **kwargs)
+            else:
+                response = self._send_once(request, **kwargs)
+            if response.status_code != 429 or attempt == retries:
+                return response
+            response.close()
+
+    def _send_hedged(self, request, expires: float, **kwargs):
+        """Send an admitted request, hedging it once it takes longer than usual."""
+        governor = get_governor(self.tenant)
+        endpoint = resilience.endpoint_key(request)
+        # The requests run in the context of the tool call (see deadlines)
+        futures = [
+            self._executor.submit(
+                contextvars.copy_context().run, self._send_once, request, **kwargs
+            )
+        ]
+        hedge_delay = resilience.get_latency_tracker(
+            self.tenant, endpoint
+        ).hedge_delay()
+        if hedge_delay is not None and time.monotonic() + hedge_delay < expires:
+            wait(futures, timeout=hedge_delay)
+            # Only hedge with spare capacity, never queue for it
+            if not futures[0].done() and governor.try_acquire(hedge=True):
+                logger.debug(f"Hedging {endpoint} after {hedge_delay:.3f}s")
+                futures.append(
+                    self._executor.submit(
+                        contextvars.copy_context().run,
+                        self._send_once,
+                        request.copy(),
+                        **kwargs,
+                    )
+                )
+
+        pending = set(futures)
+        error = None
+        while pending:
+            remaining = expires - time.monotonic()
+            done, pending = wait(
+                pending, timeout=max(remaining, 0.0), return_when=FIRST_COMPLETED
+            )
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    for other in pending:
+                        other.add_done_callback(_close_response)
+                    return future.result()
+                error = future.exception()
+        if pending:
+            for other in pending:
+                other.add_done_callback(_close_response)
+            raise requests.exceptions.Timeout(
+                f"{endpoint} did not respond within its deadline"
+            )
+        raise error
+
+    def send(self, request, **kwargs):
+        # Nothing is sent for a tool call which was cancelled
+        deadlines.check()
+        endpoint = resilience.endpoint_key(request)
+        breaker = resilience.get_breaker(self.tenant, endpoint)
+        breaker.before_request()
+
+        # Requests never outlive the deadline of their tool call
+        deadline = deadlines.cap_timeout(resilience.deadline_for(request))
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = deadline
+        elif isinstance(kwargs["timeout"], (int, float)):
+            kwargs["timeout"] = deadlines.cap_timeout(kwargs["timeout"])
+        idempotent = request.method in ("GET", "HEAD")
+        retries = settings.upstream_retries if idempotent else 0
+        try:
+            response = self._send_governed(
+                request, deadline, retries, hedge=idempotent, **kwargs
+            )
+        except QueueTimeout:
+            # Never sent: our own queue is saturated, not the endpoint
+            breaker.abandon()
+            raise
+        except Exception:
+            scope = deadlines.current_scope.get()
+            if scope is not None and scope.cancelled:
+                # Given up by the tool call, not a failure of the endpoint
+                breaker.abandon()
+            else:
+                breaker.record(False)
+            raise
+        breaker.record(response.status_code < 500)
+        return response
+
+
+def _close_response(future) -> None:
+    """Close the response of a request which lost the race against its hedge."""
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+# Adapter per tenant, shared by all sessions of the tenant
+_adapters: Dict[str, GovernedAdapter] = {}
+
+
+def get_adapter(tenant: str) -> GovernedAdapter:
+    with _governors_lock:
+        adapter = _adapters.get(tenant)
+        if adapter is None:
+            # Keep a pooled connection for every request admitted at a time
+            size = max(settings.upstream_concurrency, 10)
+            adapter = GovernedAdapter(tenant, pool_maxsize=size)
+            _adapters[tenant] = adapter
+        return adapter
+
+
+def install(session, tenant: str) -> None:
+    """Route all requests of a requests session through the governor of a tenant.
+
+    The sessions of a tenant share one adapter and thereby its connection
+    pool (credentials are sent per request), so connections opened by one
+    client, e.g. the startup warmers, are reused by the others.
+    """
+    adapter = get_adapter(tenant)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+
+def render_metrics() -> str:
+    """Render the governor metrics in the Prometheus text format."""
+    metrics = [
+        (
+            "mcp_upstream_queue_depth",
+            "gauge",
+            "Requests waiting for an upstream slot",
+            "queue_depth",
+        ),
+        (
+            "mcp_upstream_active_requests",
+            "gauge",
+            "Requests currently sent upstream",
+            "active",
+        ),
+        (
+            "mcp_upstream_rate_limit",
+            "gauge",
+            "Current request rate limit (requests/s)",
+            "rate",
+        ),
+        (
+            "mcp_upstream_concurrency_limit",
+            "gauge",
+            "Current concurrency limit",
+            "concurrency",
+        ),
+        (
+            "mcp_upstream_requests_total",
+            "counter",
+            "Completed upstream requests",
+            "requests_total",
+        ),
+        (
+            "mcp_upstream_throttled_total",
+            "counter",
+            "Upstream responses with status 429",
+            "throttled_total",
+        ),
+        (
+            "mcp_upstream_errors_total",
+            "counter",
+            "Failed upstream requests (5xx or no response)",
+            "errors_total",
+        ),
+        (
+            "mcp_upstream_queue_timeouts_total",
+            "counter",
+            "Requests rejected after waiting too long",
+            "queue_timeouts_total",
+        ),
+        (
+            "mcp_upstream_hedged_total",
+            "counter",
+            "Requests sent a second time because the first one was slow",
+            "hedged_total",
+        ),
+        (
+            "mcp_upstream_wait_seconds_total",
+            "counter",
+            "Total time requests waited for a slot",
+            "wait_seconds_total",
+        ),
+    ]
+    with _governors_lock:
+        governors = dict(_governors)
+    lines = []
+    for name, kind, description, attribute in metrics:
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {kind}")
+        for tenant, governor in sorted(governors.items()):
+            value = getattr(governor, attribute)
+            if isinstance(value, float):
+                value = round(value, 3)
+            lines.append(f'{name}{{tenant="{tenant}"}} {value}')
+    lines.append(
+        "# HELP mcp_upstream_circuit_open Endpoints not called because they failed"
+    )
+    lines.append("# TYPE mcp_upstream_circuit_open gauge")
+    for (tenant, endpoint), state in sorted(resilience.open_circuits().items()):
+        lines.append(
+            f'mcp_upstream_circuit_open{{tenant="{tenant}",endpoint="{endpoint}",'
+            f'state="{state}"}} 1'
+        )
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,128 @@
+"""
+Grouping of alarms by type, severity and/or text template.
+
+Large sites often raise the same alarm on hundreds of devices. Instead of
+one row per alarm, ``AlarmGrouper`` reports one row per group with the
+number of alarms, the affected devices and the first and last alarm time.
+Alarms are added page by page while they are retrieved, and the state per
+group is bounded, so memory use does not grow with the number of alarms.
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .formatters import TableFormatter, clean_text
+from .timeseries import parse_time
+
+GROUP_KEYS = ("type", "severity", "text")
+
+# Device IDs listed per group
+MAX_DEVICES = 10
+
+# Further groups are counted in a single "(other)" group
+MAX_GROUPS = 200
+
+_NUMBER = re.compile(r"\d+(?:[.,:]\d+)*")
+_HEX_ID = re.compile(r"\b[0-9a-fA-F]{8,}\b|\b[0-9a-fA-F]+(?:-[0-9a-fA-F]+){2,}\b")
+
+
+def text_template(text: Optional[str]) -> str:
+    """Alarm text with numbers and IDs replaced by '#', e.g. 'Temperature # C exceeded'."""
+    template = _NUMBER.sub("#", _HEX_ID.sub("#", clean_text(text or "")))
+    return " ".join(template.split())[:60]
+
+
+def parse_group_by(group_by: str) -> Tuple[str, ...]:
+    """Parse a comma-separated list of group keys.
+
+    Raises:
+        ValueError: if a key is not one of GROUP_KEYS
+    """
+    keys = tuple(key.strip().lower() for key in group_by.split(",") if key.strip())
+    unknown = [key for key in keys if key not in GROUP_KEYS]
+    if unknown or not keys:
+        raise ValueError(
+            f"Invalid group_by '{group_by}', use a combination of {', '.join(GROUP_KEYS)}"
+        )
+    return keys
+
+
+class _Group:
+    __slots__ = ("alarms", "occurrences", "devices", "more_devices", "first", "last")
+
+    def __init__(self):
+        self.alarms = 0
+        self.occurrences = 0
+        self.devices: Dict[str, None] = {}
+        self.more_devices = False
+        # (epoch seconds, original timestamp)
+        self.first: Optional[Tuple[float, str]] = None
+        self.last: Optional[Tuple[float, str]] = None
+
+
+class AlarmGrouper:
+    """Collapses alarms into groups in a single pass with bounded memory."""
+
+    def __init__(self, keys: Sequence[str]):
+        self.keys = tuple(keys)
+        self.groups: Dict[Tuple[str, ...], _Group] = {}
+        self.total = 0
+
+    def _key(self, alarm: Any) -> Tuple[str, ...]:
+        return tuple(
+            text_template(alarm.text) if key == "text" else str(getattr(alarm, key))
+            for key in self.keys
+        )
+
+    def add(self, alarms: List[Any]) -> None:
+        """Add the alarms of a page."""
+        for alarm in alarms:
+            key = self._key(alarm)
+            group = self.groups.get(key)
+            if group is None:
+                if len(self.groups) >= MAX_GROUPS:
+                    key = ("(other)",) * len(self.keys)
+                    group = self.groups.get(key)
+                if group is None:
+                    group = self.groups[key] = _Group()
+            self.total += 1
+            group.alarms += 1
+            group.occurrences += alarm.count or 1
+            source = str(alarm.source)
+            if source not in group.devices:
+                if len(group.devices) < MAX_DEVICES:
+                    group.devices[source] = None
+                else:
+                    group.more_devices = True
+            if alarm.time:
+                timestamp = (parse_time(alarm.time), alarm.time)
+                if group.first is None or timestamp < group.first:
+                    group.first = timestamp
+                if group.last is None or timestamp > group.last:
+                    group.last = timestamp
+
+    def to_table(self, tablefmt: str = "tsv") -> str:
+        """Render the groups, largest first."""
+        columns = [key.capitalize() for key in self.keys] + [
+            "Alarms",
+            "Occurrences",
+            "Devices",
+            "First",
+            "Last",
+        ]
+        rows = []
+        for key, group in sorted(self.groups.items(), key=lambda item: -item[1].alarms):
+            devices = ", ".join(group.devices)
+            if group.more_devices:
+                devices += ", ..."
+            rows.append(
+                list(key)
+                + [
+                    group.alarms,
+                    group.occurrences,
+                    devices,
+                    group.first[1] if group.first else "Unknown",
+                    group.last[1] if group.last else "Unknown",
+                ]
+            )
+        return TableFormatter.print_table(columns, rows, tablefmt)
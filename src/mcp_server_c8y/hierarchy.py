@@ -0,0 +1,223 @@
+"""
+Breadth-first traversal of asset and device hierarchies.
+
+``load_subtree`` walks the ``childAssets`` and ``childDevices`` references
+below a managed object level by level. All objects of a level are fetched
+at once with batched ``ids=`` queries sent concurrently, so the number of
+round trips depends on the depth of the hierarchy rather than on the number
+of nodes. Only the name, type and child references of each object are kept.
+
+A node referenced by several parents is expanded once and shown as shared
+under the others; references back to an ancestor are reported as cycles.
+"""
+
+import asyncio
+import json
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from tabulate import tabulate
+
+from . import settings
+from .streaming import MemoryBudget, read_page
+
+# Managed object IDs per ids= query
+BATCH_SIZE = 200
+
+# Upper bound of the max_nodes parameter
+MAX_NODES = 10000
+
+RELATIONS = {"childAssets": "asset", "childDevices": "device"}
+
+
+class Node(NamedTuple):
+    id: str
+    name: str
+    type: str
+    # (child id, relation) in the order of the references
+    children: List[Tuple[str, str]]
+
+
+def parse_node(data: Dict[str, Any]) -> Node:
+    children = []
+    for key, relation in RELATIONS.items():
+        fragment = data.get(key)
+        if isinstance(fragment, dict):
+            for reference in fragment.get("references") or []:
+                child = (reference.get("managedObject") or {}).get("id")
+                if child is not None:
+                    children.append((str(child), relation))
+    return Node(
+        str(data.get("id", "")),
+        str(data.get("name") or "Unknown"),
+        str(data.get("type") or "Unknown"),
+        children,
+    )
+
+
+class Edge(NamedTuple):
+    parent: str
+    child: str
+    relation: str
+    # "" for the edge expanding the child, otherwise "shared" or "cycle"
+    note: str
+
+
+class Subtree:
+    """The nodes and edges found below a root, in breadth-first order."""
+
+    def __init__(self, root_id: str):
+        self.root_id = root_id
+        self.nodes: Dict[str, Node] = {}
+        self.depths: Dict[str, int] = {root_id: 0}
+        # The parent under which a node is expanded
+        self.parents: Dict[str, Optional[str]] = {root_id: None}
+        self.edges: List[Edge] = []
+        # Nodes whose children are not shown because of the depth limit
+        self.unexpanded: Dict[str, int] = {}
+        self.node_limit_reached = False
+        self.requests = 0
+
+    def _is_ancestor(self, node_id: str, of: str) -> bool:
+        current: Optional[str] = of
+        while current is not None:
+            if current == node_id:
+                return True
+            current = self.parents.get(current)
+        return False
+
+    def name(self, node_id: str) -> str:
+        node = self.nodes.get(node_id)
+        return node.name if node else "Unknown"
+
+    def type(self, node_id: str) -> str:
+        node = self.nodes.get(node_id)
+        return node.type if node else "Unknown"
+
+    def expand(self, node: Node, max_depth: int, max_nodes: int) -> List[str]:
+        """Record the edges of a node, returning the children to visit next."""
+        depth = self.depths[node.id]
+        if depth >= max_depth:
+            if node.children:
+                self.unexpanded[node.id] = len(node.children)
+            return []
+        visit = []
+        for child, relation in node.children:
+            if child in self.depths:
+                note = "cycle" if self._is_ancestor(child, node.id) else "shared"
+                self.edges.append(Edge(node.id, child, relation, note))
+                continue
+            if len(self.depths) >= max_nodes:
+                self.node_limit_reached = True
+                continue
+            self.depths[child] = depth + 1
+            self.parents[child] = node.id
+            self.edges.append(Edge(node.id, child, relation, ""))
+            visit.append(child)
+        return visit
+
+    def to_tree(self) -> str:
+        """Render an indented tree, two spaces per level."""
+        children: Dict[str, List[Edge]] = {}
+        for edge in self.edges:
+            children.setdefault(edge.parent, []).append(edge)
+
+        lines: List[str] = []
+        # Depth-first with an explicit stack, as chains may be thousands of levels deep
+        stack: List[Tuple[str, str, Optional[Edge]]] = [(self.root_id, "", None)]
+        while stack:
+            node_id, indent, edge = stack.pop()
+            line = f"{indent}{node_id} {self.name(node_id)} ({self.type(node_id)})"
+            if edge is not None and edge.relation == "device":
+                line += " [device]"
+            if edge is not None and edge.note:
+                lines.append(f"{line} [{edge.note}, see above]")
+                continue
+            if node_id in self.unexpanded:
+                line += f" [+{self.unexpanded[node_id]} children]"
+            lines.append(line)
+            for child_edge in reversed(children.get(node_id, [])):
+                stack.append((child_edge.child, indent + "  ", child_edge))
+        return "\n".join(lines)
+
+    def to_edges(self, tablefmt: str = "tsv") -> str:
+        """Render one row per parent-child reference."""
+        rows = [
+            [
+                edge.parent,
+                edge.child,
+                edge.relation,
+                self.depths.get(edge.child, ""),
+                self.name(edge.child),
+                self.type(edge.child),
+                edge.note,
+            ]
+            for edge in self.edges
+        ]
+        if tablefmt == "json":
+            return json.dumps(rows)
+        return tabulate(
+            rows,
+            headers=[
+                "Parent ID",
+                "Child ID",
+                "Relation",
+                "Depth",
+                "Child Name",
+                "Child Type",
+                "Note",
+            ],
+            tablefmt=tablefmt,
+        )
+
+
+async def _fetch_level(c8y, node_ids: List[str], subtree: Subtree) -> Dict[str, Node]:
+    semaphore = asyncio.Semaphore(settings.page_concurrency)
+
+    async def fetch(batch: List[str]) -> List[Node]:
+        async with semaphore:
+            subtree.requests += 1
+            nodes, _ = await asyncio.to_thread(
+                read_page,
+                c8y,
+                "/inventory/managedObjects",
+                {
+                    "ids": ",".join(batch),
+                    "pageSize": len(batch),
+                    "withChildren": "true",
+                    "skipChildrenNames": "true",
+                },
+                "managedObjects",
+                parse_node,
+                # Only the name, type and child IDs of the objects are held
+                MemoryBudget(0),
+            )
+            return nodes
+
+    batches = await asyncio.gather(
+        *(
+            fetch(node_ids[i : i + BATCH_SIZE])
+            for i in range(0, len(node_ids), BATCH_SIZE)
+        )
+    )
+    return {node.id: node for nodes in batches for node in nodes}
+
+
+async def load_subtree(
+    c8y, root_id: str, max_depth: int, max_nodes: int = MAX_NODES
+) -> Subtree:
+    """Walk the hierarchy below root_id breadth-first, one level per round."""
+    subtree = Subtree(root_id)
+    max_nodes = min(max(max_nodes, 1), MAX_NODES)
+    level = [root_id]
+    while level:
+        nodes = await _fetch_level(c8y, level, subtree)
+        if root_id not in subtree.nodes and root_id not in nodes:
+            raise ValueError(f"Managed object {root_id} not found")
+        subtree.nodes.update(nodes)
+        next_level: List[str] = []
+        for node_id in level:
+            node = nodes.get(node_id)
+            if node is not None:
+                next_level += subtree.expand(node, max_depth, max_nodes)
+        level = next_level
+    return subtree
@@ -0,0 +1,112 @@
+"""
+Event counts per type and time interval.
+
+``EventHistogram`` holds one counter per event type and interval of a
+window, so its size only depends on the window and the interval, not on the
+number of events. It is filled either from count-only queries per interval
+(``set_count``) or by scanning all events of the window page by page
+(``add``).
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Tuple
+
+from tabulate import tabulate
+
+from .timeseries import format_time, parse_time
+
+# Maximum number of intervals of a histogram
+MAX_BUCKETS = 1000
+
+# Further event types are counted as "(other)"
+MAX_TYPES = 20
+
+OTHER = "(other)"
+
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+_NAMES = {"minute": "1m", "hour": "1h", "day": "1d", "week": "1w"}
+_INTERVAL = re.compile(r"^(\d+)\s*([smhdw])$")
+
+
+def parse_interval(interval: str) -> float:
+    """Parse an interval like '15m', '1h', '1d' or 'hour' into seconds.
+
+    Raises:
+        ValueError: for unsupported intervals
+    """
+    text = interval.strip().lower()
+    match = _INTERVAL.match(_NAMES.get(text, text))
+    if match is None or int(match.group(1)) == 0:
+        raise ValueError(
+            f"Invalid interval '{interval}', use e.g. '15m', '1h', '1d' or '1w'"
+        )
+    return int(match.group(1)) * _UNITS[match.group(2)]
+
+
+class EventHistogram:
+    """Event counts per type over consecutive intervals of a window."""
+
+    def __init__(self, start: float, end: float, interval: float):
+        if end <= start:
+            raise ValueError("The end of the window must be after its start")
+        self.start = start
+        self.end = end
+        self.interval = interval
+        self.size = int(-(-(end - start) // interval))
+        if self.size > MAX_BUCKETS:
+            raise ValueError(
+                f"The window has {self.size} intervals, at most {MAX_BUCKETS} are "
+                f"supported. Use a larger interval or a shorter window."
+            )
+        self.counts: Dict[str, List[int]] = {}
+
+    def bounds(self, index: int) -> Tuple[float, float]:
+        """Start and end (epoch seconds) of an interval."""
+        bucket_start = self.start + index * self.interval
+        return bucket_start, min(bucket_start + self.interval, self.end)
+
+    def _counts(self, event_type: str) -> List[int]:
+        counts = self.counts.get(event_type)
+        if counts is None:
+            if len(self.counts) >= MAX_TYPES:
+                event_type = OTHER
+                counts = self.counts.get(event_type)
+            if counts is None:
+                counts = self.counts[event_type] = [0] * self.size
+        return counts
+
+    def set_count(self, event_type: str, index: int, count: int) -> None:
+        self._counts(event_type)[index] = count
+
+    def add(self, events: List[Any]) -> None:
+        """Count the events of a page."""
+        for event in events:
+            if not event.time:
+                continue
+            index = int((parse_time(event.time) - self.start) // self.interval)
+            if 0 <= index < self.size:
+                self._counts(str(event.type))[index] += 1
+
+    @property
+    def total(self) -> int:
+        return sum(sum(counts) for counts in self.counts.values())
+
+    def to_table(self, tablefmt: str = "tsv") -> str:
+        """Render one row per non-empty interval and one column per type."""
+        types = sorted(
+            self.counts,
+            key=lambda event_type: (event_type == OTHER, -sum(self.counts[event_type])),
+        )
+        rows: List[List[Any]] = []
+        for index in range(self.size):
+            values = [self.counts[event_type][index] for event_type in types]
+            if any(values):
+                rows.append(
+                    [format_time(self.bounds(index)[0])] + values + [sum(values)]
+                )
+        if tablefmt == "json":
+            return json.dumps(rows)
+        return tabulate(
+            rows, headers=["Interval Start"] + types + ["Total"], tablefmt=tablefmt
+        )
@@ -0,0 +1,232 @@
+"""
+Generic access to the Cumulocity REST API described by c8y-oas.yml.
+
+The specification is compiled at build time (scripts/compile_oas.py) into a
+pickled index of operations, which loads in a few milliseconds. Only
+operations whose method is in ``settings.methodWhitelist`` and whose
+operation ID is not in ``settings.toolBlacklist`` are available.
+"""
+
+import logging
+import os
+import pickle
+import re
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import quote
+
+from tabulate import tabulate
+
+from . import settings
+
+logger = logging.getLogger("mcp_server_c8y")
+
+INDEX_PATH = os.path.join(os.path.dirname(__file__), "oas_index.pickle")
+
+# Must match INDEX_FORMAT in scripts/compile_oas.py
+INDEX_FORMAT = 1
+
+
+class Parameter(NamedTuple):
+    name: str
+    location: str
+    required: bool
+    type: str
+    description: str
+
+
+class Operation(NamedTuple):
+    operation_id: str
+    method: str
+    path: str
+    summary: str
+    tags: Tuple[str, ...]
+    parameters: Tuple[Parameter, ...]
+    response: Tuple[Tuple[str, str], ...]
+
+
+_operations: Optional[Dict[str, Operation]] = None
+
+
+def load_index() -> Dict[str, Operation]:
+    """Load the compiled index (once), returning all operations by operation ID."""
+    global _operations
+    if _operations is not None:
+        return _operations
+    try:
+        with open(INDEX_PATH, "rb") as f:
+            index = pickle.load(f)
+    except OSError:
+        logger.warning(
+            f"OpenAPI index {INDEX_PATH} not found, run scripts/compile_oas.py"
+        )
+        index = {}
+    if index and index.get("format") != INDEX_FORMAT:
+        logger.warning(f"OpenAPI index {INDEX_PATH} has an unsupported format")
+        index = {}
+    _operations = {
+        operation_id: Operation(
+            operation_id,
+            method,
+            path,
+            summary,
+            tags,
+            tuple(Parameter(*parameter) for parameter in parameters),
+            response,
+        )
+        for operation_id, (method, path, summary, tags, parameters, response) in (
+            index.get("operations") or {}
+        ).items()
+    }
+    return _operations
+
+
+def is_allowed(operation: Operation) -> bool:
+    return (
+        operation.method in settings.methodWhitelist
+        and operation.operation_id not in settings.toolBlacklist
+    )
+
+
+def get_operation(operation_id: str) -> Operation:
+    """Look up an allowed operation.
+
+    Raises:
+        ValueError: if the operation does not exist or is not allowed
+    """
+    operation = load_index().get(operation_id)
+    if operation is None or not is_allowed(operation):
+        raise ValueError(
+            f"Unknown operation '{operation_id}'. Use list_api_operations to find operations."
+        )
+    return operation
+
+
+def find_operations(tag: str = "", search: str = "") -> List[Operation]:
+    """Allowed operations, optionally filtered by tag and a case-insensitive search term."""
+    tag = tag.lower()
+    search = search.lower()
+    result = []
+    for operation in load_index().values():
+        if not is_allowed(operation):
+            continue
+        if tag and tag not in (t.lower() for t in operation.tags):
+            continue
+        if search and not any(
+            search in text.lower()
+            for text in (operation.operation_id, operation.path, operation.summary)
+        ):
+            continue
+        result.append(operation)
+    return result
+
+
+def build_request(
+    operation: Operation,
+    path_params: Optional[Dict[str, Any]] = None,
+    query_params: Optional[Dict[str, Any]] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    """Build the resource path and query parameters of a call to an operation.
+
+    Raises:
+        ValueError: if required parameters are missing or unknown ones are given
+    """
+    path_params = path_params or {}
+    query_params = query_params or {}
+    known = {(p.name, p.location): p for p in operation.parameters}
+
+    for location, values in (("path", path_params), ("query", query_params)):
+        unknown = [name for name in values if (name, location) not in known]
+        if unknown:
+            raise ValueError(
+                f"Unknown {location} parameters for {operation.operation_id}: "
+                f"{', '.join(unknown)}"
+            )
+    missing = [
+        p.name
+        for p in operation.parameters
+        if p.required
+        and (path_params if p.location == "path" else query_params).get(p.name)
+        in (None, "")
+    ]
+    if missing:
+        raise ValueError(
+            f"Missing required parameters for {operation.operation_id}: "
+            f"{', '.join(missing)}"
+        )
+
+    path = re.sub(
+        r"\{([^}]+)\}",
+        lambda match: quote(str(path_params[match.group(1)]), safe=""),
+        operation.path,
+    )
+    params = {}
+    for name, value in query_params.items():
+        if isinstance(value, bool):
+            value = "true" if value else "false"
+        elif isinstance(value, (list, tuple)):
+            value = ",".join(str(v) for v in value)
+        params[name] = value
+    return path, params
+
+
+def patch(c8y, resource: str, json: Optional[dict], params: Dict[str, Any]) -> dict:
+    """Send a PATCH request, which CumulocityRestApi has no wrapper for.
+
+    Errors are raised like those of the c8y_api wrappers.
+
+    Raises:
+        KeyError: if the resource is not found (404)
+        SyntaxError: if the request cannot be processed (5xx)
+        ValueError: if the response is not ok for other reasons
+    """
+    response = c8y.session.patch(c8y.base_url + resource, json=json, params=params)
+    if response.status_code == 404:
+        raise KeyError(f"No such object: {resource}")
+    if 500 <= response.status_code <= 599:
+        raise SyntaxError(
+            f"Invalid PATCH request. Status: {response.status_code} "
+            f"Response:\n{response.text}"
+        )
+    if response.status_code not in (200, 201, 204):
+        raise ValueError(
+            f"Unable to perform PATCH request. Status: {response.status_code} "
+            f"Response:\n{response.text}"
+        )
+    return response.json() if response.content else {}
+
+
+def operations_to_table(operations: List[Operation], tablefmt: str = "tsv") -> str:
+    rows = [
+        [op.operation_id, op.method.upper(), op.path, op.summary] for op in operations
+    ]
+    return tabulate(
+        rows, headers=["Operation ID", "Method", "Path", "Summary"], tablefmt=tablefmt
+    )
+
+
+def describe(operation: Operation, tablefmt: str = "tsv") -> str:
+    lines = [
+        f"{operation.method.upper()} {operation.path}",
+        operation.summary,
+        "",
+        "Parameters:",
+        tabulate(
+            [
+                [p.name, p.location, "yes" if p.required else "", p.type, p.description]
+                for p in operation.parameters
+            ],
+            headers=["Name", "In", "Required", "Type", "Description"],
+            tablefmt=tablefmt,
+        ),
+    ]
+    if operation.response:
+        lines.extend(
+            [
+                "",
+                "Response properties:",
+                tabulate(
+                    operation.response, headers=["Name", "Type"], tablefmt=tablefmt
+                ),
+            ]
+        )
+    return "\n".join(lines)
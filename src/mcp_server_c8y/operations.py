@@ -0,0 +1,408 @@
+"""
+Shared watcher of device operation statuses (``get_operations`` with watch).
+
+Agents tracking an operation used to poll it over and over, each on its
+own. All watches made with one Cumulocity client are served by one
+``OperationPoller`` instead. It tracks the watched operations per device and
+polls each device with a single request listing its operations created
+since the oldest unfinished one. The poll interval starts at
+``MCP_OPERATIONS_POLL_MIN`` seconds, doubles while nothing changes up to
+``MCP_OPERATIONS_POLL_MAX``, and drops back when a status changes or a new
+watch starts. The upstream polling therefore grows with the number of
+watched devices, not with the number of watching agents. While this process
+receives realtime notifications, they update the statuses right away and
+polling continues at the longest interval as a fallback.
+
+A watch only reports transitions: status changes of its operations and, for
+a device, operations created while the watch runs.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from . import deadlines, realtime, settings, tenancy
+from .records import OperationRecord
+from .timeseries import format_time, parse_time
+
+logger = logging.getLogger("mcp_server_c8y")
+
+FINAL_STATUSES = ("SUCCESSFUL", "FAILED")
+UNFINISHED_STATUSES = ("PENDING", "EXECUTING")
+
+# Operations listed per request
+PAGE_SIZE = 2000
+
+# Longest watch of a single tool call
+MAX_WATCH = 600.0
+
+# Seconds subtracted from the start of a device watch to allow for clock skew
+CLOCK_SKEW = 60.0
+
+# Metrics
+_polls_total = 0
+_notifications_total = 0
+
+
+class Transition(OperationRecord):
+    """An operation with its status before the change (None for new operations)."""
+
+    __slots__ = ("previousStatus",)
+
+    def __init__(self, operation: OperationRecord, previous: Optional[str]):
+        super().__init__(
+            operation.id,
+            operation.deviceId,
+            operation.status,
+            operation.creationTime,
+            operation.failureReason,
+            operation.description,
+        )
+        self.previousStatus = previous
+
+
+class Watch:
+    """Operations (and possibly a device) watched by one tool call."""
+
+    def __init__(self, operation_ids: Sequence[str], device_id: Optional[str]):
+        self.operation_ids = set(operation_ids)
+        self.device_id = device_id
+        self.transitions: List[Transition] = []
+        self.changed = asyncio.Event()
+
+    def matches(self, operation: OperationRecord) -> bool:
+        return operation.id in self.operation_ids or (
+            self.device_id is not None and operation.deviceId == self.device_id
+        )
+
+
+class _Device:
+    """Known operations of a device.
+
+    ``complete`` is set while all unfinished operations of the device are
+    known, which a device watch needs to tell new operations apart.
+    """
+
+    __slots__ = ("operations", "complete", "registered")
+
+    def __init__(self):
+        self.operations: Dict[str, OperationRecord] = {}
+        self.complete = False
+        self.registered = time.time()
+
+
+def _age(operation: OperationRecord) -> float:
+    try:
+        return parse_time(operation.creationTime)
+    except (TypeError, ValueError):
+        return time.time()
+
+
+class OperationPoller:
+    """Single poll loop serving all operation watches made with one client."""
+
+    def __init__(self, c8y, tenant: str):
+        self.c8y = c8y
+        self.tenant = tenant
+        self.devices: Dict[str, _Device] = {}
+        self.watches: List[Watch] = []
+        self.interval = settings.operations_poll_min
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        # Requests in flight, by resource and parameters
+        self._requests: Dict[Tuple, asyncio.Future] = {}
+
+    def apply(self, operation: OperationRecord) -> bool:
+        """Record the state of an operation, passing status changes to the watches."""
+        device = self.devices.get(str(operation.deviceId))
+        if device is None:
+            return False
+        known = device.operations.get(operation.id)
+        if known is not None and known.status == operation.status:
+            device.operations[operation.id] = operation
+            return False
+        if known is None and (
+            not device.complete
+            or (
+                operation.status in FINAL_STATUSES
+                and _age(operation) < device.registered - CLOCK_SKEW
+            )
+        ):
+            # Older operations of the device, not created during a watch
+            if operation.id in self._watched_ids():
+                device.operations[operation.id] = operation
+            return False
+        device.operations[operation.id] = operation
+        previous = known.status if known is not None else None
+        for watch in self.watches:
+            if watch.matches(operation):
+                watch.transitions.append(Transition(operation, previous))
+                watch.changed.set()
+        return True
+
+    def _watched_ids(self):
+        return set().union(*(watch.operation_ids for watch in self.watches))
+
+    def _find(self, operation_id: str) -> Optional[OperationRecord]:
+        for device in self.devices.values():
+            operation = device.operations.get(operation_id)
+            if operation is not None:
+                return operation
+        return None
+
+    def _add(self, data: Dict[str, Any]) -> None:
+        operation = OperationRecord.from_json(data)
+        device = self.devices.setdefault(str(operation.deviceId), _Device())
+        if operation.id in device.operations:
+            self.apply(operation)
+        else:
+            device.operations[operation.id] = operation
+
+    async def _get(self, resource: str, **params) -> Dict[str, Any]:
+        """GET a resource, sharing the request with concurrent callers."""
+        key = (resource, tuple(sorted(params.items())))
+        task = self._requests.get(key)
+        if task is None:
+
+            async def fetch():
+                # Shared by the watches, so not bound to the deadline of one call
+                deadlines.current_scope.set(None)
+                return await asyncio.to_thread(self.c8y.get, resource, params=params)
+
+            task = asyncio.ensure_future(fetch())
+            self._requests[key] = task
+            task.add_done_callback(lambda _: self._requests.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _register(self, watch: Watch) -> None:
+        """Fetch the watched operations and unfinished device operations not known yet."""
+        requests = [
+            self._get(f"/devicecontrol/operations/{operation_id}")
+            for operation_id in watch.operation_ids
+            if self._find(operation_id) is None
+        ]
+        device_id = watch.device_id
+        device = self.devices.get(device_id) if device_id else None
+        if device_id and (device is None or not device.complete):
+            requests += [
+                self._get(
+                    "/devicecontrol/operations",
+                    deviceId=device_id,
+                    status=status,
+                    pageSize=PAGE_SIZE,
+                )
+                for status in UNFINISHED_STATUSES
+            ]
+        for result in await asyncio.gather(*requests):
+            for data in result.get("operations", [result]):
+                self._add(data)
+        if device_id:
+            device = self.devices.setdefault(device_id, _Device())
+            if not device.complete:
+                device.complete = True
+                device.registered = time.time()
+
+    def current(self, watch: Watch) -> List[OperationRecord]:
+        """Known state of the operations of a watch (and unfinished ones of its device)."""
+        operations = {}
+        for operation_id in watch.operation_ids:
+            operation = self._find(operation_id)
+            if operation is not None:
+                operations[operation_id] = operation
+        device = self.devices.get(watch.device_id) if watch.device_id else None
+        if device is not None:
+            for operation in device.operations.values():
+                if operation.status not in FINAL_STATUSES:
+                    operations[operation.id] = operation
+        # Numeric IDs in ascending order
+        return sorted(operations.values(), key=lambda o: (len(o.id or ""), o.id or ""))
+
+    def _since(self, device_id: str, device: _Device) -> Optional[float]:
+        """Start of the creation times to poll for a device (None: nothing to poll)."""
+        times = [
+            _age(operation)
+            for operation in device.operations.values()
+            if operation.status not in FINAL_STATUSES
+        ]
+        if any(watch.device_id == device_id for watch in self.watches):
+            times.append(device.registered - CLOCK_SKEW)
+        return min(times) if times else None
+
+    def _prune(self) -> None:
+        """Forget the devices and operations no watch needs any more."""
+        watched_ids = self._watched_ids()
+        for device_id, device in list(self.devices.items()):
+            if any(watch.device_id == device_id for watch in self.watches):
+                continue
+            device.complete = False
+            device.operations = {
+                operation_id: operation
+                for operation_id, operation in device.operations.items()
+                if operation_id in watched_ids
+            }
+            if not device.operations:
+                del self.devices[device_id]
+
+    async def _poll(self) -> bool:
+        global _polls_total
+        polls = []
+        for device_id, device in self.devices.items():
+            since = self._since(device_id, device)
+            if since is not None:
+                polls.append((device_id, format_time(since)))
+        _polls_total += len(polls)
+        results = await asyncio.gather(
+            *(
+                self._get(
+                    "/devicecontrol/operations",
+                    deviceId=device_id,
+                    dateFrom=since,
+                    pageSize=PAGE_SIZE,
+                )
+                for device_id, since in polls
+            ),
+            return_exceptions=True,
+        )
+        changed = False
+        for (device_id, _), result in zip(polls, results):
+            if isinstance(result, Exception):
+                logger.warning(
+                    f"Could not poll the operations of device {device_id}: {result}"
+                )
+                continue
+            for data in result.get("operations", []):
+                changed = self.apply(OperationRecord.from_json(data)) or changed
+        return changed
+
+    async def _run(self) -> None:
+        # Shared by the watches, so not bound to the deadline of one call
+        deadlines.current_scope.set(None)
+        while self.watches:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+                self._wakeup.clear()
+                self.interval = settings.operations_poll_min
+                continue
+            except asyncio.TimeoutError:
+                pass
+            changed = await self._poll()
+            if self.tenant == "" and realtime.is_connected():
+                # Notifications deliver the changes, polling is a fallback
+                self.interval = settings.operations_poll_max
+            elif changed:
+                self.interval = settings.operations_poll_min
+            else:
+                self.interval = min(self.interval * 2, settings.operations_poll_max)
+
+    async def watch(
+        self,
+        operation_ids: Sequence[str],
+        device_id: Optional[str],
+        timeout: float,
+    ) -> Tuple[List[Transition], List[OperationRecord]]:
+        """Wait up to timeout seconds for transitions of the watched operations.
+
+        Returns:
+            The transitions, and the state of the watched operations at the end
+        """
+        watch = Watch(operation_ids, device_id)
+        self.watches.append(watch)
+        try:
+            await self._register(watch)
+            current = self.current(watch)
+            if device_id is None and all(
+                operation.status in FINAL_STATUSES for operation in current
+            ):
+                # Nothing left to change
+                return watch.transitions, current
+            if self._task is None or self._task.done():
+                self.interval = settings.operations_poll_min
+                self._task = asyncio.create_task(self._run())
+            elif self.interval > settings.operations_poll_min:
+                self._wakeup.set()
+            try:
+                await asyncio.wait_for(watch.changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            return watch.transitions, self.current(watch)
+        finally:
+            self.watches.remove(watch)
+            self._prune()
+            if not self.watches:
+                if self._task is not None:
+                    self._task.cancel()
+                    self._task = None
+                if _pollers.get(id(self.c8y)) is self:
+                    del _pollers[id(self.c8y)]
+
+
+# Poller per client, so watches only see operations their credentials can read
+_pollers: Dict[int, OperationPoller] = {}
+
+
+def get_poller(c8y) -> OperationPoller:
+    poller = _pollers.get(id(c8y))
+    if poller is None or poller.c8y is not c8y:
+        poller = OperationPoller(c8y, tenancy.current_tenant.get())
+        _pollers[id(c8y)] = poller
+    return poller
+
+
+async def watch(
+    c8y,
+    operation_ids: Sequence[str],
+    device_id: Optional[str],
+    timeout: float,
+) -> Tuple[List[Transition], List[OperationRecord]]:
+    """Watch operations with the shared poller of a client (see OperationPoller.watch)."""
+    timeout = min(max(timeout, 0.0), MAX_WATCH)
+    remaining = deadlines.cap_timeout(None)
+    if remaining is not None:
+        # Return the transitions seen before the deadline of the tool call
+        timeout = min(timeout, max(remaining - 1.0, 0.0))
+    return await get_poller(c8y).watch(operation_ids, device_id, timeout)
+
+
+async def get_operations(c8y, operation_ids: Sequence[str]) -> List[OperationRecord]:
+    """Fetch operations by ID."""
+    results = await asyncio.gather(
+        *(
+            asyncio.to_thread(c8y.get, f"/devicecontrol/operations/{operation_id}")
+            for operation_id in operation_ids
+        )
+    )
+    return [OperationRecord.from_json(data) for data in results]
+
+
+def apply_notification(data: Dict[str, Any]) -> None:
+    """Apply a realtime operation notification of the service tenant."""
+    global _notifications_total
+    _notifications_total += 1
+    operation = OperationRecord.from_json(data)
+    for poller in list(_pollers.values()):
+        if poller.tenant == "":
+            poller.apply(operation)
+
+
+realtime.operation_listeners.append(apply_notification)
+
+
+def render_metrics() -> str:
+    """Render the operation watch metrics in the Prometheus text format."""
+    pollers = list(_pollers.values())
+    lines = [
+        "# HELP mcp_operation_watches Running operation watches",
+        "# TYPE mcp_operation_watches gauge",
+        f"mcp_operation_watches {sum(len(p.watches) for p in pollers)}",
+        "# HELP mcp_operation_watched_devices Devices polled for operation watches",
+        "# TYPE mcp_operation_watched_devices gauge",
+        f"mcp_operation_watched_devices {sum(len(p.devices) for p in pollers)}",
+        "# HELP mcp_operation_polls_total Upstream requests polling operations",
+        "# TYPE mcp_operation_polls_total counter",
+        f"mcp_operation_polls_total {_polls_total}",
+        "# HELP mcp_operation_notifications_total Realtime operation notifications",
+        "# TYPE mcp_operation_notifications_total counter",
+        f"mcp_operation_notifications_total {_notifications_total}",
+    ]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,283 @@
+"""
+Page-wise retrieval of Cumulocity collections with MCP progress reporting.
+
+``paginate`` learns the total number of pages from the first response and
+fetches the following pages concurrently (MCP_PAGE_CONCURRENCY at a time),
+while still delivering them in order. Only a window of pages ahead of the
+consumer is fetched, so memory stays bounded, and pages still in flight are
+cancelled when the consumer stops early or the tool call is cancelled.
+"""
+
+import asyncio
+import logging
+from collections import deque
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, NamedTuple
+from typing import Optional
+
+from fastmcp import Context
+
+from . import deadlines, settings
+from .streaming import MemoryBudget, PageBudget, read_page
+
+logger = logging.getLogger("mcp_server_c8y")
+
+
+def query_params(**params) -> Dict[str, Any]:
+    """Build collection query parameters, dropping unset (None or empty) values."""
+    result = {}
+    for key, value in params.items():
+        if value is None or value == "":
+            continue
+        if isinstance(value, bool):
+            value = "true" if value else "false"
+        result[key] = value
+    return result
+
+
+class ProgressReporter:
+    """Reports page progress of a tool call to the MCP client.
+
+    Progress notifications are only sent if the client asked for them by
+    providing a progress token. In that case the rows of each page are also
+    sent as a log message, so the client sees partial results after the first
+    upstream round trip.
+    """
+
+    def __init__(self, ctx: Optional[Context], pages: int):
+        self.ctx = ctx
+        self.pages = pages
+        self.pages_done = 0
+        self.rows = 0
+        self.enabled = False
+        if ctx is not None:
+            try:
+                meta = ctx.request_context.meta
+                self.enabled = meta is not None and meta.progressToken is not None
+            except (AttributeError, LookupError, ValueError):
+                self.enabled = False
+
+    async def page_done(self, rows: int, chunk: Optional[str] = None) -> None:
+        self.pages_done += 1
+        self.rows += rows
+        if not self.enabled:
+            return
+        try:
+            await self.ctx.report_progress(
+                self.pages_done,
+                self.pages,
+                message=f"Fetched page {self.pages_done} of {self.pages} ({self.rows} rows)",
+            )
+            if chunk:
+                await self.ctx.info(chunk, logger_name="partial_result")
+        except Exception as e:
+            # Progress is best effort, never fail the tool because of it
+            logger.debug(f"Could not report progress: {str(e)}")
+            self.enabled = False
+
+
+async def count_elements(c8y, resource: str, params: Dict[str, Any]) -> Optional[int]:
+    """Number of items of a collection matching params, None if not reported."""
+    result = await asyncio.to_thread(
+        c8y.get,
+        resource,
+        params={**params, "pageSize": 1, "withTotalElements": "true"},
+    )
+    return result.get("statistics", {}).get("totalElements")
+
+
+class Page(NamedTuple):
+    """A page delivered by paginate."""
+
+    number: int
+    items: List[Any]
+    # Bytes charged to the memory budget for the items
+    size: int
+    # Number of pages the retrieval covers at most
+    pages: int
+
+
+async def paginate(
+    c8y,
+    resource: str,
+    array_key: str,
+    params: Dict[str, Any],
+    page_size: int,
+    current_page: int = 1,
+    pages: int = 1,
+    parse: Callable[[dict], Any] = lambda item: item,
+    budget: Optional[MemoryBudget] = None,
+    max_rows: Optional[int] = None,
+    concurrency: Optional[int] = None,
+) -> AsyncIterator[Page]:
+    """Iterate over consecutive pages of a collection, fetching ahead concurrently.
+
+    Iteration stops after the last page, after max_rows items or once the
+    budget is exhausted. Use ``contextlib.aclosing`` when breaking out of the
+    loop early, so the pages fetched ahead are cancelled right away.
+
+    Args:
+        c8y: Cumulocity API client
+        resource: Collection resource, e.g. '/event/events'
+        array_key: Key of the item array in the response, e.g. 'events'
+        params: Query parameters (without paging parameters)
+        page_size: Number of items per page (max 2000)
+        current_page: First page to retrieve
+        pages: Maximum number of consecutive pages to retrieve
+        parse: Function creating an object from the JSON of an item
+        budget: Memory budget of the tool call (default: MCP_REQUEST_MEMORY_BUDGET)
+        max_rows: Maximum number of items to deliver
+        concurrency: Pages fetched at the same time (default: MCP_PAGE_CONCURRENCY)
+    """
+    page_size = min(page_size, 2000)
+    pages = max(pages, 1)
+    if budget is None:
+        budget = MemoryBudget()
+    concurrency = max(concurrency or settings.page_concurrency, 1)
+
+    async def fetch(page_number: int, with_total: bool = False):
+        page_params = {**params, "pageSize": page_size, "currentPage": page_number}
+        if with_total:
+            page_params["withTotalPages"] = "true"
+        page_budget = PageBudget(budget)
+        page_items, result = await asyncio.to_thread(
+            read_page, c8y, resource, page_params, array_key, parse, page_budget
+        )
+        return page_items, result, page_budget
+
+    last_page = current_page + pages - 1
+    if max_rows is not None:
+        last_page = min(last_page, current_page + max(-(-max_rows // page_size), 1) - 1)
+    pending: Deque[asyncio.Task] = deque()
+    try:
+        page_items, result, page_budget = await fetch(current_page, pages > 1)
+        total_pages = result.get("statistics", {}).get("totalPages")
+        if total_pages is not None:
+            last_page = max(min(last_page, total_pages), current_page)
+        next_page = current_page + 1
+        page_number = current_page
+        largest_page = 0
+        rows = 0
+        while True:
+            if max_rows is not None and rows + len(page_items) >= max_rows:
+                page_items = page_items[: max_rows - rows]
+                last_page = page_number
+            rows += len(page_items)
+            if page_budget.truncated or len(page_items) < page_size:
+                last_page = page_number
+
+            # Keep the next pages in flight while the consumer handles this one,
+            # but not more than are expected to fit into the remaining budget
+            window = concurrency
+            largest_page = max(largest_page, page_budget.used)
+            if budget.remaining >= 0 and largest_page > 0:
+                window = min(window, max(budget.remaining // largest_page, 1))
+            while next_page <= last_page and len(pending) < window:
+                pending.append(asyncio.create_task(fetch(next_page)))
+                next_page += 1
+            yield Page(
+                page_number,
+                page_items,
+                page_budget.used,
+                last_page - current_page + 1,
+            )
+            if page_number >= last_page or not pending:
+                break
+            page_items, result, page_budget = await pending.popleft()
+            page_number += 1
+    finally:
+        scope = deadlines.current_scope.get()
+        if scope is not None and scope.cancelled:
+            deadlines.count(
+                "skipped_pages", amount=sum(not task.done() for task in pending)
+            )
+        for task in pending:
+            task.cancel()
+            task.add_done_callback(_discard)
+
+
+def _discard(task: asyncio.Task) -> None:
+    # Mark errors of pages which are not needed anymore as retrieved
+    if not task.cancelled():
+        task.exception()
+
+
+async def fetch_pages(
+    c8y,
+    resource: str,
+    array_key: str,
+    params: Dict[str, Any],
+    page_size: int,
+    current_page: int = 1,
+    pages: int = 1,
+    parse: Callable[[dict], Any] = lambda item: item,
+    ctx: Optional[Context] = None,
+    format_chunk: Optional[Callable[[List[Any]], str]] = None,
+    budget: Optional[MemoryBudget] = None,
+    sink: Optional[Callable[[List[Any]], None]] = None,
+    max_rows: Optional[int] = None,
+) -> List[Any]:
+    """Fetch consecutive pages of a collection, reporting progress per page.
+
+    Pages after the first are fetched concurrently, see ``paginate``.
+
+    Args:
+        c8y: Cumulocity API client
+        resource: Collection resource, e.g. '/event/events'
+        array_key: Key of the item array in the response, e.g. 'events'
+        params: Query parameters (without paging parameters)
+        page_size: Number of items per page (max 2000)
+        current_page: First page to retrieve
+        pages: Number of consecutive pages to retrieve
+        parse: Function creating an object from the JSON of an item
+        ctx: MCP context used to report progress
+        format_chunk: Function formatting the items of one page as partial result
+        budget: Memory budget of the tool call (default: MCP_REQUEST_MEMORY_BUDGET).
+            Retrieval stops early once it is exhausted, see budget.exhausted.
+        sink: Function consuming the parsed items of each page. The items are not
+            kept then, so only the pages in flight are held at a time.
+        max_rows: Maximum number of items to retrieve
+
+    Returns:
+        List of parsed items of all retrieved pages (empty if sink is given)
+    """
+    if budget is None:
+        budget = MemoryBudget()
+    reporter = ProgressReporter(ctx, max(pages, 1))
+    items: List[Any] = []
+    count = 0
+
+    async with aclosing(
+        paginate(
+            c8y,
+            resource,
+            array_key,
+            params,
+            page_size,
+            current_page,
+            pages,
+            parse,
+            budget,
+            max_rows,
+        )
+    ) as page_iterator:
+        async for page in page_iterator:
+            count += len(page.items)
+            if sink is not None:
+                sink(page.items)
+                budget.release(page.size)
+            else:
+                items.extend(page.items)
+
+            reporter.pages = page.pages
+            chunk = None
+            if reporter.enabled and format_chunk is not None and page.items:
+                chunk = format_chunk(page.items)
+            await reporter.page_done(len(page.items), chunk)
+
+    if budget.exhausted and count == 0:
+        raise ValueError(
+            f"A single item of {resource} exceeds the memory budget of "
+            f"{budget.limit} bytes per request (MCP_REQUEST_MEMORY_BUDGET)"
+        )
+    return items
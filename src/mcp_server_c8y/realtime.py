@@ -0,0 +1,284 @@
+"""
+Realtime notifications keeping the caches up to date.
+
+An optional background subscriber connects to the Cumulocity realtime
+notification endpoint (CometD/Bayeux with long-polling) and updates or
+invalidates cached managed objects, alarm and event results as soon as the
+platform reports a change. While the subscriber is connected, cached data is
+served for much longer than the regular cache TTL.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+from . import search, settings
+from .cache import get_cache, invalidate_results
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+logger = logging.getLogger("mcp_server_c8y")
+
+CHANNELS = ["/managedobjects/*", "/alarms/*", "/events/*", "/operations/*"]
+
+# Long-polling requests are held open by the platform for up to this time
+CONNECT_TIMEOUT = 90.0
+
+HEARTBEAT_KEY = "heartbeat"
+
+# Callbacks receiving the data of operation notifications (see operations)
+operation_listeners: List[Callable[[Dict[str, Any]], None]] = []
+
+
+def is_active() -> bool:
+    """Whether a subscriber (in this or another worker) is currently connected."""
+    if not settings.realtime_enabled:
+        return False
+    heartbeat = get_cache("realtime").get(HEARTBEAT_KEY, max_age=float("inf"))
+    return heartbeat is not None and time.time() - heartbeat < CONNECT_TIMEOUT + 30
+
+
+def is_connected() -> bool:
+    """Whether the subscriber of this process is connected, so notifications arrive here."""
+    return _subscriber is not None and _subscriber.client_id is not None
+
+
+def max_age() -> Optional[float]:
+    """Maximum age of cached data kept current by the subscriber (None: regular TTL)."""
+    return settings.realtime_cache_ttl if is_active() else None
+
+
+def _references(data: Dict[str, Any], fragment: str) -> List[str]:
+    try:
+        return [ref["managedObject"]["id"] for ref in data[fragment]["references"]]
+    except (KeyError, TypeError):
+        return []
+
+
+def apply_notification(channel: str, notification: Dict[str, Any]) -> None:
+    """Update the caches according to a realtime notification.
+
+    Args:
+        channel: Notification channel, e.g. '/managedobjects/12345'
+        notification: Notification data with 'realtimeAction' and 'data'
+    """
+    action = notification.get("realtimeAction")
+    data = notification.get("data")
+    source_id = channel.rsplit("/", 1)[-1]
+
+    if channel.startswith("/managedobjects/"):
+        inventory = get_cache("inventory")
+        hierarchy = get_cache("hierarchy")
+        if action == "DELETE" or not isinstance(data, dict):
+            inventory.delete(source_id)
+            search.apply_notification(source_id, None)
+        else:
+            inventory.set(source_id, data)
+            search.apply_notification(source_id, data)
+            # Children list this object as parent in their hierarchy
+            for child_id in _references(data, "childAssets") + _references(
+                data, "childDevices"
+            ):
+                hierarchy.delete(child_id)
+        hierarchy.delete(source_id)
+    elif channel.startswith("/alarms/"):
+        invalidate_results("alarms", source_id)
+    elif channel.startswith("/events/"):
+        invalidate_results("events", source_id)
+    elif channel.startswith("/operations/"):
+        if action == "DELETE" or not isinstance(data, dict):
+            return
+        for listener in operation_listeners:
+            listener(data)
+
+
+class RealtimeSubscriber:
+    """Background CometD client subscribed to inventory, alarm and event changes."""
+
+    def __init__(self, base_url: str, auth: httpx.Auth):
+        self.url = base_url.rstrip("/") + "/notification/realtime"
+        self.client = httpx.AsyncClient(
+            auth=auth, timeout=httpx.Timeout(10.0, read=CONNECT_TIMEOUT)
+        )
+        self.client_id: Optional[str] = None
+        # Seconds to wait before the next connect, as advised by the platform
+        self.interval = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _send(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        response = await self.client.post(self.url, json=messages)
+        response.raise_for_status()
+        return response.json()
+
+    async def _handshake(self) -> None:
+        replies = await self._send(
+            [
+                {
+                    "channel": "/meta/handshake",
+                    "version": "1.0",
+                    "minimumVersion": "1.0",
+                    "supportedConnectionTypes": ["long-polling"],
+                }
+            ]
+        )
+        reply = replies[0]
+        self._apply_advice(reply)
+        if not reply.get("successful"):
+            raise ConnectionError(f"Handshake failed: {reply.get('error')}")
+        client_id = reply["clientId"]
+
+        replies = await self._send(
+            [
+                {"channel": "/meta/subscribe", "clientId": client_id, "subscription": c}
+                for c in CHANNELS
+            ]
+        )
+        for reply in replies:
+            if not reply.get("successful"):
+                raise ConnectionError(
+                    f"Subscription to {reply.get('subscription')} failed: {reply.get('error')}"
+                )
+
+        # Changes may have been missed while not connected. The entries are
+        # kept, so a restarted server still answers from its persisted cache
+        # while they are revalidated
+        get_cache("inventory").mark_stale()
+        get_cache("hierarchy").mark_stale()
+        invalidate_results("alarms", None)
+        invalidate_results("events", None)
+
+        self.client_id = client_id
+        logger.info(f"Subscribed to realtime notifications ({', '.join(CHANNELS)})")
+
+    def _apply_advice(self, reply: Dict[str, Any]) -> Dict[str, Any]:
+        advice = reply.get("advice") or {}
+        if isinstance(advice.get("interval"), (int, float)):
+            self.interval = max(advice["interval"], 0) / 1000
+        return advice
+
+    async def _connect(self) -> None:
+        """Receive the next notifications.
+
+        Raises:
+            ConnectionError: if the platform rejected the connect
+        """
+        messages = await self._send(
+            [
+                {
+                    "channel": "/meta/connect",
+                    "clientId": self.client_id,
+                    "connectionType": "long-polling",
+                }
+            ]
+        )
+        rejected = None
+        for message in messages:
+            channel = message.get("channel", "")
+            if channel == "/meta/connect":
+                advice = self._apply_advice(message)
+                if not message.get("successful") or advice.get("reconnect") in (
+                    "handshake",
+                    "none",
+                ):
+                    rejected = (
+                        message.get("error") or advice.get("reconnect") or "unknown"
+                    )
+            elif not channel.startswith("/meta/"):
+                try:
+                    apply_notification(channel, message.get("data") or {})
+                except Exception as e:
+                    logger.warning(
+                        f"Could not apply notification on {channel}: {str(e)}"
+                    )
+        if rejected is not None:
+            raise ConnectionError(f"Connect rejected: {rejected}")
+
+    async def run(self) -> None:
+        backoff = 1.0
+        heartbeats = get_cache("realtime")
+        while True:
+            try:
+                if self.client_id is None:
+                    await self._handshake()
+                heartbeats.set(HEARTBEAT_KEY, time.time())
+                await self._connect()
+                heartbeats.set(HEARTBEAT_KEY, time.time())
+                backoff = 1.0
+                if self.interval > 0:
+                    await asyncio.sleep(self.interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Realtime notifications interrupted: {str(e)}")
+                self.client_id = None
+                heartbeats.delete(HEARTBEAT_KEY)
+                # Also when the platform keeps rejecting connects
+                await asyncio.sleep(max(backoff, self.interval))
+                backoff = min(backoff * 2, 60.0)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        get_cache("realtime").delete(HEARTBEAT_KEY)
+        if self.client_id is not None:
+            try:
+                await self._send(
+                    [{"channel": "/meta/disconnect", "clientId": self.client_id}]
+                )
+            except Exception:
+                pass
+        await self.client.aclose()
+
+
+_lock_file = None
+
+# Subscriber running in this process
+_subscriber: Optional[RealtimeSubscriber] = None
+
+
+def _acquire_subscriber_lock() -> bool:
+    """Ensure only one worker sharing a file or SQLite cache runs a subscriber."""
+    global _lock_file
+    if settings.cache_backend not in ("file", "sqlite") or fcntl is None:
+        return True
+    directory = get_cache("realtime").directory
+    _lock_file = open(os.path.join(directory, "subscriber.lock"), "w")
+    try:
+        fcntl.flock(_lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        _lock_file.close()
+        _lock_file = None
+        return False
+
+
+def start(base_url: str, auth: httpx.Auth) -> Optional[RealtimeSubscriber]:
+    """Start the subscriber if realtime notifications are enabled.
+
+    Returns:
+        The running subscriber, or None if disabled or run by another worker
+    """
+    global _subscriber
+    if not settings.realtime_enabled:
+        return None
+    if not _acquire_subscriber_lock():
+        logger.info("Realtime notifications are handled by another worker")
+        return None
+    subscriber = RealtimeSubscriber(base_url, auth)
+    subscriber.start()
+    _subscriber = subscriber
+    return subscriber
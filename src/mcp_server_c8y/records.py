@@ -0,0 +1,207 @@
+"""
+Lightweight records for the rows of the list tools.
+
+Parsing a page into full ``c8y_api`` model objects costs far more time and
+memory than rendering it, and the objects are discarded right after
+formatting. The records below only hold the fields the formatters read,
+use ``__slots__`` and are attribute-compatible with the formatter
+extractors. Pages are decoded with orjson if it is installed
+(``pip install mcp-server-c8y[fast]``).
+"""
+
+import json
+from typing import Any, Dict, Optional
+
+from c8y_api import AccessDeniedError, UnauthorizedError
+
+try:
+    import orjson
+
+    loads = orjson.loads
+except ImportError:  # pragma: no cover - optional dependency
+    loads = json.loads
+
+
+def check_response(response, resource: str) -> None:
+    """Raise the exceptions of ``c8y.get`` for an unsuccessful response."""
+    status = response.status_code
+    url = response.url
+    if status == 401:
+        raise UnauthorizedError("GET", url)
+    if status == 403:
+        raise AccessDeniedError("GET", url)
+    if status == 404:
+        raise KeyError(f"No such object: {resource}")
+    if 500 <= status <= 599:
+        raise SyntaxError(
+            f"Invalid GET request. Status: {status} Response:\n" + response.text
+        )
+    if status != 200:
+        raise ValueError(
+            f"Unable to perform GET request. Status: {status} Response:\n"
+            + response.text
+        )
+
+
+def _source_id(data: Dict[str, Any]) -> Optional[str]:
+    source = data.get("source")
+    return source.get("id") if isinstance(source, dict) else source
+
+
+class Fragment:
+    """Attribute access to the values of a JSON fragment, e.g. ``c8y_Availability.status``."""
+
+    __slots__ = ("_data",)
+
+    def __init__(self, data: Dict[str, Any]):
+        self._data = data
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self._data[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+class DeviceRecord:
+    """Managed object row; fragments are available as attributes."""
+
+    __slots__ = ("id", "name", "type", "owner", "_fragments")
+
+    STANDARD = frozenset(("id", "name", "type", "owner", "self"))
+
+    def __init__(self, id, name=None, type=None, owner=None, fragments=None):
+        self.id = id
+        self.name = name
+        self.type = type
+        self.owner = owner
+        self._fragments = fragments or {}
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "DeviceRecord":
+        return cls(
+            data.get("id"),
+            data.get("name"),
+            data.get("type"),
+            data.get("owner"),
+            {
+                key: value
+                for key, value in data.items()
+                if key not in cls.STANDARD and isinstance(value, dict)
+            },
+        )
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return Fragment(self._fragments[name])
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+class AlarmRecord:
+    __slots__ = ("id", "source", "type", "severity", "status", "time", "count", "text")
+
+    def __init__(self, id, source, type, severity, status, time, count, text):
+        self.id = id
+        self.source = source
+        self.type = type
+        self.severity = severity
+        self.status = status
+        self.time = time
+        self.count = count
+        self.text = text
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "AlarmRecord":
+        return cls(
+            data.get("id"),
+            _source_id(data),
+            data.get("type"),
+            data.get("severity"),
+            data.get("status"),
+            data.get("time"),
+            data.get("count"),
+            data.get("text", ""),
+        )
+
+
+class EventRecord:
+    __slots__ = ("id", "source", "type", "time", "text", "creationTime")
+
+    def __init__(self, id, source, type, time, text, creationTime):
+        self.id = id
+        self.source = source
+        self.type = type
+        self.time = time
+        self.text = text
+        self.creationTime = creationTime
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "EventRecord":
+        return cls(
+            data.get("id"),
+            _source_id(data),
+            data.get("type"),
+            data.get("time"),
+            data.get("text"),
+            data.get("creationTime"),
+        )
+
+
+class MeasurementRecord:
+    """Measurement row; ``fragments`` holds the series by fragment."""
+
+    __slots__ = ("id", "source", "type", "time", "fragments")
+
+    STANDARD = frozenset(("id", "self", "source", "type", "time", "creationTime"))
+
+    def __init__(self, id, source, type, time, fragments):
+        self.id = id
+        self.source = source
+        self.type = type
+        self.time = time
+        self.fragments = fragments
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "MeasurementRecord":
+        return cls(
+            data.get("id"),
+            _source_id(data),
+            data.get("type"),
+            data.get("time"),
+            {
+                key: value
+                for key, value in data.items()
+                if key not in cls.STANDARD and isinstance(value, dict)
+            },
+        )
+
+
+class OperationRecord:
+    __slots__ = (
+        "id",
+        "deviceId",
+        "status",
+        "creationTime",
+        "failureReason",
+        "description",
+    )
+
+    def __init__(self, id, deviceId, status, creationTime, failureReason, description):
+        self.id = id
+        self.deviceId = deviceId
+        self.status = status
+        self.creationTime = creationTime
+        self.failureReason = failureReason
+        self.description = description
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "OperationRecord":
+        return cls(
+            data.get("id"),
+            data.get("deviceId"),
+            data.get("status"),
+            data.get("creationTime"),
+            data.get("failureReason"),
+            data.get("description"),
+        )
@@ -0,0 +1,174 @@
+"""
+Protection against slow and failing Cumulocity endpoints.
+
+- Deadlines: every request gets a total time limit, configurable per
+  resource path.
+- Hedging: an idempotent request still running after the usual latency of
+  its endpoint (a configurable percentile) is sent a second time, if the
+  governor has a free slot, and the first response wins.
+- Circuit breaker: an endpoint whose recent requests mostly failed is not
+  called for a while; callers fail fast and may fall back to stale data.
+
+Endpoints are identified by method and path with numeric IDs replaced, e.g.
+'GET /inventory/managedObjects/{id}'.
+"""
+
+import logging
+import re
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+
+from . import settings
+
+logger = logging.getLogger("mcp_server_c8y")
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an endpoint whose circuit breaker is open."""
+
+
+# Upstream failures for which callers may fall back to stale cached data
+UNAVAILABLE_ERRORS: Tuple[type, ...] = (
+    CircuitOpenError,
+    requests.exceptions.RequestException,
+    # Raised by c8y_api for 5xx responses
+    SyntaxError,
+)
+
+
+ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+def endpoint_key(request) -> str:
+    path = ID_SEGMENT.sub("/{id}", urlsplit(request.url).path)
+    return f"{request.method} {path}"
+
+
+def deadline_for(request) -> float:
+    """Total time limit of a request (longest matching MCP_UPSTREAM_TIMEOUTS prefix)."""
+    path = urlsplit(request.url).path
+    best = None
+    for prefix, seconds in settings.upstream_timeouts.items():
+        if path.startswith(prefix) and (best is None or len(prefix) > len(best[0])):
+            best = (prefix, seconds)
+    return best[1] if best is not None else settings.upstream_timeout
+
+
+class LatencyTracker:
+    """Recent latencies of an endpoint, used to decide when to hedge."""
+
+    # Minimum number of samples before requests are hedged
+    MIN_SAMPLES = 20
+
+    def __init__(self, size: int = 200):
+        self._samples: deque = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def hedge_delay(self) -> Optional[float]:
+        """Delay after which to send a hedged request (None: do not hedge)."""
+        if settings.hedge_percentile <= 0:
+            return None
+        with self._lock:
+            if len(self._samples) < self.MIN_SAMPLES:
+                return None
+            samples = sorted(self._samples)
+        index = min(
+            int(len(samples) * settings.hedge_percentile / 100), len(samples) - 1
+        )
+        return max(samples[index], settings.hedge_min_delay)
+
+
+class CircuitBreaker:
+    """Closed/open/half-open circuit breaker over a window of recent outcomes."""
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.state = "closed"
+        self.opened_at = 0.0
+        self._outcomes: deque = deque(maxlen=settings.breaker_window)
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_request(self) -> None:
+        """Raise CircuitOpenError unless the endpoint may be called."""
+        with self._lock:
+            if self.state == "closed":
+                return
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < settings.breaker_open_seconds:
+                    raise CircuitOpenError(
+                        f"{self.endpoint} is failing, not calling it for now"
+                    )
+                self.state = "half-open"
+                self._probing = False
+            # Half-open: let a single probe request through
+            if self._probing:
+                raise CircuitOpenError(f"{self.endpoint} is being probed")
+            self._probing = True
+
+    def abandon(self) -> None:
+        """Forget a request which was given up without an outcome."""
+        with self._lock:
+            self._probing = False
+
+    def record(self, success: bool) -> None:
+        with self._lock:
+            if self.state == "half-open":
+                self._probing = False
+                if success:
+                    logger.info(f"Circuit of {self.endpoint} closed again")
+                    self.state = "closed"
+                    self._outcomes.clear()
+                else:
+                    self.state = "open"
+                    self.opened_at = time.monotonic()
+                return
+            self._outcomes.append(success)
+            failures = self._outcomes.count(False)
+            if (
+                len(self._outcomes) >= settings.breaker_min_requests
+                and failures / len(self._outcomes) >= settings.breaker_threshold
+            ):
+                logger.warning(
+                    f"Opening circuit of {self.endpoint}: {failures} of the last "
+                    f"{len(self._outcomes)} requests failed"
+                )
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+
+_latencies: Dict[Tuple[str, str], LatencyTracker] = {}
+_breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+_lock = threading.Lock()
+
+
+def get_latency_tracker(tenant: str, endpoint: str) -> LatencyTracker:
+    with _lock:
+        return _latencies.setdefault((tenant, endpoint), LatencyTracker())
+
+
+def get_breaker(tenant: str, endpoint: str) -> CircuitBreaker:
+    with _lock:
+        breaker = _breakers.get((tenant, endpoint))
+        if breaker is None:
+            breaker = _breakers[(tenant, endpoint)] = CircuitBreaker(endpoint)
+        return breaker
+
+
+def open_circuits() -> Dict[Tuple[str, str], str]:
+    """States of all circuit breakers which are not closed, by (tenant, endpoint)."""
+    with _lock:
+        return {
+            key: breaker.state
+            for key, breaker in _breakers.items()
+            if breaker.state != "closed"
+        }
@@ -0,0 +1,152 @@
+"""
+Fleet health rollup over the device inventory.
+
+``FleetHealth`` aggregates the availability status and the active alarm
+counts of devices page by page. It keeps one set of counters per group
+(device type and/or owner) and the N worst devices, so the whole inventory
+never has to be held in memory.
+"""
+
+import heapq
+from typing import Any, Dict, List, Sequence, Tuple
+
+from .formatters import TableFormatter
+
+GROUP_KEYS = ("type", "owner")
+
+SEVERITIES = ("critical", "major", "minor", "warning")
+
+# Further groups are counted as "(other)"
+MAX_GROUPS = 100
+
+OTHER = "(other)"
+
+
+def parse_group_by(group_by: str) -> Tuple[str, ...]:
+    """Parse a comma-separated list of group keys.
+
+    Raises:
+        ValueError: if a key is not one of GROUP_KEYS
+    """
+    keys = tuple(key.strip().lower() for key in group_by.split(",") if key.strip())
+    if not keys or any(key not in GROUP_KEYS for key in keys):
+        raise ValueError(
+            f"Invalid group_by '{group_by}', use 'type', 'owner' or 'type,owner'"
+        )
+    return keys
+
+
+def _availability(device: Any) -> str:
+    try:
+        return str(device.c8y_Availability.status or "UNKNOWN")
+    except AttributeError:
+        return "UNKNOWN"
+
+
+def _alarm_counts(device: Any) -> Tuple[int, ...]:
+    try:
+        status = device.c8y_ActiveAlarmsStatus
+    except AttributeError:
+        return (0,) * len(SEVERITIES)
+    return tuple(int(getattr(status, severity, 0) or 0) for severity in SEVERITIES)
+
+
+class _Group:
+    __slots__ = ("devices", "availability", "alarms", "alarming")
+
+    def __init__(self):
+        self.devices = 0
+        self.availability: Dict[str, int] = {}
+        self.alarms = [0] * len(SEVERITIES)
+        self.alarming = 0
+
+
+class FleetHealth:
+    """Availability and active alarm distributions per group, plus the worst devices."""
+
+    def __init__(self, keys: Sequence[str], top: int = 10):
+        self.keys = tuple(keys)
+        self.top = top
+        self.groups: Dict[Tuple[str, ...], _Group] = {}
+        self.statuses: Dict[str, None] = {}
+        self.total = 0
+        # Min-heap of the worst devices: (severity tuple, unavailable, id, row)
+        self._worst: List[Tuple] = []
+
+    def add(self, devices: List[Any]) -> None:
+        """Add the devices of a page."""
+        for device in devices:
+            availability = _availability(device)
+            alarms = _alarm_counts(device)
+            key = tuple(str(getattr(device, k, None) or "Unknown") for k in self.keys)
+            group = self.groups.get(key)
+            if group is None:
+                if len(self.groups) >= MAX_GROUPS:
+                    key = (OTHER,) * len(self.keys)
+                    group = self.groups.get(key)
+                if group is None:
+                    group = self.groups[key] = _Group()
+
+            self.total += 1
+            self.statuses[availability] = None
+            group.devices += 1
+            group.availability[availability] = (
+                group.availability.get(availability, 0) + 1
+            )
+            for i, count in enumerate(alarms):
+                group.alarms[i] += count
+            if any(alarms):
+                group.alarming += 1
+
+            unavailable = availability == "UNAVAILABLE"
+            if self.top > 0 and (any(alarms) or unavailable):
+                entry = (
+                    alarms,
+                    unavailable,
+                    str(device.id),
+                    [
+                        str(device.id),
+                        str(device.name or "Unknown"),
+                        str(device.type or "Unknown"),
+                        str(device.owner or "Unknown"),
+                        availability,
+                        *alarms,
+                    ],
+                )
+                if len(self._worst) < self.top:
+                    heapq.heappush(self._worst, entry)
+                elif entry[:3] > self._worst[0][:3]:
+                    heapq.heapreplace(self._worst, entry)
+
+    def groups_table(self, tablefmt: str = "tsv") -> str:
+        statuses = sorted(self.statuses)
+        rows = []
+        for key, group in sorted(
+            self.groups.items(),
+            key=lambda item: (item[0][0] == OTHER, -item[1].devices),
+        ):
+            rows.append(
+                list(key)
+                + [group.devices]
+                + [group.availability.get(status, 0) for status in statuses]
+                + group.alarms
+                + [group.alarming]
+            )
+        headers = (
+            [key.capitalize() for key in self.keys]
+            + ["Devices"]
+            + [status.capitalize() for status in statuses]
+            + [f"{severity.capitalize()} Alarms" for severity in SEVERITIES]
+            + ["Devices With Alarms"]
+        )
+        return TableFormatter.print_table(headers, rows, tablefmt)
+
+    def worst_table(self, tablefmt: str = "tsv") -> str:
+        rows = [
+            entry[3]
+            for entry in sorted(self._worst, key=lambda entry: entry[:3], reverse=True)
+        ]
+        headers = ["Device ID", "Device Name", "Device Type", "Device Owner"]
+        headers += ["Device Availability"]
+        headers += [f"{severity.capitalize()} Alarms" for severity in SEVERITIES]
+        return TableFormatter.print_table(headers, rows, tablefmt)
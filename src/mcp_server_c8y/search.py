@@ -0,0 +1,298 @@
+"""
+Local fuzzy search over device names, types and serial numbers.
+
+``DeviceIndex`` is a trigram inverted index over all devices of the tenant.
+Names are normalized before indexing ("Pump-03", "pump 3" and "PUMP3" all
+become "pump3"), and matches are ranked by the trigram similarity (Dice
+coefficient) of the best matching field, so typos like "pmp3" still find
+"Pump-03".
+
+The index is loaded on first use and refreshed with delta queries for
+devices updated since the newest ``lastUpdated`` seen, at most every
+MCP_SEARCH_REFRESH seconds. Deleted devices are removed by realtime
+notifications (if enabled) and by a full rebuild every MCP_SEARCH_REBUILD
+seconds, which runs in the background while searches are served from the
+previous index. Once the index reaches MCP_SEARCH_MAX_BYTES, further devices
+are not indexed and searches report the index as incomplete. In multi-tenant
+mode every tenant has its own index, loaded independently of the others.
+"""
+
+import asyncio
+import logging
+import re
+import time
+from array import array
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from . import deadlines, settings, tenancy
+from .formatters import clean_text
+from .pagination import fetch_pages, query_params
+from .streaming import MemoryBudget
+from .timeseries import format_time, parse_time
+
+logger = logging.getLogger("mcp_server_c8y")
+
+# Separates the fields of a stored document
+SEPARATOR = "\x1f"
+
+# Seconds subtracted from the newest lastUpdated for delta queries
+DELTA_OVERLAP = 60.0
+
+# Trigrams occurring in more documents than this are only used to find
+# candidates if the query has no rarer trigrams, and then only the rarest
+COMMON_FRACTION = 0.05
+COMMON_TRIGRAMS = 3
+
+# Memory use per document (besides its text) and per posting entry, as
+# measured with scripts/bench_search.py
+DOCUMENT_OVERHEAD = 140
+POSTING_SIZE = 4
+
+_TOKEN = re.compile(r"[a-z]+|\d+")
+
+
+def normalize(text: Optional[str]) -> str:
+    """Lowercase letters and digits only, numbers without leading zeros."""
+    text = text or ""
+    if not text.isascii():
+        text = clean_text(text)
+    tokens = _TOKEN.findall(text.lower())
+    return "".join(
+        token.lstrip("0") or "0" if token.isdigit() else token for token in tokens
+    )
+
+
+def trigrams(normalized: str) -> Set[str]:
+    padded = f"${normalized}$"
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def dice(query: Set[str], other: Set[str]) -> float:
+    if not query or not other:
+        return 0.0
+    return 2 * len(query & other) / (len(query) + len(other))
+
+
+def parse_device(data: Dict[str, Any]) -> Tuple[str, str, str, str, str]:
+    """Fields of a managed object kept by the index (id, name, type, serial, lastUpdated)."""
+    hardware = data.get("c8y_Hardware")
+    serial = hardware.get("serialNumber") if isinstance(hardware, dict) else None
+    return (
+        str(data.get("id", "")),
+        str(data.get("name") or ""),
+        str(data.get("type") or ""),
+        str(serial or ""),
+        str(data.get("lastUpdated") or ""),
+    )
+
+
+class DeviceIndex:
+    """Trigram index of device names, types and serial numbers."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.complete = True
+        # Documents by number (None once deleted or replaced)
+        self.documents: List[Optional[str]] = []
+        self.numbers: Dict[str, int] = {}
+        self.postings: Dict[str, array] = {}
+        self.deleted = 0
+        self.last_updated = ""
+        self.built_at = 0.0
+        self.refreshed_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self.numbers)
+
+    def add(self, devices: List[Tuple[str, str, str, str, str]]) -> None:
+        """Add or replace devices (as returned by parse_device)."""
+        for device_id, name, device_type, serial, last_updated in devices:
+            if last_updated > self.last_updated:
+                self.last_updated = last_updated
+            document = SEPARATOR.join((device_id, name, device_type, serial))
+            number = self.numbers.get(device_id)
+            if number is not None:
+                if self.documents[number] == document:
+                    continue
+                self.remove(device_id)
+            grams = set()
+            for field in (name, device_type, serial):
+                grams |= trigrams(normalize(field))
+            cost = DOCUMENT_OVERHEAD + len(document) + POSTING_SIZE * len(grams)
+            if self.max_bytes > 0 and self.size + cost > self.max_bytes:
+                if self.complete:
+                    logger.warning(
+                        f"Device search index reached {self.max_bytes} bytes "
+                        f"with {len(self)} devices, not indexing further devices"
+                    )
+                self.complete = False
+                continue
+            self.size += cost
+            number = len(self.documents)
+            self.documents.append(document)
+            self.numbers[device_id] = number
+            for gram in grams:
+                posting = self.postings.get(gram)
+                if posting is None:
+                    posting = self.postings[gram] = array("I")
+                    self.size += DOCUMENT_OVERHEAD
+                posting.append(number)
+
+    def remove(self, device_id: str) -> None:
+        number = self.numbers.pop(device_id, None)
+        if number is None:
+            return
+        document = self.documents[number]
+        self.documents[number] = None
+        self.deleted += 1
+        # Its posting entries are only dropped by compact
+        self.size -= DOCUMENT_OVERHEAD + len(document)
+        if self.deleted > max(len(self.numbers), 1000):
+            self.compact()
+
+    def compact(self) -> None:
+        """Renumber the documents, dropping the posting entries of removed ones."""
+        documents = [document for document in self.documents if document is not None]
+        self.size = 0
+        self.documents = []
+        self.numbers = {}
+        self.postings = {}
+        self.deleted = 0
+        self.add([tuple(document.split(SEPARATOR)) + ("",) for document in documents])
+
+    def search(self, query: str, limit: int = 10, min_score: float = 0.2):
+        """Best matches as (score, id, name, type, serial), best first."""
+        normalized = normalize(query)
+        query_grams = trigrams(normalized)
+        available = [gram for gram in query_grams if gram in self.postings]
+        if not available:
+            return []
+        common = max(1000, int(len(self.documents) * COMMON_FRACTION))
+        rare = [gram for gram in available if len(self.postings[gram]) <= common]
+        if not rare:
+            rare = sorted(available, key=lambda gram: len(self.postings[gram]))
+            rare = rare[:COMMON_TRIGRAMS]
+        candidates = Counter()
+        for gram in rare:
+            candidates.update(self.postings[gram])
+
+        # Score the candidates sharing most trigrams with the query exactly
+        results = []
+        for number, _ in candidates.most_common(max(limit * 10, 50)):
+            document = self.documents[number]
+            if document is None:
+                continue
+            device_id, name, device_type, serial = document.split(SEPARATOR)
+            score = 0.0
+            for field in (name, device_type, serial):
+                normalized_field = normalize(field)
+                if not normalized_field:
+                    continue
+                field_score = dice(query_grams, trigrams(normalized_field))
+                if normalized and normalized in normalized_field:
+                    field_score = max(field_score, 0.5) + 0.1
+                score = max(score, field_score)
+            if score >= min_score:
+                results.append(
+                    (round(min(score, 1.0), 2), device_id, name, device_type, serial)
+                )
+        results.sort(key=lambda result: (-result[0], result[2]))
+        return results[:limit]
+
+
+# Index per tenant ("" for the tenant of the service credentials)
+_indexes: Dict[str, DeviceIndex] = {}
+# Loads and refreshes of the index, per tenant
+_locks: Dict[str, asyncio.Lock] = {}
+# Tenants whose index is rebuilt in the background
+_rebuilding: Set[str] = set()
+
+
+async def _load(c8y, index: DeviceIndex, params: Dict[str, Any]) -> None:
+    await fetch_pages(
+        c8y,
+        "/inventory/managedObjects",
+        "managedObjects",
+        query_params(withChildren=False, skipChildrenNames=True, **params),
+        page_size=2000,
+        pages=10000,
+        parse=parse_device,
+        # Only one page is held at a time
+        budget=MemoryBudget(0),
+        sink=index.add,
+    )
+
+
+async def _build(c8y, tenant: str) -> DeviceIndex:
+    start = time.monotonic()
+    now = time.time()
+    index = DeviceIndex(settings.search_max_bytes)
+    await _load(c8y, index, {"fragmentType": "c8y_IsDevice"})
+    index.built_at = index.refreshed_at = now
+    _indexes[tenant] = index
+    logger.info(
+        f"Built device search index with {len(index)} devices "
+        f"(~{index.size // 1024} KB) in {time.monotonic() - start:.1f}s"
+    )
+    return index
+
+
+def _rebuild(c8y, tenant: str) -> None:
+    """Rebuild the index in the background, unless a rebuild is already running."""
+    if tenant in _rebuilding:
+        return
+    _rebuilding.add(tenant)
+
+    async def run():
+        # Not cancelled together with the tool call which started it
+        deadlines.current_scope.set(None)
+        try:
+            await _build(c8y, tenant)
+        except Exception as e:
+            logger.info(f"Could not rebuild device search index: {str(e)}")
+        finally:
+            _rebuilding.discard(tenant)
+
+    asyncio.get_running_loop().create_task(run())
+
+
+async def ensure_index(c8y) -> DeviceIndex:
+    """Load, refresh or rebuild the index as needed.
+
+    Only the first load is waited for. A rebuild runs in the background
+    while searches are served from the previous index.
+    """
+    tenant = tenancy.current_tenant.get()
+    lock = _locks.setdefault(tenant, asyncio.Lock())
+    async with lock:
+        now = time.time()
+        index = _indexes.get(tenant)
+        if index is None:
+            return await _build(c8y, tenant)
+        if now - index.built_at > settings.search_rebuild:
+            _rebuild(c8y, tenant)
+        elif now - index.refreshed_at > settings.search_refresh and index.last_updated:
+            since = parse_time(index.last_updated) - DELTA_OVERLAP
+            await _load(
+                c8y,
+                index,
+                {
+                    "query": "$filter=(has(c8y_IsDevice) and lastUpdated.date gt "
+                    f"'{format_time(since)}')"
+                },
+            )
+            index.refreshed_at = now
+        return index
+
+
+def apply_notification(device_id: str, data: Optional[Dict[str, Any]]) -> None:
+    """Update the index (if loaded) for a realtime inventory notification."""
+    index = _indexes.get(tenancy.current_tenant.get())
+    if index is None:
+        return
+    if data is None:
+        index.remove(device_id)
+    elif "c8y_IsDevice" in data:
+        index.add([parse_device(data)])
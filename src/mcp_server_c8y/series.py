@@ -0,0 +1,93 @@
+"""
+Aligned min/max tables from the measurement series API.
+
+``/measurement/measurements/series`` returns selected series of a device
+aggregated by the platform (DAILY, HOURLY or MINUTELY): one min/max pair per
+series and interval. A year of daily values is then a single small request
+instead of paging through every raw measurement with all its fragments.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+AGGREGATIONS = ("DAILY", "HOURLY", "MINUTELY", "NONE")
+
+# Values per response; the platform marks longer results as truncated
+MAX_VALUES = 5000
+
+
+def series_params(
+    device_id: str,
+    series: Sequence[str],
+    date_from: str,
+    date_to: str,
+    aggregation: str,
+) -> Dict[str, Any]:
+    """Query parameters of a series request ('NONE' returns the raw values)."""
+    params: Dict[str, Any] = {
+        "source": device_id,
+        "dateFrom": date_from,
+        "dateTo": date_to,
+        # Sent as repeated series parameters
+        "series": list(series),
+    }
+    if aggregation != "NONE":
+        params["aggregationType"] = aggregation
+    return params
+
+
+def select_series(
+    supported: Sequence[str],
+    fragment_type: Optional[str] = None,
+    fragment_series: Optional[str] = None,
+) -> List[str]:
+    """The 'fragment.series' names to query.
+
+    Without a fragment type all supported series are selected, without a
+    series name all supported series of the fragment.
+    """
+    if fragment_type and fragment_series:
+        return [f"{fragment_type}.{fragment_series}"]
+    selected = []
+    for name in supported:
+        fragment, _, series = name.partition(".")
+        if fragment_type and fragment != fragment_type:
+            continue
+        if fragment_series and series != fragment_series:
+            continue
+        selected.append(name)
+    return selected
+
+
+def _value(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def series_table(result: Dict[str, Any]) -> Tuple[List[str], List[List[str]], bool]:
+    """Convert a series response into headers, rows and its truncated flag.
+
+    Each row holds the start of an interval followed by the min and max of
+    every series, empty where a series has no values in the interval.
+    """
+    specs = result.get("series") or []
+    headers = ["Time"]
+    for spec in specs:
+        name = f"{spec.get('type')}.{spec.get('name')}"
+        unit = f" [{spec['unit']}]" if spec.get("unit") else ""
+        headers += [f"{name} min{unit}", f"{name} max{unit}"]
+
+    rows = []
+    values = result.get("values") or {}
+    # ISO 8601 timestamps in the same format sort chronologically
+    for timestamp in sorted(values):
+        row = [timestamp]
+        points = values[timestamp] or []
+        for index in range(len(specs)):
+            point = points[index] if index < len(points) else None
+            point = point or {}
+            row += [_value(point.get("min")), _value(point.get("max"))]
+        rows.append(row)
+    return headers, rows, bool(result.get("truncated"))
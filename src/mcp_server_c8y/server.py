@@ -2,26 +2,45 @@
 Server initialization and configuration for MCP Cumulocity Server.
 """
 
+import asyncio
 import base64
+import hashlib
 import json
 import logging
 import os
-from datetime import datetime
-from typing import Annotated, Optional
+import time
+from functools import partial
+from collections import OrderedDict
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Annotated, Dict, List, Literal, Optional, Sequence, Tuple
+from urllib.parse import urlencode
 
-import requests
 from c8y_api import CumulocityApi
 from c8y_api._auth import HTTPBearerAuth
 from c8y_api.model import Device
 from dotenv import load_dotenv
-from fastmcp import FastMCP
+from fastmcp import Context
+from fastmcp.exceptions import NotFoundError
 from fastmcp.server.dependencies import get_http_headers
 from jsonata import jsonata
 from pydantic import Field
 from requests.auth import HTTPBasicAuth
 from starlette.exceptions import HTTPException
 
-from . import settings
+from . import (
+    governor,
+    openapi,
+    operations,
+    realtime,
+    search,
+    sessions,
+    settings,
+    tenancy,
+    timeseries,
+)
+from .batching import BatchLoader
+from .cache import cached, get_cache, results_key, revalidate
 
 # Local imports
 from .formatters import (
@@ -29,8 +48,26 @@ from .formatters import (
     DeviceFormatter,
     EventFormatter,
     MeasurementFormatter,
+    OperationFormatter,
     TableFormatter,
 )
+from .grouping import AlarmGrouper, parse_group_by
+from .hierarchy import MAX_NODES, load_subtree
+from .histogram import EventHistogram, parse_interval
+from .pagination import count_elements, fetch_pages, query_params
+from .records import (
+    AlarmRecord,
+    DeviceRecord,
+    EventRecord,
+    MeasurementRecord,
+    OperationRecord,
+)
+from .resilience import UNAVAILABLE_ERRORS
+from .rollup import FleetHealth
+from .rollup import parse_group_by as parse_rollup_group_by
+from .series import MAX_VALUES, select_series, series_params, series_table
+from .streaming import MemoryBudget
+from .tenancy import ScopedMCP
 
 logger = logging.getLogger("mcp_server_c8y")
 
@@ -50,16 +87,56 @@ if not all([C8Y_BASEURL, C8Y_TENANT]):
     )
 
 # Initialize MCP server
-mcp = FastMCP("C8Y MCP Server")
+mcp = ScopedMCP("C8Y MCP Server")
+mcp.service_tenant = C8Y_TENANT
 c8y = None
 
+# Client with the service credentials, used by work done outside of requests
+service_c8y = None
+# Set for such work (e.g. the startup warmers)
+service_call: ContextVar[bool] = ContextVar("service_call", default=False)
+
+# Clients per credentials in multi-tenant mode (least recently used first)
+MAX_CLIENTS = 100
+clients: "OrderedDict[str, CumulocityApi]" = OrderedDict()
+# Verified tenant per credentials: (verified at, tenant)
+verified_tenants: Dict[str, Tuple[float, str]] = {}
+
 # Initialize formatters
 device_formatter = DeviceFormatter()
 measurement_formatter = MeasurementFormatter(show_source=False)
 event_formatter = EventFormatter()
+operation_formatter = OperationFormatter()
+# Watch results: status changes of operations
+transition_formatter = OperationFormatter(
+    {
+        "columns": [
+            "Operation ID",
+            "Device ID",
+            "Previous Status",
+            "Status",
+            "Failure Reason",
+            "Description",
+        ],
+        "extractors": {
+            **{
+                column: OperationFormatter.DEFAULT_CONFIG["extractors"][column]
+                for column in ("Operation ID", "Device ID")
+            },
+            "Previous Status": lambda t: t.previousStatus or "(new)",
+            **{
+                column: OperationFormatter.DEFAULT_CONFIG["extractors"][column]
+                for column in ("Status", "Failure Reason", "Description")
+            },
+        },
+    }
+)
 
 
 def get_auth():
+    if service_call.get():
+        return HTTPBasicAuth(f"{C8Y_TENANT}/{C8Y_USER}", C8Y_PASSWORD)
+
     # Get the HTTP request
     headers = get_http_headers()
     authorization = headers.get("authorization")
@@ -91,8 +168,74 @@ def get_auth():
     )
 
 
+def remove_blacklisted_tools():
+    """Remove the tools listed in MCP_TOOL_BLACKLIST from the server."""
+    for name in settings.toolBlacklist:
+        try:
+            mcp.remove_tool(name)
+        except NotFoundError:
+            pass
+
+
+def credentials_key(authorization: str) -> str:
+    return hashlib.sha256(authorization.encode("utf-8")).hexdigest()
+
+
+def client_key() -> str:
+    """Key of the client get_c8y returns for the current call.
+
+    Work shared between tool calls, like batched lookups, may only be shared
+    between calls using the same credentials, as their permissions differ.
+    """
+    if service_call.get():
+        return "service"
+    authorization = get_http_headers().get("authorization")
+    if settings.multi_tenant and authorization:
+        return credentials_key(authorization)
+    return ""
+
+
+def get_service_c8y():
+    """Client with the service credentials (C8Y_USER, C8Y_PASSWORD)."""
+    global service_c8y
+    if service_c8y is None:
+        service_c8y = CumulocityApi(
+            base_url=C8Y_BASEURL,
+            tenant_id=C8Y_TENANT,
+            auth=HTTPBasicAuth(f"{C8Y_TENANT}/{C8Y_USER}", C8Y_PASSWORD),
+        )
+        governor.install(service_c8y.session, C8Y_TENANT)
+    return service_c8y
+
+
 def get_c8y():
     global c8y
+    if service_call.get():
+        return get_service_c8y()
+    authorization = get_http_headers().get("authorization")
+    if settings.multi_tenant and authorization:
+        # Every set of credentials gets its own client and connection pool
+        key = credentials_key(authorization)
+        client = clients.get(key)
+        if client is None:
+            tenant = tenancy.tenant_from_authorization(authorization) or C8Y_TENANT
+            client = CumulocityApi(
+                base_url=C8Y_BASEURL, tenant_id=tenant, auth=get_auth()
+            )
+            # Requests are accounted to the claimed tenant only once the
+            # platform confirmed it (see resolve_tenant)
+            verified = verified_tenants.get(key)
+            governor.install(
+                client.session,
+                verified[1] if verified is not None else governor.UNVERIFIED,
+            )
+            clients[key] = client
+            while len(clients) > MAX_CLIENTS:
+                # Not closed: the connection pool is shared by the tenant
+                clients.popitem(last=False)
+        clients.move_to_end(key)
+        return client
+
     if c8y is not None:
         return c8y
 
@@ -100,31 +243,226 @@ def get_c8y():
     logger.info(f"Initializing Cumulocity API client with base URL: {C8Y_BASEURL}")
 
     c8y = CumulocityApi(base_url=C8Y_BASEURL, tenant_id=C8Y_TENANT, auth=get_auth())
+    governor.install(c8y.session, C8Y_TENANT)
     return c8y
 
 
-def get_asset_with_parents(asset_id):
-    # Get authentication from the existing get_auth function
-    auth = get_auth()
+async def resolve_tenant() -> str:
+    """Tenant of the credentials of the current request.
 
-    # Get the C8Y API instance
-    c8y = get_c8y()
+    The tenant named by the credentials is verified with the platform once per
+    MCP_TENANT_AUTH_TTL, as it selects the cached data served to the caller.
+    """
+    authorization = get_http_headers().get("authorization")
+    if not authorization:
+        return C8Y_TENANT
+    key = credentials_key(authorization)
+    verified = verified_tenants.get(key)
+    if verified is not None and time.time() - verified[0] < settings.tenant_auth_ttl:
+        return verified[1]
+    client = get_c8y()
+    result = await asyncio.to_thread(client.get, "/tenant/currentTenant")
+    tenant = str(result["name"])
+    # Account the requests to the verified tenant from now on
+    governor.install(client.session, tenant)
+    if len(verified_tenants) >= 10 * MAX_CLIENTS:
+        verified_tenants.clear()
+    verified_tenants[key] = (time.time(), tenant)
+    return tenant
+
+
+mcp.resolve_tenant = resolve_tenant
+
+
+# Page count covering all pages of a collection
+ALL_PAGES = 10000
+
+ALL_PAGES_DESCRIPTION = (
+    "If set, all items of the date window are retrieved (up to MCP_PAGE_MAX_ROWS), "
+    "fetching pages concurrently. page_size, current_page and pages are ignored."
+)
 
-    # Construct the URL
-    url = f"{c8y.base_url}/inventory/managedObjects/{asset_id}"
+TABLEFMT_DESCRIPTION = (
+    "Output format: 'tsv' (default) or 'compact', which lists values shared by all "
+    "rows once above the table, moves units into the column headers and replaces "
+    "repeated texts by codes ($1, $2, ...) defined above the table."
+)
+
+
+def start_of_today() -> str:
+    """Default date_from of the tools, resolved per call."""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT00:00:00.000Z")
+
+
+def paging_args(all_pages: bool, page_size: int, current_page: int, pages: int):
+    """Paging arguments of fetch_pages for the list tools."""
+    if all_pages:
+        # One row more than shown tells whether the rows were cut off
+        return {
+            "page_size": 2000,
+            "current_page": 1,
+            "pages": ALL_PAGES,
+            "max_rows": settings.page_max_rows + 1,
+        }
+    return {"page_size": page_size, "current_page": current_page, "pages": pages}
+
+
+def limit_rows(rows: List, all_pages: bool):
+    """Rows to show and a note if the all_pages mode hit MCP_PAGE_MAX_ROWS."""
+    if all_pages and len(rows) > settings.page_max_rows:
+        return rows[: settings.page_max_rows], (
+            f"\n[TRUNCATED: only the first {settings.page_max_rows} rows are shown "
+            f"(MCP_PAGE_MAX_ROWS). Use a shorter date window or filters.]"
+        )
+    return rows, ""
+
+
+def device_query_params(**params):
+    """Query parameters of managed object lists rendered with device_formatter.
+
+    Child references are not needed for the device tables, so they are not
+    requested at all.
+    """
+    return query_params(withChildren=False, skipChildrenNames=True, **params)
 
-    # Add the withParents parameter
-    params = {"withParents": "true"}
 
-    # Make the HTTP request
-    response = requests.get(
-        url=url, params=params, auth=auth, headers={"Accept": "application/json"}
+def parse_device_row(data: dict) -> DeviceRecord:
+    """Parse a managed object for a device_formatter table, dropping unused fragments."""
+    return DeviceRecord.from_json(device_formatter.project(data))
+
+
+async def load_managed_objects(object_ids: List[str]) -> Dict[str, dict]:
+    """Fetch managed objects with a single ids= query, updating the inventory cache."""
+    c8y = get_c8y()
+    result = await asyncio.to_thread(
+        c8y.get,
+        "/inventory/managedObjects",
+        params={
+            "ids": ",".join(object_ids),
+            "pageSize": len(object_ids),
+            "withChildren": "false",
+        },
     )
+    cache = get_cache("inventory")
+    found = {}
+    for data in result.get("managedObjects", []):
+        cache.set(data["id"], data)
+        found[data["id"]] = data
+    return found
+
+
+# Lookups of single managed objects, coalesced into ids= queries of callers
+# with the same credentials
+inventory_loader = BatchLoader("inventory", load_managed_objects, scope=client_key)
+
+
+async def get_managed_object(object_id: str) -> Device:
+    """Get a managed object, served from the shared inventory cache when possible."""
+
+    async def load():
+        data = await inventory_loader.load(object_id)
+        if data is None:
+            raise KeyError(f"Managed object {object_id} not found")
+        return data
+
+    data = await cached("inventory", object_id, load, max_age=realtime.max_age())
+    return Device.from_json(data)
+
+
+async def get_managed_objects(object_ids: Sequence[str]) -> List[Device]:
+    """Get several managed objects, fetching all cache misses with batched ids= queries."""
+    cache = get_cache("inventory")
+    found = {}
+    missing = []
+    stale = []
+    max_age = realtime.max_age()
+    for object_id in object_ids:
+        data = cache.get(object_id, max_age=max_age)
+        if data is None and settings.cache_max_stale > 0:
+            data = cache.get(object_id, max_age=settings.cache_max_stale, stale=True)
+            if data is not None:
+                stale.append(object_id)
+        if data is None:
+            missing.append(object_id)
+        else:
+            found[object_id] = data
+
+    async def load(ids):
+        results = await asyncio.gather(
+            *(inventory_loader.load(object_id) for object_id in ids)
+        )
+        for object_id, data in zip(ids, results):
+            if data is not None:
+                found[object_id] = data
+
+    if len(missing) > 0:
+        try:
+            await load(missing)
+        except UNAVAILABLE_ERRORS:
+            # Fall back to stale entries of any age if the platform is unavailable
+            for object_id in missing:
+                data = cache.get(object_id, max_age=float("inf"), stale=True)
+                if data is None:
+                    raise
+                found[object_id] = data
+    if len(stale) > 0:
+        revalidate(f"inventory:{','.join(stale)}", lambda: load(stale))
 
-    # Check if the request was successful
-    response.raise_for_status()
+    return [Device.from_json(found[i]) for i in object_ids if i in found]
+
+
+async def get_supported_measurements(device_id: str) -> List[str]:
+    """Get the supported measurements of a device, served from the cache when possible."""
+
+    async def load():
+        c8y = get_c8y()
+        return await asyncio.to_thread(
+            c8y.inventory.get_supported_measurements, device_id
+        )
+
+    return await cached("supported_measurements", device_id, load)
+
+
+async def get_supported_series(device_id: str) -> List[str]:
+    """Get the supported series of a device, served from the cache when possible."""
+
+    async def load():
+        c8y = get_c8y()
+        return await asyncio.to_thread(c8y.inventory.get_supported_series, device_id)
+
+    return await cached("supported_series", device_id, load)
+
+
+async def get_asset_with_parents(asset_id):
+    async def load():
+        # Get authentication from the existing get_auth function
+        auth = get_auth()
+
+        # Get the C8Y API instance
+        c8y = get_c8y()
+
+        # Construct the URL
+        url = f"{c8y.base_url}/inventory/managedObjects/{asset_id}"
+
+        # Add the withParents parameter
+        params = {"withParents": "true"}
+
+        # Make the HTTP request
+        response = await asyncio.to_thread(
+            c8y.session.get,
+            url=url,
+            params=params,
+            auth=auth,
+            headers={"Accept": "application/json"},
+        )
+
+        # Check if the request was successful
+        response.raise_for_status()
+
+        return response.json()
+
+    assetWithParents = await cached("hierarchy", asset_id, load)
 
-    assetWithParents = response.json()
     asset = Device.from_json(assetWithParents)
 
     try:
@@ -134,11 +472,7 @@ def get_asset_with_parents(asset_id):
             f"Retrieved {len(parent_asset_ids)} parent assets from asset {asset_id}"
         )
         if len(parent_asset_ids) > 0:
-            asset.parent_assets = c8y.inventory.get_all(
-                ids=parent_asset_ids,
-                with_children=False,
-                page_size=len(parent_asset_ids),
-            )
+            asset.parent_assets = await get_managed_objects(parent_asset_ids)
     except Exception as e:
         logger.info(f"Could not retrieve parent assets from asset {asset_id}: {str(e)}")
 
@@ -149,11 +483,7 @@ def get_asset_with_parents(asset_id):
             f"Retrieved {len(parent_devices_ids)} parent assets from asset {asset_id}"
         )
         if len(parent_devices_ids) > 0:
-            asset.parent_devices = c8y.inventory.get_all(
-                ids=parent_devices_ids,
-                with_children=False,
-                page_size=len(parent_asset_ids),
-            )
+            asset.parent_devices = await get_managed_objects(parent_devices_ids)
     except Exception as e:
         logger.info(
             f"Could not retrieve parent devices from asset {asset_id}: {str(e)}"
@@ -177,71 +507,153 @@ async def get_assets(
     ] = None,
     page_size: int = 20,
     current_page: int = 1,
+    tablefmt: Annotated[
+        Literal["tsv", "compact"], Field(description=TABLEFMT_DESCRIPTION)
+    ] = "tsv",
 ) -> str:
     """Get a filtered list of assets including devices from Cumulocity."""
     c8y = get_c8y()
-    devices = None
-
-    if typeFilter is not None and nameFilter is not None:
-        devices = c8y.device_inventory.get_all(
-            page_size=min(page_size, 2000),
-            page_number=current_page,
-            type=typeFilter,
-            text=nameFilter,
-        )
-    elif typeFilter is not None:
-        devices = c8y.device_inventory.get_all(
-            page_size=min(page_size, 2000),
-            page_number=current_page,
-            type=typeFilter,
-        )
-    elif nameFilter is not None:
-        devices = c8y.device_inventory.get_all(
-            page_size=min(page_size, 2000),
-            page_number=current_page,
-            text=nameFilter,
-        )
-    else:
-        devices = c8y.device_inventory.get_all(
-            page_size=min(page_size, 2000),
-            page_number=current_page,
-        )
+    budget = MemoryBudget()
+    devices = await fetch_pages(
+        c8y,
+        "/inventory/managedObjects",
+        "managedObjects",
+        device_query_params(
+            fragmentType="c8y_IsDevice", type=typeFilter, text=nameFilter
+        ),
+        page_size=page_size,
+        current_page=current_page,
+        parse=parse_device_row,
+        budget=budget,
+    )
 
     if len(devices) == 0:
         return "No assets found"
-    return device_formatter.devices_to_table(devices)
+    table = device_formatter.devices_to_table(devices, tablefmt)
+    if budget.exhausted:
+        table += budget.truncation_marker(len(devices))
+    return table
 
 
 @mcp.tool()
-async def get_child_devices(parent_device_id: str, page_size: int = 20) -> str:
-    """Get child devices of a specific device."""
+async def get_fleet_health(
+    ctx: Context,
+    group_by: Annotated[
+        str,
+        Field(description="Group the devices by 'type', 'owner' or 'type,owner'."),
+    ] = "type",
+    top: Annotated[
+        int,
+        Field(
+            description="Number of worst devices (most critical, then major, ... alarms) to list."
+        ),
+    ] = 10,
+    typeFilter: Annotated[
+        Optional[str],
+        Field(description="If provided, only devices of this type are included."),
+    ] = None,
+) -> str:
+    """Summarize the health of all devices: availability and active alarm counts per group, plus the worst devices.
+
+    Crawls the whole device inventory, so prefer it over paging through get_assets
+    to get an overview of a fleet.
+    """
     c8y = get_c8y()
-    children = c8y.inventory.get_all(
-        parent=parent_device_id, page_size=min(page_size, 2000)
+    health = FleetHealth(parse_rollup_group_by(group_by), top=top)
+    params = device_query_params(fragmentType="c8y_IsDevice", type=typeFilter)
+    # The pages after the first are fetched concurrently, only those in flight are held
+    await fetch_pages(
+        c8y,
+        "/inventory/managedObjects",
+        "managedObjects",
+        params,
+        page_size=2000,
+        pages=ALL_PAGES,
+        parse=parse_device_row,
+        ctx=ctx,
+        budget=MemoryBudget(0),
+        sink=health.add,
     )
-    if len(children) == 0:
-        return "No child devices found"
-    return device_formatter.devices_to_table(children)
+
+    if health.total == 0:
+        return "No devices found"
+    sections = [
+        f"## Fleet health of {health.total} devices",
+        health.groups_table(),
+    ]
+    if top > 0:
+        sections += [
+            "",
+            "## Devices with the most active alarms or unavailable",
+            health.worst_table(),
+        ]
+    return "\n".join(sections)
 
 
 @mcp.tool()
-async def get_device_context(
-    device_id: str,
-    child_devices_limit: int = 20,
+async def search_devices(
+    query: Annotated[
+        str,
+        Field(
+            description="Device name, type or serial number to look for. Tolerates typos and "
+            "different spellings, e.g. 'pump 3' finds 'Pump-03'."
+        ),
+    ],
+    limit: int = 10,
 ) -> str:
-    """Get comprehensive context for a specific device.
-    This includes device fragments, supported measurements, supported operations, and child devices.
+    """Find devices by name, type or serial number, ranked by similarity.
+
+    Uses a local index of all devices, so it is much faster than a platform text
+    query and can be called repeatedly while narrowing down a name.
     """
-    try:
-        c8y = get_c8y()
-        device = c8y.inventory.get(device_id)
-    except Exception as e:
-        raise ValueError(f"Failed to retrieve device {device_id}: {str(e)}")
+    index = await search.ensure_index(get_c8y())
+    results = index.search(query, limit=limit)
+    if not results:
+        return "No matching devices found"
+    table = TableFormatter.print_table(
+        headers=["Score", "Device ID", "Device Name", "Device Type", "Serial Number"],
+        rows=[list(result) for result in results],
+    )
+    if not index.complete:
+        table += (
+            f"\n[INCOMPLETE: the search index is limited to {len(index)} devices "
+            f"(MCP_SEARCH_MAX_BYTES), use get_assets with nameFilter as well.]"
+        )
+    return table
+
+
+@mcp.tool()
+async def get_child_devices(
+    parent_device_id: str,
+    page_size: int = 20,
+    tablefmt: Annotated[
+        Literal["tsv", "compact"], Field(description=TABLEFMT_DESCRIPTION)
+    ] = "tsv",
+) -> str:
+    """Get child devices of a specific device."""
+    c8y = get_c8y()
+    budget = MemoryBudget()
+    children = await fetch_pages(
+        c8y,
+        "/inventory/managedObjects",
+        "managedObjects",
+        device_query_params(query=f"$filter=(bygroupid({parent_device_id}))"),
+        page_size=page_size,
+        pages=ALL_PAGES,
+        parse=parse_device_row,
+        budget=budget,
+    )
+    if len(children) == 0:
+        return "No child devices found"
+    table = device_formatter.devices_to_table(children, tablefmt)
+    if budget.exhausted:
+        table += budget.truncation_marker(len(children))
+    return table
 
-    # Initialize output sections
-    output_sections = []
 
-    output_sections.append(device_formatter.device_to_formatted_string(device))
+def render_device_sections(device: Device) -> Dict[str, str]:
+    """Sections of a device context rendered from the device managed object."""
+    sections = {"Device": device_formatter.device_to_formatted_string(device)}
 
     # 1. Agent Information
     if hasattr(device, "c8y_Agent") and isinstance(device.c8y_Agent, dict):
@@ -250,7 +662,7 @@ async def get_device_context(
         agent_section.append(f"**Name:** {agent_info.get('name', 'N/A')}")
         agent_section.append(f"**Version:** {agent_info.get('version', 'N/A')}")
         agent_section.append(f"**URL:** {agent_info.get('url', 'N/A')}")
-        output_sections.append("\n".join(agent_section))
+        sections["Agent Information"] = "\n".join(agent_section)
 
     # 2. Software List
     if (
@@ -274,7 +686,7 @@ async def get_device_context(
         software_section.append(TableFormatter.print_table(headers, rows))
         software_section.append("")
 
-        output_sections.append("\n".join(software_section))
+        sections["Software List"] = "\n".join(software_section)
 
     # 3. Supported Logs
     if (
@@ -286,7 +698,7 @@ async def get_device_context(
         supported_logs = device.c8y_SupportedLogs
         for log in supported_logs:
             logs_section.append(f"- {log}")
-        output_sections.append("\n".join(logs_section))
+        sections["Supported Logs"] = "\n".join(logs_section)
 
     # 4. Supported Configurations
     if (
@@ -298,21 +710,9 @@ async def get_device_context(
         supported_configs = device.c8y_SupportedConfigurations
         for config in supported_configs:
             configs_section.append(f"- {config}")
-        output_sections.append("\n".join(configs_section))
+        sections["Supported Configurations"] = "\n".join(configs_section)
 
-    # 5. Supported Measurements
-    try:
-        supported_measurements = c8y.inventory.get_supported_measurements(device_id)
-        if supported_measurements and len(supported_measurements) > 0:
-            measurements_section = ["## Supported Measurements"]
-            for measurement in supported_measurements:
-                measurements_section.append(f"- {measurement}")
-            output_sections.append("\n".join(measurements_section))
-    except Exception as e:
-        # Only log the error but don't include it in the output
-        raise ValueError(f"Error retrieving supported measurements: {str(e)}")
-
-    # 6. Supported Operations
+    # 5. Supported Operations
     if (
         hasattr(device, "c8y_SupportedOperations")
         and device.c8y_SupportedOperations
@@ -321,31 +721,9 @@ async def get_device_context(
         operations_section = ["## Supported Operations"]
         for operation in device.c8y_SupportedOperations:
             operations_section.append(f"- {operation}")
-        output_sections.append("\n".join(operations_section))
-
-    # 7. Child Devices
-    try:
-        children = c8y.inventory.get_all(
-            parent=device_id, page_size=child_devices_limit
-        )
-        total_children = c8y.inventory.get_count(parent=device_id)
-
-        if total_children > 0:
-            children_section = ["## Child Devices"]
-            children_section.append(f"Total child devices: {total_children}")
-
-            children_section.append(
-                "\nShowing up to {} child devices:".format(
-                    min(child_devices_limit, total_children)
-                )
-            )
-            children_section.append(device_formatter.devices_to_table(children))
-            output_sections.append("\n".join(children_section))
-    except Exception as e:
-        # Only log the error but don't include it in the output
-        raise ValueError(f"Error retrieving child devices: {str(e)}")
+        sections["Supported Operations"] = "\n".join(operations_section)
 
-    # 8. Additional Device Fragments
+    # 6. Additional Device Fragments
     additional_fragments = {}
     if hasattr(device, "fragments") and device.fragments:
         for key, value in device.fragments.items():
@@ -367,21 +745,172 @@ async def get_device_context(
         fragments_section = ["## Additional Device Fragments"]
         for key, value in additional_fragments.items():
             fragments_section.append(f"{key}: {value}")
-        output_sections.append("\n".join(fragments_section))
+        sections["Additional Device Fragments"] = "\n".join(fragments_section)
+
+    return sections
+
+
+async def render_child_devices(
+    device_id: str, child_devices_limit: int
+) -> Tuple[Optional[str], str]:
+    """The child devices section (None without children) and the newest lastUpdated of the children."""
+    c8y = get_c8y()
+    result = await asyncio.to_thread(
+        c8y.get,
+        "/inventory/managedObjects",
+        params=device_query_params(
+            query=f"$filter=(bygroupid({device_id}))",
+            pageSize=child_devices_limit,
+            withTotalElements=True,
+        ),
+    )
+    children_updated = max(
+        (str(item.get("lastUpdated") or "") for item in result["managedObjects"]),
+        default="",
+    )
+    children = [parse_device_row(item) for item in result["managedObjects"]]
+    total_children = result.get("statistics", {}).get("totalElements", 0)
+    if total_children <= 0:
+        return None, children_updated
+
+    children_section = ["## Child Devices"]
+    children_section.append(f"Total child devices: {total_children}")
+
+    children_section.append(
+        "\nShowing up to {} child devices:".format(
+            min(child_devices_limit, total_children)
+        )
+    )
+    children_section.append(device_formatter.devices_to_table(children))
+    return "\n".join(children_section), children_updated
+
+
+async def find_updated(filter: str, since: str) -> Optional[dict]:
+    """A managed object matching the filter updated after since (None if there is none)."""
+    c8y = get_c8y()
+    result = await asyncio.to_thread(
+        c8y.get,
+        "/inventory/managedObjects",
+        params=query_params(
+            query=f"$filter=({filter} and lastUpdated.date gt '{since}')",
+            pageSize=1,
+            withChildren=False,
+        ),
+    )
+    managed_objects = result.get("managedObjects", [])
+    return managed_objects[0] if managed_objects else None
+
+
+@mcp.tool()
+async def get_device_context(
+    ctx: Context,
+    device_id: str,
+    child_devices_limit: int = 20,
+    incremental: Annotated[
+        bool,
+        Field(
+            description="If set and the context of the device was already returned in this session, only return what changed since (or that nothing did) instead of the full document."
+        ),
+    ] = False,
+) -> str:
+    """Get comprehensive context for a specific device.
+    This includes device fragments, supported measurements, supported operations, and child devices.
+    """
+    session = ctx.session
+    previous = sessions.get_context(session, device_id)
+
+    # Only refetch what was updated since the context was last returned
+    device_changed = children_changed = True
+    updated_device = None
+    if previous is not None and previous.device_updated:
+        try:
+            updated_device, updated_child = await asyncio.gather(
+                find_updated(f"id eq '{device_id}'", previous.device_updated),
+                find_updated(
+                    f"bygroupid({device_id})",
+                    previous.children_updated or previous.device_updated,
+                ),
+            )
+        except Exception as e:
+            raise ValueError(f"Failed to retrieve device {device_id}: {str(e)}")
+        device_changed = updated_device is not None
+        children_changed = (
+            device_changed
+            or updated_child is not None
+            or child_devices_limit != previous.child_devices_limit
+        )
+
+    if device_changed:
+        try:
+            if updated_device is None:
+                device = await get_managed_object(device_id)
+            else:
+                # The check already returned the changed device
+                get_cache("inventory").set(device_id, updated_device)
+                device = Device.from_json(updated_device)
+        except Exception as e:
+            raise ValueError(f"Failed to retrieve device {device_id}: {str(e)}")
+        device_updated = str(device.update_time or "")
+        sections = render_device_sections(device)
+    else:
+        device_updated = previous.device_updated
+        sections = {
+            name: section
+            for name, section in previous.sections.items()
+            if name in sessions.DEVICE_SECTIONS
+        }
+
+    # Supported Measurements
+    try:
+        supported_measurements = await get_supported_measurements(device_id)
+        if supported_measurements and len(supported_measurements) > 0:
+            measurements_section = ["## Supported Measurements"]
+            for measurement in supported_measurements:
+                measurements_section.append(f"- {measurement}")
+            sections["Supported Measurements"] = "\n".join(measurements_section)
+    except Exception as e:
+        # Only log the error but don't include it in the output
+        raise ValueError(f"Error retrieving supported measurements: {str(e)}")
+
+    # Child Devices
+    if children_changed:
+        try:
+            children_section, children_updated = await render_child_devices(
+                device_id, child_devices_limit
+            )
+        except Exception as e:
+            # Only log the error but don't include it in the output
+            raise ValueError(f"Error retrieving child devices: {str(e)}")
+    else:
+        children_section = previous.sections.get("Child Devices")
+        children_updated = previous.children_updated
+    if children_section is not None:
+        sections["Child Devices"] = children_section
+
+    context = sessions.DeviceContext(
+        device_updated,
+        children_updated,
+        child_devices_limit,
+        sessions.ordered(sections),
+    )
+    sessions.set_context(session, device_id, context)
 
     # Return the combined sections or a message if no information is available
-    return "\n\n".join(output_sections)
+    if previous is not None and incremental:
+        return sessions.diff_contexts(device_id, previous, context)
+    return context.document()
 
 
 @mcp.tool()
 async def get_device_measurements(
+    ctx: Context,
     device_id: str,
     date_from: Annotated[
         str,
         Field(
-            description="Defaults to Today and needs to be provide in ISO 8601 format with milliseconds and UTC timezone: YYYY-MM-DDThh:mm:ss.sssZ"
+            description="Defaults to the start of today (UTC) and needs to be provided in ISO 8601 format with milliseconds and UTC timezone: YYYY-MM-DDThh:mm:ss.sssZ"
         ),
-    ] = datetime.today().strftime("%Y-%m-%dT00:00:00.000Z"),
+    ] = "",
     date_to: Annotated[
         str,
         Field(
@@ -390,27 +919,98 @@ async def get_device_measurements(
     ] = "",
     page_size: int = 10,
     current_page: int = 1,
+    pages: Annotated[
+        int,
+        Field(
+            description="Number of consecutive pages to retrieve starting at current_page. Progress is reported per page."
+        ),
+    ] = 1,
+    all_pages: Annotated[bool, Field(description=ALL_PAGES_DESCRIPTION)] = False,
+    tablefmt: Annotated[
+        Literal["tsv", "compact"], Field(description=TABLEFMT_DESCRIPTION)
+    ] = "tsv",
 ) -> str:
     """Get the latest measurements for a specific device.
 
     This tool helps LLMs understand what measurements are available and their current values.
     """
+    date_from = date_from or start_of_today()
     try:
         c8y = get_c8y()
+
+        if settings.timeseries_enabled:
+            start = timeseries.parse_time(date_from)
+            end = timeseries.parse_time(date_to) if date_to else time.time()
+            if timeseries.covers(start):
+                # Serve the window from the local store, fetching only new data
+                budget = MemoryBudget()
+                if all_pages:
+                    # One more row than shown tells whether MCP_PAGE_MAX_ROWS was hit
+                    offset, limit = 0, settings.page_max_rows + 1
+                else:
+                    offset = (current_page - 1) * page_size
+                    limit = page_size * max(pages, 1)
+                stored = await timeseries.measurements(
+                    c8y, device_id, start, end, ctx, offset, limit, budget
+                )
+                # Otherwise the platform is asked directly below
+                if stored is not None and (stored.rows or stored.covered_from <= start):
+                    rows, note = limit_rows(stored.rows, all_pages)
+                    measurements = [MeasurementRecord.from_json(m) for m in rows]
+                    if len(measurements) == 0:
+                        if budget.exhausted:
+                            raise ValueError(
+                                "A single measurement exceeds the memory budget of "
+                                f"{budget.limit} bytes per request (MCP_REQUEST_MEMORY_BUDGET)"
+                            )
+                        return "No measurements found"
+                    table = (
+                        measurement_formatter.measurements_to_table(
+                            measurements, tablefmt
+                        )
+                        + note
+                    )
+                    if stored.covered_from > start:
+                        table += (
+                            "\n[TRUNCATED: the local store only holds the measurements "
+                            f"since {timeseries.format_time(stored.covered_from)} "
+                            "(MCP_TIMESERIES_MAX_PAGES). Use a shorter date window.]"
+                        )
+                    if budget.exhausted:
+                        table += budget.truncation_marker(len(measurements))
+                    return table
+
         # Get measurements for the device
-        measurements = c8y.measurements.get_all(
-            source=device_id,
-            page_size=min(page_size, 2000),  # Limit to specified page size, max 2000
-            page_number=current_page,  # Use the provided page number
-            revert=True,  # Get newest measurements first
-            date_from=date_from,
-            date_to=date_to,
+        budget = MemoryBudget()
+        measurements = await fetch_pages(
+            c8y,
+            "/measurement/measurements",
+            "measurements",
+            query_params(
+                source=device_id,
+                revert=True,  # Get newest measurements first
+                dateFrom=date_from,
+                dateTo=date_to,
+            ),
+            parse=MeasurementRecord.from_json,
+            ctx=ctx,
+            format_chunk=partial(
+                measurement_formatter.measurements_to_table, tablefmt=tablefmt
+            ),
+            budget=budget,
+            **paging_args(all_pages, page_size, current_page, pages),
         )
 
         if len(measurements) == 0:
             return "No measurements found"
 
-        return measurement_formatter.measurements_to_table(measurements)
+        measurements, note = limit_rows(measurements, all_pages)
+        table = (
+            measurement_formatter.measurements_to_table(measurements, tablefmt) + note
+        )
+        if budget.exhausted:
+            table += budget.truncation_marker(len(measurements))
+        return table
 
     except Exception as e:
         raise ValueError(
@@ -418,8 +1018,92 @@ async def get_device_measurements(
         )
 
 
+@mcp.tool()
+async def get_measurement_series(
+    device_id: str,
+    value_fragment_type: Annotated[
+        Optional[str],
+        Field(
+            description="Measurement fragment, e.g. 'c8y_Temperature'. If omitted, all supported series of the device are returned."
+        ),
+    ] = None,
+    value_fragment_series: Annotated[
+        Optional[str],
+        Field(
+            description="Series of the fragment, e.g. 'T'. If omitted, all supported series of the fragment are returned."
+        ),
+    ] = None,
+    date_from: Annotated[
+        str,
+        Field(
+            description="Defaults to the start of today (UTC) and needs to be provided in ISO 8601 format with milliseconds and UTC timezone: YYYY-MM-DDThh:mm:ss.sssZ"
+        ),
+    ] = "",
+    date_to: Annotated[
+        str,
+        Field(
+            description="Defaults to now, ISO 8601 format with milliseconds and UTC timezone: YYYY-MM-DDThh:mm:ss.sssZ"
+        ),
+    ] = "",
+    aggregation: Annotated[
+        Literal["DAILY", "HOURLY", "MINUTELY", "NONE"],
+        Field(
+            description="Interval of the min/max values computed by the platform; NONE returns the raw values. "
+            f"At most {MAX_VALUES} values are returned, so use DAILY for windows of months or years."
+        ),
+    ] = "HOURLY",
+    tablefmt: Annotated[
+        Literal["tsv", "compact"], Field(description=TABLEFMT_DESCRIPTION)
+    ] = "tsv",
+) -> str:
+    """Get the min and max of measurement series per day, hour or minute, aggregated by the platform.
+
+    Prefer this tool over get_device_measurements for trends over long windows.
+    """
+    date_from = date_from or start_of_today()
+    try:
+        c8y = get_c8y()
+        if value_fragment_type and value_fragment_series:
+            names = select_series([], value_fragment_type, value_fragment_series)
+        else:
+            names = select_series(
+                await get_supported_series(device_id),
+                value_fragment_type,
+                value_fragment_series,
+            )
+        if len(names) == 0:
+            return "No series found"
+
+        params = series_params(
+            device_id,
+            names,
+            date_from,
+            date_to or timeseries.format_time(time.time()),
+            aggregation,
+        )
+        result = await asyncio.to_thread(
+            c8y.get, "/measurement/measurements/series", params=params
+        )
+        headers, rows, truncated = series_table(result)
+        if len(rows) == 0:
+            return "No measurements found"
+        table = TableFormatter.print_table(headers, rows, tablefmt)
+        if truncated:
+            table += (
+                f"\n[TRUNCATED: the platform returns at most {MAX_VALUES} values per "
+                f"request. Use a coarser aggregation or a shorter window.]"
+            )
+        return table
+
+    except Exception as e:
+        raise ValueError(
+            f"Failed to retrieve measurement series for device {device_id}: {str(e)}"
+        )
+
+
 @mcp.tool()
 async def get_alarms(
+    ctx: Context,
     severity: Annotated[
         str,
         Field(
@@ -449,36 +1133,121 @@ async def get_alarms(
         Optional[str],
         Field(description="If provided, only alarms of this type will be retrieved."),
     ] = None,
+    pages: Annotated[
+        int,
+        Field(
+            description="Number of consecutive pages to retrieve starting at the first page. Progress is reported per page."
+        ),
+    ] = 1,
+    group_by: Annotated[
+        Optional[str],
+        Field(
+            description="If provided, all matching alarms are collapsed into groups by a comma-separated "
+            "combination of 'type', 'severity' and 'text' (text with numbers and IDs masked). Each group "
+            "shows the number of alarms, affected device IDs and the first and last alarm time. "
+            "page_size and pages are ignored."
+        ),
+    ] = None,
+    all_pages: Annotated[
+        bool,
+        Field(
+            description="If set, all matching alarms are retrieved (up to MCP_PAGE_MAX_ROWS), "
+            "fetching pages concurrently. page_size and pages are ignored."
+        ),
+    ] = False,
+    tablefmt: Annotated[
+        Literal["tsv", "compact"], Field(description=TABLEFMT_DESCRIPTION)
+    ] = "tsv",
 ) -> str:
     """Get alarms across the platform or for a specific device (optionally including children)."""
     c8y = get_c8y()
-    get_all_kwargs = {
-        "page_size": min(page_size, 2000),
-        "page_number": 1,
-        "severity": severity,
-        "status": status,
-    }
+    group_keys = parse_group_by(group_by) if group_by else None
+    params = query_params(severity=severity, status=status, type=alarm_type)
     if device_id:
-        get_all_kwargs["source"] = device_id
+        params["source"] = device_id
         if include_children:
-            get_all_kwargs["with_source_assets"] = True
-            get_all_kwargs["with_source_devices"] = True
-    if alarm_type:
-        get_all_kwargs["type"] = alarm_type
-    alarms = c8y.alarms.get_all(**get_all_kwargs)
-
-    if len(alarms) == 0:
-        return "No alarms found"
+            params["withSourceAssets"] = "true"
+            params["withSourceDevices"] = "true"
+
+    # Results are only cached while realtime notifications keep them current
+    cache_key = None
+    if realtime.is_active():
+        cache_key = results_key(
+            "alarms",
+            device_id,
+            include_children,
+            {
+                **params,
+                "pageSize": page_size,
+                "pages": pages,
+                "groupBy": group_keys,
+                "allPages": all_pages,
+                "tablefmt": tablefmt,
+            },
+        )
+        cached_result = get_cache("alarms").get(cache_key, max_age=realtime.max_age())
+        if cached_result is not None:
+            return cached_result
+
+    if group_keys is not None:
+        grouper = AlarmGrouper(group_keys)
+        budget = MemoryBudget()
+        await fetch_pages(
+            c8y,
+            "/alarm/alarms",
+            "alarms",
+            params,
+            page_size=2000,
+            pages=ALL_PAGES,
+            parse=AlarmRecord.from_json,
+            ctx=ctx,
+            budget=budget,
+            sink=grouper.add,
+        )
+        if grouper.total == 0:
+            formatted_alarms = "No alarms found"
+        else:
+            formatted_alarms = (
+                f"{grouper.total} alarms in {len(grouper.groups)} groups\n\n"
+                + grouper.to_table(tablefmt)
+            )
+            if budget.exhausted:
+                formatted_alarms += budget.truncation_marker(grouper.total)
+        if cache_key is not None:
+            get_cache("alarms").set(cache_key, formatted_alarms)
+        return formatted_alarms
 
     # Format the alarms using the AlarmFormatter
     alarm_formatter = AlarmFormatter()
-    formatted_alarms = alarm_formatter.alarms_to_table(alarms)
+    budget = MemoryBudget()
+    alarms = await fetch_pages(
+        c8y,
+        "/alarm/alarms",
+        "alarms",
+        params,
+        parse=AlarmRecord.from_json,
+        ctx=ctx,
+        format_chunk=partial(alarm_formatter.alarms_to_table, tablefmt=tablefmt),
+        budget=budget,
+        **paging_args(all_pages, page_size, 1, pages),
+    )
+
+    if len(alarms) == 0:
+        formatted_alarms = "No alarms found"
+    else:
+        alarms, note = limit_rows(alarms, all_pages)
+        formatted_alarms = alarm_formatter.alarms_to_table(alarms, tablefmt) + note
+        if budget.exhausted:
+            formatted_alarms += budget.truncation_marker(len(alarms))
 
+    if cache_key is not None:
+        get_cache("alarms").set(cache_key, formatted_alarms)
     return formatted_alarms
 
 
 @mcp.tool()
 async def get_events(
+    ctx: Context,
     device_id: Annotated[
         str,
         Field(description="Device ID for which to retrieve events. This is required."),
@@ -496,37 +1265,268 @@ async def get_events(
     date_from: Annotated[
         str,
         Field(
-            description="Defaults to Today and needs to be provided in ISO 8601 format with milliseconds and UTC timezone: YYYY-MM-DDThh:mm:ss.sssZ"
+            description="Defaults to the start of today (UTC) and needs to be provided in ISO 8601 format with milliseconds and UTC timezone: YYYY-MM-DDThh:mm:ss.sssZ"
         ),
-    ] = datetime.today().strftime("%Y-%m-%dT00:00:00.000Z"),
+    ] = "",
     date_to: Annotated[
         str,
         Field(
             description="Needs to be provided in ISO 8601 format with milliseconds and UTC timezone: YYYY-MM-DDThh:mm:ss.sssZ"
         ),
     ] = "",
+    pages: Annotated[
+        int,
+        Field(
+            description="Number of consecutive pages to retrieve starting at current_page. Progress is reported per page."
+        ),
+    ] = 1,
+    all_pages: Annotated[bool, Field(description=ALL_PAGES_DESCRIPTION)] = False,
+    tablefmt: Annotated[
+        Literal["tsv", "compact"], Field(description=TABLEFMT_DESCRIPTION)
+    ] = "tsv",
 ) -> str:
     """Get events for a specific device (optionally including children). Platform-wide queries are not allowed."""
+    date_from = date_from or start_of_today()
     c8y = get_c8y()
-    get_all_kwargs = {
-        "source": device_id,
-        "page_size": min(page_size, 2000),
-        "page_number": current_page,
-        "date_from": date_from,
-        "date_to": date_to,
-    }
+    params = query_params(
+        source=device_id, dateFrom=date_from, dateTo=date_to, type=event_type
+    )
     if include_children:
-        get_all_kwargs["with_source_assets"] = True
-        get_all_kwargs["with_source_devices"] = True
-    if event_type:
-        get_all_kwargs["type"] = event_type
-
-    events = c8y.events.get_all(**get_all_kwargs)
+        params["withSourceAssets"] = "true"
+        params["withSourceDevices"] = "true"
+
+    # Results are only cached while realtime notifications keep them current
+    cache_key = None
+    if realtime.is_active():
+        cache_key = results_key(
+            "events",
+            device_id,
+            include_children,
+            {
+                **params,
+                "pageSize": page_size,
+                "currentPage": current_page,
+                "pages": pages,
+                "allPages": all_pages,
+                "tablefmt": tablefmt,
+            },
+        )
+        cached_result = get_cache("events").get(cache_key, max_age=realtime.max_age())
+        if cached_result is not None:
+            return cached_result
+
+    budget = MemoryBudget()
+    events = await fetch_pages(
+        c8y,
+        "/event/events",
+        "events",
+        params,
+        parse=EventRecord.from_json,
+        ctx=ctx,
+        format_chunk=partial(event_formatter.events_to_table, tablefmt=tablefmt),
+        budget=budget,
+        **paging_args(all_pages, page_size, current_page, pages),
+    )
 
     if len(events) == 0:
-        return "No events found"
+        formatted_events = "No events found"
+    else:
+        events, note = limit_rows(events, all_pages)
+        formatted_events = event_formatter.events_to_table(events, tablefmt) + note
+        if budget.exhausted:
+            formatted_events += budget.truncation_marker(len(events))
+
+    if cache_key is not None:
+        get_cache("events").set(cache_key, formatted_events)
+    return formatted_events
+
+
+@mcp.tool()
+async def get_operations(
+    device_id: Annotated[
+        str,
+        Field(description="Device whose operations are listed or watched."),
+    ] = "",
+    operation_ids: Annotated[
+        str,
+        Field(description="Comma-separated IDs of operations to list or watch."),
+    ] = "",
+    status: Annotated[
+        Literal["", "PENDING", "EXECUTING", "SUCCESSFUL", "FAILED"],
+        Field(description="If provided, only list operations with this status."),
+    ] = "",
+    watch: Annotated[
+        bool,
+        Field(
+            description="Wait until the watched operations change their status and only return these transitions. With device_id, its unfinished and newly created operations are watched."
+        ),
+    ] = False,
+    watch_timeout: Annotated[
+        float,
+        Field(description="Seconds to wait for transitions in watch mode (max 600)."),
+    ] = 60,
+    page_size: int = 20,
+    current_page: int = 1,
+    tablefmt: Annotated[
+        Literal["tsv", "compact"], Field(description=TABLEFMT_DESCRIPTION)
+    ] = "tsv",
+) -> str:
+    """Get device operations (newest first), or watch them for status changes.
+
+    Repeated watches are cheap: all watches share one polling loop, or realtime notifications where available.
+    """
+    ids = [i.strip() for i in operation_ids.split(",") if i.strip()]
+    if not device_id and not ids:
+        raise ValueError("Provide a device_id or operation_ids.")
+    c8y = get_c8y()
+
+    if watch:
+        try:
+            transitions, current = await operations.watch(
+                c8y, ids, device_id or None, watch_timeout
+            )
+        except Exception as e:
+            raise ValueError(f"Failed to watch operations: {str(e)}")
+        if transitions:
+            return transition_formatter.operations_to_table(transitions, tablefmt)
+        states = ", ".join(f"{o.id} {o.status}" for o in current) or "none"
+        if current and all(o.status in operations.FINAL_STATUSES for o in current):
+            return f"All watched operations are finished: {states}"
+        return f"No status changes within {watch_timeout:g}s. Current: {states}"
 
-    return event_formatter.events_to_table(events)
+    try:
+        if ids:
+            records = await operations.get_operations(c8y, ids)
+            if status:
+                records = [record for record in records if record.status == status]
+        else:
+            records = await fetch_pages(
+                c8y,
+                "/devicecontrol/operations",
+                "operations",
+                query_params(deviceId=device_id, status=status, revert=True),
+                page_size=page_size,
+                current_page=current_page,
+                parse=OperationRecord.from_json,
+            )
+    except Exception as e:
+        raise ValueError(f"Failed to retrieve operations: {str(e)}")
+    if len(records) == 0:
+        return "No operations found"
+    return operation_formatter.operations_to_table(records, tablefmt)
+
+
+# Count-only queries issued at most for a histogram, one per interval
+MAX_COUNT_QUERIES = 200
+
+
+@mcp.tool()
+async def get_event_histogram(
+    ctx: Context,
+    device_id: Annotated[
+        str,
+        Field(description="Device ID for which to count events. This is required."),
+    ],
+    date_from: Annotated[
+        str,
+        Field(
+            description="Start of the window in ISO 8601 format with milliseconds and UTC timezone: YYYY-MM-DDThh:mm:ss.sssZ"
+        ),
+    ],
+    date_to: Annotated[
+        str,
+        Field(
+            description="End of the window in ISO 8601 format (defaults to now): YYYY-MM-DDThh:mm:ss.sssZ"
+        ),
+    ] = "",
+    interval: Annotated[
+        str,
+        Field(
+            description="Length of the histogram intervals, e.g. '15m', '1h', '1d' or '1w'"
+        ),
+    ] = "1h",
+    include_children: Annotated[
+        bool,
+        Field(description="If set, include events for child assets and devices."),
+    ] = False,
+    event_type: Annotated[
+        Optional[str],
+        Field(
+            description="If provided, only events of this type are counted, which is much faster for long windows."
+        ),
+    ] = None,
+) -> str:
+    """Count the events of a device (optionally including children) per type and time interval.
+
+    Returns a compact table with one row per interval containing events and one
+    column per event type, instead of the individual events.
+    """
+    c8y = get_c8y()
+    start = timeseries.parse_time(date_from)
+    end = timeseries.parse_time(date_to) if date_to else time.time()
+    histogram = EventHistogram(start, end, parse_interval(interval))
+    params = query_params(source=device_id, type=event_type)
+    if include_children:
+        params["withSourceAssets"] = "true"
+        params["withSourceDevices"] = "true"
+
+    def window_params(window_start: float, window_end: float) -> dict:
+        return {
+            **params,
+            "dateFrom": timeseries.format_time(window_start),
+            "dateTo": timeseries.format_time(window_end),
+        }
+
+    method = None
+    if event_type:
+        # With a known type, counting per interval is cheaper than a full scan
+        # once the scan would need more pages than there are intervals
+        total = await count_elements(c8y, "/event/events", window_params(start, end))
+        if total == 0:
+            return "No events found"
+        if (
+            total is not None
+            and -(-total // 2000) > histogram.size
+            and histogram.size <= MAX_COUNT_QUERIES
+        ):
+            counts = await asyncio.gather(
+                *(
+                    count_elements(
+                        c8y, "/event/events", window_params(*histogram.bounds(index))
+                    )
+                    for index in range(histogram.size)
+                )
+            )
+            if all(count is not None for count in counts):
+                for index, count in enumerate(counts):
+                    histogram.set_count(event_type, index, count)
+                method = f"{histogram.size} count queries"
+
+    if method is None:
+        budget = MemoryBudget()
+        await fetch_pages(
+            c8y,
+            "/event/events",
+            "events",
+            window_params(start, end),
+            page_size=2000,
+            pages=ALL_PAGES,
+            parse=EventRecord.from_json,
+            ctx=ctx,
+            budget=budget,
+            sink=histogram.add,
+        )
+        method = "scan of all events"
+        if budget.exhausted:
+            method += ", incomplete because a page exceeded the memory budget"
+
+    total = histogram.total
+    if total == 0:
+        return "No events found"
+    return (
+        f"{total} events per {interval} interval ({method}), empty intervals omitted\n\n"
+        + histogram.to_table()
+    )
 
 
 @mcp.tool()
@@ -543,7 +1543,7 @@ async def get_asset_hierarchy(
     columns = ["Device ID", "Device Name", "Device Type", "Device Owner"]
     try:
         # Get parent objects using the withParents option
-        assetWithParents = get_asset_with_parents(asset_id)
+        assetWithParents = await get_asset_with_parents(asset_id)
 
         # Format the hierarchy
         hierarchy_section = ["# Asset Hierarchy"]
@@ -600,6 +1600,61 @@ async def get_asset_hierarchy(
         )
 
 
+@mcp.tool()
+async def get_asset_subtree(
+    asset_id: Annotated[
+        str,
+        Field(description="ID of the asset or device at the root of the subtree."),
+    ],
+    max_depth: Annotated[
+        int,
+        Field(description="Number of levels below the root to include."),
+    ] = 5,
+    max_nodes: Annotated[
+        int,
+        Field(description=f"Maximum number of nodes to include (at most {MAX_NODES})."),
+    ] = 2000,
+    output: Annotated[
+        str,
+        Field(
+            description="'tree' for an indented tree (ID, name, type per line) or "
+            "'edges' for a table of parent-child references."
+        ),
+    ] = "tree",
+) -> str:
+    """Get all assets and devices below an asset or device, e.g. the whole hierarchy of a site.
+
+    Walks the child assets and child devices level by level, fetching each level
+    with a few batched requests. Prefer it over repeated get_asset_hierarchy or
+    get_child_devices calls to explore a hierarchy.
+    """
+    if output not in ("tree", "edges"):
+        raise ValueError(f"Invalid output '{output}', use 'tree' or 'edges'")
+    try:
+        subtree = await load_subtree(get_c8y(), asset_id, max_depth, max_nodes)
+    except Exception as e:
+        raise ValueError(
+            f"Failed to retrieve the subtree of asset {asset_id}: {str(e)}"
+        )
+
+    sections = [
+        f"# Subtree of {subtree.name(asset_id)} ({asset_id}): {len(subtree.depths)} "
+        f"nodes, {max(subtree.depths.values())} levels, {subtree.requests} requests",
+        subtree.to_tree() if output == "tree" else subtree.to_edges(),
+    ]
+    if subtree.node_limit_reached:
+        sections.append(
+            f"[TRUNCATED: the node limit of {min(max_nodes, MAX_NODES)} was reached, "
+            f"start from a child asset to see the rest.]"
+        )
+    if subtree.unexpanded:
+        sections.append(
+            f"[{len(subtree.unexpanded)} nodes at depth {max_depth} have children "
+            f"which are not shown, increase max_depth to see them.]"
+        )
+    return "\n".join(sections)
+
+
 @mcp.tool()
 async def evaluate_jsonata_expression(
     source_json: Annotated[
@@ -620,3 +1675,78 @@ async def evaluate_jsonata_expression(
     expr = jsonata.Jsonata(expression)
     result = expr.evaluate(data)
     return str(result) if result is not None else ""
+
+
+@mcp.tool()
+async def list_api_operations(
+    tag: Annotated[
+        str,
+        Field(description="Only list operations with this tag, e.g. 'Managed objects'"),
+    ] = "",
+    search: Annotated[
+        str,
+        Field(
+            description="Only list operations whose ID, path or summary contains this text"
+        ),
+    ] = "",
+) -> str:
+    """List the Cumulocity REST API operations available through call_api_operation.
+
+    Use this for data not covered by the other tools, then describe_api_operation
+    to see the parameters of an operation.
+    """
+    operations = openapi.find_operations(tag=tag, search=search)
+    if len(operations) == 0:
+        return "No operations found"
+    return openapi.operations_to_table(operations)
+
+
+@mcp.tool()
+async def describe_api_operation(operation_id: str) -> str:
+    """Describe the parameters and response properties of a Cumulocity REST API operation."""
+    return openapi.describe(openapi.get_operation(operation_id))
+
+
+@mcp.tool()
+async def call_api_operation(
+    operation_id: str,
+    path_params: Annotated[
+        Optional[dict],
+        Field(description="Values of the path parameters, e.g. {'id': '12345'}"),
+    ] = None,
+    query_params: Annotated[
+        Optional[dict],
+        Field(description="Values of the query parameters, e.g. {'pageSize': 5}"),
+    ] = None,
+    body: Annotated[
+        Optional[dict],
+        Field(description="JSON body (only for operations other than GET)"),
+    ] = None,
+) -> str:
+    """Call a Cumulocity REST API operation listed by list_api_operations.
+
+    Returns the JSON response.
+    """
+    operation = openapi.get_operation(operation_id)
+    path, params = openapi.build_request(operation, path_params, query_params)
+    c8y = get_c8y()
+    try:
+        if operation.method == "get":
+            result = await asyncio.to_thread(c8y.get, path, params=params)
+        elif operation.method == "delete":
+            await asyncio.to_thread(c8y.delete, path, json=body, params=params)
+            result = {}
+        elif operation.method == "put":
+            result = await asyncio.to_thread(c8y.put, path, json=body, params=params)
+        elif operation.method == "patch":
+            result = await asyncio.to_thread(openapi.patch, c8y, path, body, params)
+        elif operation.method == "post":
+            # CumulocityRestApi.post takes no query parameters
+            if params:
+                path = f"{path}?{urlencode(params)}"
+            result = await asyncio.to_thread(c8y.post, path, json=body or {})
+        else:
+            raise ValueError(f"Unsupported method {operation.method.upper()}")
+    except Exception as e:
+        raise ValueError(f"Failed to call {operation_id}: {str(e)}")
+    return json.dumps(result)
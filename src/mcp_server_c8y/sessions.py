@@ -0,0 +1,155 @@
+"""
+Device contexts remembered per client session (``get_device_context``).
+
+Agents call ``get_device_context`` for the same device many times in one
+conversation, and every call used to refetch and re-render all sections,
+including the full fragment dump and the software list. The sections last
+returned for a device are now remembered per MCP session, together with the
+``lastUpdated`` of the device and of its newest child device. A follow-up
+call first asks the platform whether anything was updated since (queries
+returning at most one managed object) and reuses the remembered sections of
+what was not. With ``incremental=true`` it then returns either a short
+"unchanged" marker or only the sections which changed (as line diffs when
+those are shorter) instead of the full document.
+
+The memory of a session is released together with the session.
+"""
+
+import difflib
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from . import settings
+from .tenancy import scoped
+
+# Order of the sections of a device context ("Device" is the summary)
+SECTIONS = (
+    "Device",
+    "Agent Information",
+    "Software List",
+    "Supported Logs",
+    "Supported Configurations",
+    "Supported Measurements",
+    "Supported Operations",
+    "Child Devices",
+    "Additional Device Fragments",
+)
+
+# Sections rendered from the device managed object itself
+DEVICE_SECTIONS = tuple(
+    name for name in SECTIONS if name not in ("Supported Measurements", "Child Devices")
+)
+
+
+class DeviceContext:
+    """Sections of a device context as last returned in a session."""
+
+    __slots__ = (
+        "device_updated",
+        "children_updated",
+        "child_devices_limit",
+        "sections",
+    )
+
+    def __init__(
+        self,
+        device_updated: str,
+        children_updated: str,
+        child_devices_limit: int,
+        sections: Dict[str, str],
+    ):
+        self.device_updated = device_updated
+        self.children_updated = children_updated
+        self.child_devices_limit = child_devices_limit
+        self.sections = sections
+
+    def document(self) -> str:
+        return "\n\n".join(self.sections.values())
+
+
+# Device contexts per session, most recently used last
+_sessions: "weakref.WeakKeyDictionary[Any, OrderedDict[str, DeviceContext]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_context(session: Any, device_id: str) -> Optional[DeviceContext]:
+    """The device context last returned in a session (None if there is none)."""
+    contexts = _sessions.get(session)
+    if contexts is None:
+        return None
+    key = scoped(device_id)
+    context = contexts.get(key)
+    if context is not None:
+        contexts.move_to_end(key)
+    return context
+
+
+def set_context(session: Any, device_id: str, context: DeviceContext) -> None:
+    contexts = _sessions.setdefault(session, OrderedDict())
+    key = scoped(device_id)
+    contexts[key] = context
+    contexts.move_to_end(key)
+    while len(contexts) > settings.context_max_devices:
+        contexts.popitem(last=False)
+
+
+def ordered(sections: Dict[str, str]) -> Dict[str, str]:
+    """Sections in the order of a device context."""
+    return {name: sections[name] for name in SECTIONS if name in sections}
+
+
+def _line_diff(previous: str, current: str) -> str:
+    lines = difflib.unified_diff(
+        previous.splitlines(), current.splitlines(), lineterm="", n=0
+    )
+    # Keep the changed lines, without file headers and hunk ranges
+    return "\n".join(
+        line
+        for line in lines
+        if not line.startswith(("---", "+++", "@@")) and line.strip("+- ")
+    )
+
+
+def diff_contexts(
+    device_id: str, previous: DeviceContext, current: DeviceContext
+) -> str:
+    """Describe the changes between two device contexts of a session."""
+    if previous.sections == current.sections:
+        return (
+            f"Device context of {device_id} is unchanged since the last call "
+            "in this session. Call without incremental to get the full document."
+        )
+
+    changed = []
+    unchanged = []
+    for name, section in current.sections.items():
+        before = previous.sections.get(name)
+        if before == section:
+            unchanged.append(name)
+        elif before is None:
+            changed.append(f"## {name} (added)\n{_body(name, section)}")
+        else:
+            diff = _line_diff(before, section)
+            if len(diff) < len(section):
+                changed.append(f"## {name} (changed lines)\n{diff}")
+            else:
+                changed.append(f"## {name} (changed)\n{_body(name, section)}")
+    removed = [name for name in previous.sections if name not in current.sections]
+
+    output = [
+        f"Device context of {device_id} changed since the last call in this "
+        "session. Only the changed sections are shown."
+    ]
+    if unchanged:
+        output.append(f"Unchanged sections: {', '.join(unchanged)}")
+    if removed:
+        output.append(f"Removed sections: {', '.join(removed)}")
+    return "\n\n".join(["\n".join(output)] + changed)
+
+
+def _body(name: str, section: str) -> str:
+    """A section without its own heading."""
+    heading = f"## {name}\n"
+    return section[len(heading) :] if section.startswith(heading) else section
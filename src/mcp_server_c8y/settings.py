@@ -1,7 +1,149 @@
+import os
+
+
 def init():
     global selected_transport
     global toolBlacklist, methodWhitelist
+    global cache_backend, cache_dir, cache_ttl, cache_maxsize
+    global cache_max_bytes, cache_max_stale
+    global realtime_enabled, realtime_cache_ttl
+    global timeseries_enabled, timeseries_dir, timeseries_retention
+    global timeseries_overlap, timeseries_max_pages
+    global upstream_rate, upstream_burst, upstream_concurrency
+    global upstream_retries, upstream_queue_timeout
+    global upstream_timeout, upstream_timeouts, hedge_percentile, hedge_min_delay
+    global breaker_threshold, breaker_min_requests, breaker_window
+    global breaker_open_seconds
+    global request_memory_budget
+    global page_concurrency, page_max_rows
+    global multi_tenant, tenant_slots, tenant_concurrency, tenant_memory
+    global tenant_weights, tenant_auth_ttl
+    global tool_timeout, tool_timeouts
+    global search_max_bytes, search_refresh, search_rebuild
+    global context_max_devices
+    global warmers, warmup_budget, warmup_devices
+    global operations_poll_min, operations_poll_max
     selected_transport = ""
 
-    toolBlacklist = []
-    methodWhitelist = ["get"]
+    # Tools and API operation IDs which are not offered to clients
+    toolBlacklist = [
+        name.strip()
+        for name in os.getenv("MCP_TOOL_BLACKLIST", "").split(",")
+        if name.strip()
+    ]
+    # HTTP methods of the API operations available through call_api_operation
+    methodWhitelist = [
+        method.strip().lower()
+        for method in os.getenv("MCP_METHOD_WHITELIST", "get").split(",")
+        if method.strip()
+    ]
+
+    # Cache configuration ("memory" is per process, "file" is shared between
+    # workers, "sqlite" is shared and persisted across restarts)
+    cache_backend = os.getenv("MCP_CACHE_BACKEND", "memory").lower()
+    cache_dir = os.getenv("MCP_CACHE_DIR", "")
+    cache_ttl = float(os.getenv("MCP_CACHE_TTL", "60"))
+    cache_maxsize = int(os.getenv("MCP_CACHE_MAXSIZE", "2048"))
+    cache_max_bytes = int(os.getenv("MCP_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    # Expired entries younger than this are served while refreshed in the background
+    cache_max_stale = float(
+        os.getenv("MCP_CACHE_MAX_STALE", "86400" if cache_backend == "sqlite" else "0")
+    )
+
+    # Realtime notifications keeping the caches current
+    realtime_enabled = os.getenv("MCP_REALTIME", "").lower() in ("true", "1", "yes")
+    realtime_cache_ttl = float(os.getenv("MCP_REALTIME_CACHE_TTL", "900"))
+
+    # Local measurement store serving get_device_measurements
+    timeseries_enabled = os.getenv("MCP_TIMESERIES", "").lower() in ("true", "1", "yes")
+    timeseries_dir = os.getenv("MCP_TIMESERIES_DIR", "")
+    timeseries_retention = (
+        float(os.getenv("MCP_TIMESERIES_RETENTION_DAYS", "7")) * 86400
+    )
+    # Seconds before the last synced time refetched to pick up late measurements
+    timeseries_overlap = float(os.getenv("MCP_TIMESERIES_OVERLAP", "300"))
+    timeseries_max_pages = int(os.getenv("MCP_TIMESERIES_MAX_PAGES", "50"))
+
+    # Admission control for the requests to Cumulocity (per tenant and process)
+    upstream_rate = float(os.getenv("MCP_UPSTREAM_RATE", "50"))
+    upstream_burst = float(os.getenv("MCP_UPSTREAM_BURST", "20"))
+    upstream_concurrency = int(os.getenv("MCP_UPSTREAM_CONCURRENCY", "10"))
+    upstream_retries = int(os.getenv("MCP_UPSTREAM_RETRIES", "2"))
+    upstream_queue_timeout = float(os.getenv("MCP_UPSTREAM_QUEUE_TIMEOUT", "60"))
+
+    # Total time limit of upstream requests, overridable per resource path
+    # prefix, e.g. "/measurement=20,/inventory/managedObjects=10"
+    upstream_timeout = float(os.getenv("MCP_UPSTREAM_TIMEOUT", "30"))
+    upstream_timeouts = {}
+    for item in os.getenv("MCP_UPSTREAM_TIMEOUTS", "").split(","):
+        if "=" in item:
+            prefix, seconds = item.split("=", 1)
+            upstream_timeouts[prefix.strip()] = float(seconds)
+
+    # Deadline of tool calls in seconds (0 disables), overridable per tool,
+    # e.g. "get_fleet_health=600,get_alarms=60"
+    tool_timeout = float(os.getenv("MCP_TOOL_TIMEOUT", "300"))
+    tool_timeouts = {}
+    for item in os.getenv("MCP_TOOL_TIMEOUTS", "").split(","):
+        if "=" in item:
+            tool, seconds = item.split("=", 1)
+            tool_timeouts[tool.strip()] = float(seconds)
+
+    # Hedge idempotent requests slower than this latency percentile (0 disables)
+    hedge_percentile = float(os.getenv("MCP_HEDGE_PERCENTILE", "95"))
+    hedge_min_delay = float(os.getenv("MCP_HEDGE_MIN_DELAY", "0.05"))
+
+    # Circuit breaker per upstream endpoint
+    breaker_threshold = float(os.getenv("MCP_BREAKER_THRESHOLD", "0.5"))
+    breaker_min_requests = int(os.getenv("MCP_BREAKER_MIN_REQUESTS", "10"))
+    breaker_window = int(os.getenv("MCP_BREAKER_WINDOW", "20"))
+    breaker_open_seconds = float(os.getenv("MCP_BREAKER_OPEN_SECONDS", "30"))
+
+    # Bytes of response rows a single tool call may hold (0 disables the limit)
+    request_memory_budget = int(
+        os.getenv("MCP_REQUEST_MEMORY_BUDGET", str(8 * 1024 * 1024))
+    )
+
+    # Pages of a multi-page retrieval fetched at the same time, and the row
+    # limit of the "all_pages" mode of the list tools
+    page_concurrency = int(os.getenv("MCP_PAGE_CONCURRENCY", "4"))
+    page_max_rows = int(os.getenv("MCP_PAGE_MAX_ROWS", "20000"))
+
+    # Serve the tenants of the request credentials (not only C8Y_TENANT) with
+    # fair scheduling of their tool calls
+    multi_tenant = os.getenv("MCP_MULTI_TENANT", "").lower() in ("true", "1", "yes")
+    tenant_slots = int(os.getenv("MCP_TENANT_SLOTS", "16"))
+    tenant_concurrency = int(os.getenv("MCP_TENANT_CONCURRENCY", "4"))
+    tenant_memory = int(os.getenv("MCP_TENANT_MEMORY", str(32 * 1024 * 1024)))
+    # Scheduling weights, e.g. "t12345=2,t67890=0.5" (default 1)
+    tenant_weights = {}
+    for item in os.getenv("MCP_TENANT_WEIGHTS", "").split(","):
+        if "=" in item:
+            tenant, weight = item.split("=", 1)
+            tenant_weights[tenant.strip()] = max(float(weight), 0.01)
+    # Seconds the tenant of verified credentials is remembered
+    tenant_auth_ttl = float(os.getenv("MCP_TENANT_AUTH_TTL", "300"))
+
+    # Local device search index (search_devices)
+    search_max_bytes = int(os.getenv("MCP_SEARCH_MAX_BYTES", str(32 * 1024 * 1024)))
+    search_refresh = float(os.getenv("MCP_SEARCH_REFRESH", "60"))
+    search_rebuild = float(os.getenv("MCP_SEARCH_REBUILD", "3600"))
+
+    # Device contexts remembered per client session for incremental
+    # get_device_context results
+    context_max_devices = int(os.getenv("MCP_CONTEXT_MAX_DEVICES", "32"))
+
+    # Cache warmers run at startup of the HTTP transports (see warmup, none
+    # by default), the seconds they may take before the server reports ready,
+    # and the devices preloaded by hot_devices: comma-separated IDs, or the
+    # number of most recently updated devices
+    warmers = [
+        name.strip() for name in os.getenv("MCP_WARMERS", "").split(",") if name.strip()
+    ]
+    warmup_budget = float(os.getenv("MCP_WARMUP_BUDGET", "30"))
+    warmup_devices = os.getenv("MCP_WARMUP_DEVICES", "20").strip()
+
+    # Interval of the shared operation status poll (get_operations with
+    # watch): it starts at the minimum and doubles while nothing changes
+    operations_poll_min = float(os.getenv("MCP_OPERATIONS_POLL_MIN", "2"))
+    operations_poll_max = float(os.getenv("MCP_OPERATIONS_POLL_MAX", "30"))
@@ -0,0 +1,261 @@
+"""
+Incremental reading of collection pages within a per-request memory budget.
+
+A page of 2000 managed objects with large fragments can take far more
+memory than the whole microservice may use. ``read_page`` therefore parses
+the item array of a response while the body is being received: every item
+is decoded, passed to ``parse`` (which keeps only what is rendered) and
+dropped, so only the parsed rows and one item are held at a time. Rows are
+charged to a ``MemoryBudget`` by the size of their JSON. Once the budget
+of the tool call is used up, the response is closed and the rows read so
+far are returned as truncated. Responses which are known to fit into the
+remaining budget are decoded at once, which is faster. The body of a tool
+call which was cancelled is not read any further.
+"""
+
+import codecs
+import json
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from . import deadlines, settings
+from .records import check_response, loads
+
+# Size of the chunks read from the response body
+CHUNK_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_whitespace = " \t\n\r"
+_delimiters = ",]}" + _whitespace
+
+
+class MemoryBudget:
+    """Bytes of row data a single tool call may hold."""
+
+    def __init__(self, limit: Optional[int] = None):
+        self.limit = settings.request_memory_budget if limit is None else limit
+        self.used = 0
+        self.exhausted = False
+        # Pages may be read concurrently in worker threads
+        self._lock = threading.Lock()
+
+    @property
+    def remaining(self) -> int:
+        return max(self.limit - self.used, 0) if self.limit > 0 else -1
+
+    def charge(self, size: int) -> bool:
+        """Account for a row of the given size; False if it does not fit anymore."""
+        if self.limit <= 0:
+            return True
+        with self._lock:
+            if self.used + size > self.limit:
+                self.exhausted = True
+                return False
+            self.used += size
+            return True
+
+    def release(self, size: int) -> None:
+        """Return the size of rows which are not held anymore."""
+        with self._lock:
+            self.used = max(self.used - size, 0)
+
+    def truncation_marker(self, rows: int) -> str:
+        """Note appended to the output of a tool call which hit the budget."""
+        if self.limit >= 1024 * 1024:
+            size = f"{self.limit // (1024 * 1024)} MB"
+        else:
+            size = f"{self.limit} bytes"
+        return (
+            f"\n[TRUNCATED: the result exceeded the memory budget of {size} per "
+            f"request, only the first {rows} rows are shown. Use filters or a "
+            f"smaller page_size.]"
+        )
+
+
+class PageBudget:
+    """The share of a MemoryBudget used by a single page."""
+
+    def __init__(self, budget: MemoryBudget):
+        self.budget = budget
+        self.used = 0
+        # Whether this page was cut short by the budget
+        self.truncated = False
+
+    @property
+    def remaining(self) -> int:
+        return self.budget.remaining
+
+    @property
+    def exhausted(self) -> bool:
+        return self.budget.exhausted
+
+    @exhausted.setter
+    def exhausted(self, value: bool) -> None:
+        self.truncated = self.truncated or value
+        self.budget.exhausted = self.budget.exhausted or value
+
+    def charge(self, size: int) -> bool:
+        if not self.budget.charge(size):
+            self.truncated = True
+            return False
+        self.used += size
+        return True
+
+
+class BudgetExceeded(Exception):
+    """Raised by the reader when a single item does not fit the budget."""
+
+
+class _JsonStream:
+    """Decodes JSON values one by one from a stream of byte chunks."""
+
+    def __init__(self, chunks: Iterator[bytes]):
+        self._chunks = chunks
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self._scope = deadlines.current_scope.get()
+
+    def _fill(self) -> bool:
+        """Read the next chunk; False at the end of the body."""
+        if self.eof:
+            return False
+        if self._scope is not None:
+            # Closed by read_page, so the rest of the body is not received
+            self._scope.check("aborted_responses")
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self.eof = True
+            self.buffer = self.buffer[self.pos :] + self._utf8.decode(b"", True)
+        else:
+            self.buffer = self.buffer[self.pos :] + self._utf8.decode(chunk)
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character ('' at the end of the body)."""
+        while True:
+            buffer = self.buffer
+            pos = self.pos
+            while pos < len(buffer) and buffer[pos] in _whitespace:
+                pos += 1
+            self.pos = pos
+            if pos < len(buffer):
+                return buffer[pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise ValueError(f"Invalid JSON response, expected '{char}'")
+        self.pos += 1
+
+    def value(self, limit: int = -1) -> Tuple[Any, int]:
+        """Decode the next value, returning it with its size in characters.
+
+        Raises:
+            BudgetExceeded: if the value is larger than limit (>= 0)
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+                # A number cut off by the end of the buffer, e.g. '1.' of '1.5',
+                # is complete only if followed by a delimiter
+                if (
+                    self.eof
+                    or self.buffer[end - 1] in ']}"'
+                    or (end < len(self.buffer) and self.buffer[end] in _delimiters)
+                ):
+                    size = end - self.pos
+                    self.pos = end
+                    return value, size
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Read at least as much again as is pending to avoid quadratic retries
+            pending = len(self.buffer) - self.pos
+            while len(self.buffer) - self.pos < 2 * pending + CHUNK_SIZE:
+                if 0 <= limit < len(self.buffer) - self.pos:
+                    raise BudgetExceeded()
+                if not self._fill():
+                    break
+
+
+def read_items(
+    response,
+    array_key: str,
+    parse: Callable[[dict], Any],
+    budget: MemoryBudget,
+) -> Tuple[List[Any], Dict[str, Any]]:
+    """Parse a collection response incrementally.
+
+    Returns:
+        The parsed items of array_key and the other top-level properties
+        (those following the array are missing if the budget was exhausted)
+    """
+    stream = _JsonStream(response.iter_content(CHUNK_SIZE))
+    items: List[Any] = []
+    rest: Dict[str, Any] = {}
+    stream.expect("{")
+    if stream.peek() == "}":
+        return items, rest
+    while True:
+        key, _ = stream.value()
+        stream.expect(":")
+        if key == array_key and stream.peek() == "[":
+            stream.pos += 1
+            while stream.peek() != "]":
+                try:
+                    item, size = stream.value(budget.remaining)
+                except BudgetExceeded:
+                    budget.exhausted = True
+                    return items, rest
+                if not budget.charge(size):
+                    return items, rest
+                items.append(parse(item))
+                if stream.peek() == ",":
+                    stream.pos += 1
+            stream.pos += 1
+        else:
+            rest[key], _ = stream.value()
+        if stream.peek() != ",":
+            break
+        stream.pos += 1
+    stream.expect("}")
+    return items, rest
+
+
+def read_page(
+    c8y,
+    resource: str,
+    params: Dict[str, Any],
+    array_key: str,
+    parse: Callable[[dict], Any],
+    budget: MemoryBudget,
+) -> Tuple[List[Any], Dict[str, Any]]:
+    """GET a collection page, parsing its items within the budget.
+
+    Raises the same exceptions as ``c8y.get``.
+    """
+    response = c8y.session.get(
+        c8y.base_url + resource,
+        params=params,
+        headers={"Accept": "application/json"},
+        stream=True,
+    )
+    with response:
+        check_response(response, resource)
+        length = response.headers.get("Content-Length")
+        if (
+            length is not None
+            and "Content-Encoding" not in response.headers
+            and (budget.remaining < 0 or int(length) <= budget.remaining)
+        ):
+            # Small enough to be decoded at once (with orjson if installed)
+            budget.charge(int(length))
+            result = loads(response.content) if response.content else {}
+            items = [parse(item) for item in result.pop(array_key, [])]
+            return items, result
+        return read_items(response, array_key, parse, budget)
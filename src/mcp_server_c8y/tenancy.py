@@ -0,0 +1,283 @@
+"""
+Serving several Cumulocity tenants from one server instance.
+
+With MCP_MULTI_TENANT enabled, every tool call runs in the scope of the
+tenant of its credentials (``current_tenant``). Caches, the device search
+index and the time series store are kept per tenant, and each set of
+credentials gets its own Cumulocity client. The clients of a tenant share
+its connection pool and upstream governor, which only account requests to
+the tenant once it was verified.
+
+Tool calls are admitted by a ``TenantScheduler``: at most MCP_TENANT_SLOTS
+calls run at the same time, and a waiting call of the tenant with the
+smallest virtual finish time (weighted fair queuing, weights from
+MCP_TENANT_WEIGHTS) gets the next free slot. A tenant never runs more than
+MCP_TENANT_CONCURRENCY calls at once, nor more calls than its memory quota
+MCP_TENANT_MEMORY allows at MCP_REQUEST_MEMORY_BUDGET per call, so a tenant
+issuing bulk queries only delays its own calls.
+"""
+
+import asyncio
+import base64
+import binascii
+import json
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastmcp import FastMCP
+
+from . import deadlines, settings
+
+# Tenant of the current tool call; empty for the tenant of the service
+# credentials (C8Y_TENANT), whose data is not scoped
+current_tenant: ContextVar[str] = ContextVar("current_tenant", default="")
+
+
+def scoped(name: str) -> str:
+    """Name of a per-tenant resource (cache namespace, directory) for the current tenant."""
+    tenant = current_tenant.get()
+    return f"{name}@{tenant}" if tenant else name
+
+
+def tenant_from_authorization(authorization: Optional[str]) -> Optional[str]:
+    """Tenant claimed by an Authorization header, not verified.
+
+    Basic credentials name it as 'tenant/user', Cumulocity tokens carry it
+    in the 'ten' claim.
+    """
+    if not authorization:
+        return None
+    scheme, _, credentials = authorization.partition(" ")
+    try:
+        if scheme == "Basic":
+            username = base64.b64decode(credentials).decode("utf-8").split(":", 1)[0]
+            tenant, separator, _ = username.partition("/")
+            return tenant if separator and tenant else None
+        if scheme == "Bearer":
+            payload = credentials.split(".")[1]
+            payload += "=" * (-len(payload) % 4)
+            claims = json.loads(base64.urlsafe_b64decode(payload))
+            tenant = claims.get("ten") if isinstance(claims, dict) else None
+            return str(tenant) if tenant else None
+    except (IndexError, ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+    return None
+
+
+class _TenantState:
+    __slots__ = (
+        "weight",
+        "active",
+        "finish",
+        "waiting",
+        "calls_total",
+        "wait_seconds_total",
+    )
+
+    def __init__(self, weight: float):
+        self.weight = weight
+        self.active = 0
+        # Virtual finish time of the last call queued
+        self.finish = 0.0
+        # (virtual start, virtual finish, future) in arrival order
+        self.waiting: List[Tuple[float, float, asyncio.Future]] = []
+        self.calls_total = 0
+        self.wait_seconds_total = 0.0
+
+
+class TenantScheduler:
+    """Weighted fair queuing of tool calls with per-tenant quotas."""
+
+    def __init__(
+        self,
+        slots: int,
+        tenant_concurrency: int,
+        tenant_memory: int,
+        weights: Optional[Dict[str, float]] = None,
+    ):
+        self.slots = max(slots, 1)
+        self.tenant_concurrency = max(tenant_concurrency, 1)
+        self.tenant_memory = tenant_memory
+        self.weights = weights or {}
+        self.active = 0
+        self.virtual_time = 0.0
+        self.tenants: Dict[str, _TenantState] = {}
+
+    def _state(self, tenant: str) -> _TenantState:
+        state = self.tenants.get(tenant)
+        if state is None:
+            state = self.tenants[tenant] = _TenantState(self.weights.get(tenant, 1.0))
+        return state
+
+    def limit(self, tenant: str) -> int:
+        """Calls a tenant may run at the same time."""
+        limit = self.tenant_concurrency
+        if self.tenant_memory > 0 and settings.request_memory_budget > 0:
+            limit = min(
+                limit, max(self.tenant_memory // settings.request_memory_budget, 1)
+            )
+        return limit
+
+    def _admissible(self, tenant: str, state: _TenantState) -> bool:
+        return self.active < self.slots and state.active < self.limit(tenant)
+
+    def _admit(self, state: _TenantState) -> None:
+        self.active += 1
+        state.active += 1
+        state.calls_total += 1
+
+    def _dispatch(self) -> None:
+        """Hand free slots to the waiting calls with the smallest finish times."""
+        while self.active < self.slots:
+            best = None
+            for tenant, state in self.tenants.items():
+                if state.waiting and state.active < self.limit(tenant):
+                    if best is None or state.waiting[0][1] < best[1].waiting[0][1]:
+                        best = (tenant, state)
+            if best is None:
+                return
+            state = best[1]
+            start, _, future = state.waiting.pop(0)
+            self.virtual_time = max(self.virtual_time, start)
+            self._admit(state)
+            future.set_result(None)
+
+    async def acquire(self, tenant: str) -> None:
+        state = self._state(tenant)
+        start = max(self.virtual_time, state.finish)
+        state.finish = start + 1.0 / state.weight
+        if not state.waiting and self._admissible(tenant, state):
+            self.virtual_time = max(self.virtual_time, start)
+            self._admit(state)
+            return
+        future = asyncio.get_running_loop().create_future()
+        entry = (start, state.finish, future)
+        state.waiting.append(entry)
+        waiting_since = time.monotonic()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if entry in state.waiting:
+                state.waiting.remove(entry)
+            elif future.done() and not future.cancelled():
+                # Admitted right before being cancelled
+                self.release(tenant)
+            raise
+        finally:
+            state.wait_seconds_total += time.monotonic() - waiting_since
+
+    def release(self, tenant: str) -> None:
+        state = self._state(tenant)
+        self.active -= 1
+        state.active -= 1
+        self._dispatch()
+
+    async def run(self, tenant: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Run a tool call once the tenant gets a slot."""
+        await self.acquire(tenant)
+        try:
+            return await call()
+        finally:
+            self.release(tenant)
+
+
+_scheduler: Optional[TenantScheduler] = None
+
+
+def get_scheduler() -> TenantScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = TenantScheduler(
+            settings.tenant_slots,
+            settings.tenant_concurrency,
+            settings.tenant_memory,
+            settings.tenant_weights,
+        )
+    return _scheduler
+
+
+class ScopedMCP(FastMCP):
+    """FastMCP server running each tool call in the scope of its tenant and deadline.
+
+    ``resolve_tenant`` returns the (verified) tenant of the credentials of
+    the current request. Calls of ``service_tenant`` use the unscoped caches,
+    which are also kept current by the realtime notifications. The deadline
+    (see ``deadlines``) includes the time waiting for a scheduler slot.
+    """
+
+    resolve_tenant: Optional[Callable[[], Awaitable[str]]] = None
+    service_tenant = ""
+
+    def _requested_timeout(self) -> Optional[float]:
+        """The timeout in the _meta of the current request, if any."""
+        try:
+            meta = self._mcp_server.request_context.meta
+        except LookupError:
+            return None
+        try:
+            return float(getattr(meta, "timeout", None) or 0) or None
+        except (TypeError, ValueError):
+            return None
+
+    async def _call_tool(self, key: str, arguments: dict[str, Any]):
+        call_tool = super()._call_tool
+        return await deadlines.run(
+            key,
+            self._requested_timeout(),
+            lambda: self._call_tool_as_tenant(call_tool, key, arguments),
+        )
+
+    async def _call_tool_as_tenant(self, call_tool, key: str, arguments: dict):
+        if not settings.multi_tenant or self.resolve_tenant is None:
+            return await call_tool(key, arguments)
+        tenant = await self.resolve_tenant()
+        token = current_tenant.set("" if tenant == self.service_tenant else tenant)
+        try:
+            return await get_scheduler().run(tenant, lambda: call_tool(key, arguments))
+        finally:
+            current_tenant.reset(token)
+
+
+def render_metrics() -> str:
+    """Render the per-tenant scheduler metrics in the Prometheus text format."""
+    if _scheduler is None:
+        return ""
+    metrics = [
+        ("mcp_tenant_active_calls", "gauge", "Tool calls running", "active"),
+        (
+            "mcp_tenant_queued_calls",
+            "gauge",
+            "Tool calls waiting for a slot",
+            "queued",
+        ),
+        ("mcp_tenant_calls_total", "counter", "Admitted tool calls", "calls_total"),
+        (
+            "mcp_tenant_wait_seconds_total",
+            "counter",
+            "Total time tool calls waited for a slot",
+            "wait_seconds_total",
+        ),
+        (
+            "mcp_tenant_concurrency_limit",
+            "gauge",
+            "Tool calls the tenant may run at the same time",
+            "limit",
+        ),
+    ]
+    lines = []
+    tenants = sorted(_scheduler.tenants.items())
+    for name, kind, description, attribute in metrics:
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {kind}")
+        for tenant, state in tenants:
+            if attribute == "queued":
+                value = len(state.waiting)
+            elif attribute == "limit":
+                value = _scheduler.limit(tenant)
+            else:
+                value = getattr(state, attribute)
+            if isinstance(value, float):
+                value = round(value, 3)
+            lines.append(f'{name}{{tenant="{tenant}"}} {value}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,496 @@
+"""
+Local store for measurement series, filled incrementally from the platform.
+
+The numeric series of a device are kept per fragment and series in day-sized
+chunk files of interleaved (timestamp, value) doubles. The store remembers
+the time ranges it holds for each device, so a query only fetches the parts
+of its window that are not covered yet. Repeated questions about e.g. the
+last 24 hours then cost one small fetch of the newest measurements, also
+when they alternate with questions about older windows. Worker processes
+sharing the store serialize their updates of a device with a file lock.
+Fetched pages are written to the store as they arrive, and reads only build
+the measurements that are shown, within the memory budget of the tool call.
+"""
+
+import asyncio
+import heapq
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timezone
+from itertools import groupby
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import quote, unquote
+
+from . import settings, tenancy
+from .pagination import fetch_pages, query_params
+from .streaming import MemoryBudget
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+logger = logging.getLogger("mcp_server_c8y")
+
+STORE_VERSION = 2
+
+DAY = 86400.0
+
+# Cumulocity's maximum page size, used for all fetches of the store
+PAGE_SIZE = 2000
+
+# Synced ranges remembered per device, the oldest are forgotten first
+MAX_RANGES = 16
+
+# Times (as epoch seconds) and values of one series
+Series = Tuple[array, array]
+
+
+def parse_time(value: str) -> float:
+    """Convert an ISO 8601 timestamp to epoch seconds (UTC if no offset is given)."""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def format_time(timestamp: float) -> str:
+    """Convert epoch seconds to the ISO 8601 format used by Cumulocity."""
+    millis = int(round(timestamp * 1000))
+    parsed = datetime.fromtimestamp(millis // 1000, timezone.utc)
+    return parsed.strftime("%Y-%m-%dT%H:%M:%S") + f".{millis % 1000:03d}Z"
+
+
+def _series_points(measurement: Dict[str, Any]):
+    """Yield (fragment, series, time, value, unit) for the numeric series of a measurement."""
+    timestamp = parse_time(measurement["time"])
+    for fragment, series_values in measurement.items():
+        if not isinstance(series_values, dict):
+            continue
+        for series, point in series_values.items():
+            if not isinstance(point, dict):
+                continue
+            value = point.get("value")
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                yield fragment, series, timestamp, float(value), point.get("unit", "")
+
+
+class SeriesStore:
+    """Chunked on-disk storage of measurement series.
+
+    Layout: <directory>/<device>/meta.json holds the synced ranges and the
+    units, <directory>/<device>/<fragment>/<series>/<day>.bin the data.
+    Chunks are append-only while data arrives in order and are compacted
+    (sorted and deduplicated) when older or repeated data is added.
+    """
+
+    def __init__(self, directory: str, retention: float):
+        self.directory = directory
+        self.retention = retention
+
+    def _device_dir(self, device_id: str) -> str:
+        return os.path.join(self.directory, quote(device_id, safe=""))
+
+    def load_meta(self, device_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(self._device_dir(device_id), "meta.json")) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("version") != STORE_VERSION:
+            return None
+        return meta
+
+    def save_meta(self, device_id: str, meta: Dict[str, Any]) -> None:
+        device_dir = self._device_dir(device_id)
+        os.makedirs(device_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=device_dir, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({**meta, "version": STORE_VERSION}, f)
+        os.replace(tmp_path, os.path.join(device_dir, "meta.json"))
+
+    def reset(self, device_id: str) -> None:
+        shutil.rmtree(self._device_dir(device_id), ignore_errors=True)
+
+    def lock(self, device_id: str):
+        """Open and lock the lock file of a device; closing the file releases it."""
+        os.makedirs(self.directory, exist_ok=True)
+        lock_file = open(self._device_dir(device_id) + ".lock", "w")
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    def _chunk_path(self, device_id: str, fragment: str, series: str, day: int) -> str:
+        return os.path.join(
+            self._device_dir(device_id),
+            quote(fragment, safe=""),
+            quote(series, safe=""),
+            f"{day}.bin",
+        )
+
+    @staticmethod
+    def _read_chunk(path: str) -> array:
+        data = array("d")
+        try:
+            with open(path, "rb") as f:
+                raw = f.read()
+        except FileNotFoundError:
+            return data
+        # Ignore a point being appended by another process
+        data.frombytes(raw[: len(raw) - len(raw) % 16])
+        return data
+
+    @staticmethod
+    def _write_chunk(path: str, points: List[Tuple[float, float]]) -> None:
+        """Add points (sorted by time) to a chunk, compacting it if needed."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        existing = SeriesStore._read_chunk(path)
+        if len(existing) == 0 or points[0][0] > existing[-2]:
+            data = array("d")
+            for point in points:
+                data.extend(point)
+            with open(path, "ab") as f:
+                data.tofile(f)
+            return
+
+        merged = dict(zip(existing[0::2], existing[1::2]))
+        merged.update(points)
+        data = array("d")
+        for timestamp in sorted(merged):
+            data.extend((timestamp, merged[timestamp]))
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            data.tofile(f)
+        os.replace(tmp_path, path)
+
+    def append(
+        self, device_id: str, meta: Dict[str, Any], measurements: List[dict]
+    ) -> None:
+        """Store the numeric series of raw measurements and record their units in meta."""
+        chunks: Dict[Tuple[str, str, int], List[Tuple[float, float]]] = {}
+        units = meta.setdefault("series", {})
+        for measurement in measurements:
+            try:
+                points = list(_series_points(measurement))
+            except (KeyError, ValueError):
+                continue
+            for fragment, series, timestamp, value, unit in points:
+                day = int(timestamp // DAY)
+                chunks.setdefault((fragment, series, day), []).append(
+                    (timestamp, value)
+                )
+                units.setdefault(fragment, {})[series] = unit
+
+        for (fragment, series, day), points in chunks.items():
+            points.sort()
+            self._write_chunk(
+                self._chunk_path(device_id, fragment, series, day), points
+            )
+
+    def read(
+        self, device_id: str, start: float, end: float
+    ) -> Dict[Tuple[str, str], Series]:
+        """Read all series of a device within [start, end)."""
+        result: Dict[Tuple[str, str], Series] = {}
+        device_dir = self._device_dir(device_id)
+        if not os.path.isdir(device_dir):
+            return result
+        first_day, last_day = int(start // DAY), int(end // DAY)
+        for fragment_dir in os.scandir(device_dir):
+            if not fragment_dir.is_dir():
+                continue
+            for series_dir in os.scandir(fragment_dir.path):
+                times, values = array("d"), array("d")
+                for day in range(first_day, last_day + 1):
+                    data = self._read_chunk(os.path.join(series_dir.path, f"{day}.bin"))
+                    chunk_times = data[0::2]
+                    lo = bisect_left(chunk_times, start)
+                    hi = bisect_left(chunk_times, end)
+                    times.extend(chunk_times[lo:hi])
+                    values.extend(data[1::2][lo:hi])
+                if len(times) > 0:
+                    key = (unquote(fragment_dir.name), unquote(series_dir.name))
+                    result[key] = (times, values)
+        return result
+
+    def enforce_retention(self, device_id: str, meta: Dict[str, Any]) -> None:
+        """Delete chunks older than the retention period."""
+        cutoff = time.time() - self.retention
+        cutoff_day = int(cutoff // DAY)
+        device_dir = self._device_dir(device_id)
+        for fragment_dir in os.scandir(device_dir):
+            if not fragment_dir.is_dir():
+                continue
+            for series_dir in os.scandir(fragment_dir.path):
+                for chunk in os.scandir(series_dir.path):
+                    day = chunk.name.split(".", 1)[0]
+                    if day.isdigit() and int(day) < cutoff_day:
+                        os.remove(chunk.path)
+        meta["ranges"] = [
+            [max(synced_from, cutoff_day * DAY), synced_to]
+            for synced_from, synced_to in meta.get("ranges", [])
+            if synced_to > cutoff_day * DAY
+        ]
+
+
+# Store per tenant ("" for the tenant of the service credentials)
+_stores: Dict[str, SeriesStore] = {}
+_locks: Dict[str, asyncio.Lock] = {}
+
+
+def get_store() -> SeriesStore:
+    tenant = tenancy.current_tenant.get()
+    store = _stores.get(tenant)
+    if store is None:
+        directory = settings.timeseries_dir or os.path.join(
+            tempfile.gettempdir(), "mcp-server-c8y-timeseries"
+        )
+        if tenant:
+            directory = os.path.join(directory, f"@{tenant}")
+        store = _stores[tenant] = SeriesStore(directory, settings.timeseries_retention)
+    return store
+
+
+def covers(start: float) -> bool:
+    """Whether a window starting at start can be served by the store."""
+    return start >= time.time() - settings.timeseries_retention
+
+
+async def _fetch(
+    c8y,
+    store: SeriesStore,
+    device_id: str,
+    meta: Dict[str, Any],
+    date_from: float,
+    date_to: float,
+    revert: bool,
+    ctx,
+) -> Tuple[Optional[float], bool]:
+    """Store the measurements of a range page by page.
+
+    Returns:
+        The time of the last stored measurement (None if there was none)
+        and whether the range is complete
+    """
+    budget = MemoryBudget()
+    last: Optional[float] = None
+    count = 0
+
+    def store_page(page: List[dict]) -> None:
+        nonlocal last, count
+        store.append(device_id, meta, page)
+        count += len(page)
+        if page:
+            last = parse_time(page[-1]["time"])
+
+    await fetch_pages(
+        c8y,
+        "/measurement/measurements",
+        "measurements",
+        query_params(
+            source=device_id,
+            dateFrom=format_time(date_from),
+            dateTo=format_time(date_to),
+            revert=revert,
+        ),
+        page_size=PAGE_SIZE,
+        pages=settings.timeseries_max_pages,
+        ctx=ctx,
+        budget=budget,
+        sink=store_page,
+    )
+    complete = (
+        not budget.exhausted and count < PAGE_SIZE * settings.timeseries_max_pages
+    )
+    return last, complete
+
+
+def _merge(ranges: List[List[float]]) -> List[List[float]]:
+    """Sort ranges, joining those which overlap or touch."""
+    merged: List[List[float]] = []
+    for synced_from, synced_to in sorted(ranges):
+        if merged and synced_from <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], synced_to)
+        else:
+            merged.append([synced_from, synced_to])
+    return merged
+
+
+def _gaps(ranges: List[List[float]], start: float, end: float):
+    """The parts of [start, end) not covered by the (merged) ranges."""
+    gaps = []
+    position = start
+    for synced_from, synced_to in ranges:
+        if synced_to <= position:
+            continue
+        if synced_from >= end:
+            break
+        if synced_from > position:
+            gaps.append((position, synced_from))
+        position = max(position, synced_to)
+    if position < end:
+        gaps.append((position, end))
+    return gaps
+
+
+async def _fill_gap(
+    c8y,
+    store: SeriesStore,
+    device_id: str,
+    meta: Dict[str, Any],
+    gap: Tuple[float, float],
+    ctx,
+) -> Optional[List[float]]:
+    """Fetch the measurements of a gap between synced ranges; returns the range now held."""
+    gap_from, gap_to = gap
+    ranges = meta["ranges"]
+    before = next((r for r in ranges if r[1] == gap_from), None)
+    if before is None:
+        # Fetch newest first, so a truncated result stays adjacent to the synced
+        # range after the gap, or to the end of the window
+        last, complete = await _fetch(
+            c8y, store, device_id, meta, gap_from, gap_to, True, ctx
+        )
+        if complete:
+            return [gap_from, gap_to]
+        return [last, gap_to] if last is not None else None
+
+    # Measurements may arrive late, so refetch the end of the previous range
+    fetch_from = max(gap_from - settings.timeseries_overlap, before[0])
+    last, complete = await _fetch(
+        c8y, store, device_id, meta, fetch_from, gap_to, False, ctx
+    )
+    if complete:
+        return [gap_from, gap_to]
+    return [gap_from, last] if last is not None else None
+
+
+async def sync(
+    c8y, device_id: str, start: float, end: float, ctx=None
+) -> Optional[Tuple[float, float]]:
+    """Make sure the store holds the measurements of a device within [start, end).
+
+    Only the parts of the window outside of the already synced ranges are
+    fetched. A range extended forward is refetched with a small overlap to
+    pick up measurements that arrived late.
+
+    Returns:
+        The part of the window held by the store in one piece up to its end,
+        which starts later than the window if MCP_TIMESERIES_MAX_PAGES cut a
+        fetch short. None if the store does not hold the end of the window.
+    """
+    store = get_store()
+    end = min(end, time.time())
+    if start >= end:
+        return start, start
+    lock = _locks.setdefault(tenancy.scoped(device_id), asyncio.Lock())
+    async with lock:
+        # Other workers sharing the store update the device one at a time, too
+        lock_file = await asyncio.to_thread(store.lock, device_id)
+        try:
+            meta = await asyncio.to_thread(store.load_meta, device_id)
+            if meta is None:
+                await asyncio.to_thread(store.reset, device_id)
+                meta = {"series": {}, "ranges": []}
+
+            for gap in _gaps(meta["ranges"], start, end):
+                held = await _fill_gap(c8y, store, device_id, meta, gap, ctx)
+                if held is not None:
+                    meta["ranges"] = _merge(meta["ranges"] + [held])
+            meta["ranges"] = meta["ranges"][-MAX_RANGES:]
+
+            await asyncio.to_thread(store.enforce_retention, device_id, meta)
+            await asyncio.to_thread(store.save_meta, device_id, meta)
+        finally:
+            lock_file.close()
+
+    for synced_from, synced_to in meta["ranges"]:
+        if synced_from < end <= synced_to:
+            return max(start, synced_from), end
+    return None
+
+
+class StoredMeasurements(NamedTuple):
+    rows: List[Dict[str, Any]]
+    # Start of the part of the window served, later than the requested start
+    # if the store does not hold all of it (see sync)
+    covered_from: float
+
+
+async def measurements(
+    c8y,
+    device_id: str,
+    start: float,
+    end: float,
+    ctx=None,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    budget: Optional[MemoryBudget] = None,
+) -> Optional[StoredMeasurements]:
+    """Get the measurements of a device within [start, end) from the store, newest first.
+
+    Measurements are rebuilt from the stored series, so they only contain
+    time, source and numeric series. The store is read a day at a time,
+    newest first, and only the measurements from offset up to limit are
+    built, as long as they fit into the budget (see budget.exhausted).
+
+    Returns:
+        The measurements, or None if the store does not hold the newest part
+        of the window, so they have to be fetched from the platform
+    """
+    if budget is None:
+        budget = MemoryBudget()
+    covered = await sync(c8y, device_id, start, end, ctx)
+    if covered is None:
+        return None
+    start, end = covered
+    store = get_store()
+    units = (await asyncio.to_thread(store.load_meta, device_id) or {}).get(
+        "series", {}
+    )
+
+    rows: List[Dict[str, Any]] = []
+    skip = offset
+    day = int(end // DAY)
+    while (
+        day >= int(start // DAY)
+        and (limit is None or len(rows) < limit)
+        and not budget.exhausted
+    ):
+        series = await asyncio.to_thread(
+            store.read, device_id, max(start, day * DAY), min(end, (day + 1) * DAY)
+        )
+        day -= 1
+        # Times of all series newest first, each measurement once
+        newest_first = heapq.merge(
+            *(reversed(times) for times, _ in series.values()), reverse=True
+        )
+        for timestamp, _ in groupby(newest_first):
+            if skip > 0:
+                skip -= 1
+                continue
+            if limit is not None and len(rows) >= limit:
+                break
+            row: Dict[str, Any] = {
+                "time": format_time(timestamp),
+                "source": {"id": device_id},
+            }
+            for (fragment, name), (times, values) in series.items():
+                index = bisect_left(times, timestamp)
+                if index == len(times) or times[index] != timestamp:
+                    continue
+                value = values[index]
+                if value.is_integer():
+                    value = int(value)
+                unit = units.get(fragment, {}).get(name, "")
+                row.setdefault(fragment, {})[name] = {"value": value, "unit": unit}
+            if not budget.charge(len(json.dumps(row))):
+                break
+            rows.append(row)
+    return StoredMeasurements(rows, start)
@@ -0,0 +1,220 @@
+"""
+Cache warmers run at startup of the HTTP transports.
+
+After a deployment every cache and upstream connection is cold, so the first
+tool calls are slow. The warmers selected with ``MCP_WARMERS`` run
+concurrently in the background when the server starts, using the service
+credentials (C8Y_USER, C8Y_PASSWORD):
+
+- ``connections`` opens the pooled upstream connections of the tenant;
+- ``device_index`` loads the device search index (names, types and serial
+  numbers of all devices);
+- ``hot_devices`` preloads the managed objects and supported measurements
+  of the devices in ``MCP_WARMUP_DEVICES``, which also make up most of
+  their ``get_device_context``;
+- ``assets`` preloads the root asset groups and their hierarchy.
+
+``/health`` only reports that the process is alive. ``/ready`` reports ready
+once all warmers finished, or after ``MCP_WARMUP_BUDGET`` seconds, when the
+remaining warmers are cancelled.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from . import search, settings
+from .cache import get_cache
+from .pagination import query_params
+from .server import (
+    C8Y_PASSWORD,
+    C8Y_USER,
+    get_asset_with_parents,
+    get_c8y,
+    get_managed_objects,
+    get_supported_measurements,
+    service_call,
+)
+
+logger = logging.getLogger("mcp_server_c8y")
+
+# Root asset groups preloaded by the assets warmer
+MAX_ROOT_ASSETS = 100
+
+_warmers: Dict[str, Callable[[], Awaitable[str]]] = {}
+
+
+def warmer(name: str):
+    """Register a warmer returning a short summary of what it loaded."""
+
+    def register(func: Callable[[], Awaitable[str]]):
+        _warmers[name] = func
+        return func
+
+    return register
+
+
+async def _load_managed_objects(params: Dict) -> List[dict]:
+    """Fetch managed objects into the inventory cache."""
+    c8y = get_c8y()
+    result = await asyncio.to_thread(
+        c8y.get,
+        "/inventory/managedObjects",
+        params=query_params(withChildren=False, **params),
+    )
+    cache = get_cache("inventory")
+    managed_objects = result.get("managedObjects", [])
+    for data in managed_objects:
+        cache.set(data["id"], data)
+    return managed_objects
+
+
+@warmer("connections")
+async def warm_connections() -> str:
+    c8y = get_c8y()
+    # Requests sent at the same time each open a connection of the pool
+    count = settings.upstream_concurrency
+    await asyncio.gather(
+        *(asyncio.to_thread(c8y.get, "/tenant/currentTenant") for _ in range(count))
+    )
+    return f"{count} connections"
+
+
+@warmer("device_index")
+async def warm_device_index() -> str:
+    index = await search.ensure_index(get_c8y())
+    return f"{len(index)} devices"
+
+
+@warmer("hot_devices")
+async def warm_hot_devices() -> str:
+    if settings.warmup_devices.isdigit():
+        devices = await _load_managed_objects(
+            {
+                "query": "$filter=(has(c8y_IsDevice)) $orderby=lastUpdated desc",
+                "pageSize": int(settings.warmup_devices),
+            }
+        )
+        device_ids = [data["id"] for data in devices]
+    else:
+        device_ids = [
+            device_id.strip()
+            for device_id in settings.warmup_devices.split(",")
+            if device_id.strip()
+        ]
+        await get_managed_objects(device_ids)
+    await asyncio.gather(
+        *(get_supported_measurements(device_id) for device_id in device_ids)
+    )
+    return f"{len(device_ids)} devices"
+
+
+@warmer("assets")
+async def warm_assets() -> str:
+    roots = await _load_managed_objects(
+        {
+            "fragmentType": "c8y_IsDeviceGroup",
+            "onlyRoots": True,
+            "pageSize": MAX_ROOT_ASSETS,
+        }
+    )
+    await asyncio.gather(*(get_asset_with_parents(data["id"]) for data in roots))
+    return f"{len(roots)} root assets"
+
+
+class Warmup:
+    """Progress of the startup warmers."""
+
+    def __init__(self):
+        self.finished = False
+        # Per warmer: status ("running", "done", "failed", "cancelled",
+        # "unknown"), seconds taken and a summary or error
+        self.warmers: Dict[str, Dict] = {}
+
+    def report(self) -> Dict:
+        return {
+            "status": "ready" if self.finished else "warming",
+            "warmers": self.warmers,
+        }
+
+
+state = Warmup()
+
+
+async def _run_warmer(name: str) -> None:
+    result = state.warmers[name]
+    start = time.monotonic()
+    try:
+        result["detail"] = await _warmers[name]()
+        result["status"] = "done"
+    except asyncio.CancelledError:
+        result["status"] = "cancelled"
+        raise
+    except Exception as e:
+        result["status"] = "failed"
+        result["detail"] = str(e)
+        logger.warning(f"Warmer {name} failed: {e}")
+    finally:
+        result["seconds"] = round(time.monotonic() - start, 3)
+
+
+async def run(names: List[str], budget: float) -> None:
+    """Run the warmers concurrently, cancelling them after budget seconds."""
+    # Outside of requests, the warmers use the service credentials
+    service_call.set(True)
+    tasks = []
+    for name in names:
+        if name not in _warmers:
+            state.warmers[name] = {"status": "unknown"}
+            logger.warning(f"Unknown warmer {name}, known: {', '.join(_warmers)}")
+            continue
+        state.warmers[name] = {"status": "running"}
+        tasks.append(asyncio.create_task(_run_warmer(name)))
+    start = time.monotonic()
+    try:
+        if tasks:
+            await asyncio.wait(tasks, timeout=budget)
+    finally:
+        # Out of time, or the server shuts down
+        pending = [task for task in tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        state.finished = True
+    logger.info(
+        f"Warm-up finished in {time.monotonic() - start:.1f}s: "
+        + ", ".join(
+            f"{name} {result['status']}" for name, result in state.warmers.items()
+        )
+    )
+
+
+def start() -> Optional[asyncio.Task]:
+    """Start the warmers in the background (None if there is nothing to warm)."""
+    if not settings.warmers:
+        state.finished = True
+        return None
+    if not (C8Y_USER and C8Y_PASSWORD):
+        logger.warning("Warmers need C8Y_USER and C8Y_PASSWORD, not starting")
+        state.finished = True
+        return None
+    return asyncio.create_task(run(settings.warmers, settings.warmup_budget))
+
+
+def render_metrics() -> str:
+    """Render the warm-up state in the Prometheus text format."""
+    lines = [
+        "# HELP mcp_ready Whether the startup warmers finished",
+        "# TYPE mcp_ready gauge",
+        f"mcp_ready {int(state.finished)}",
+        "# HELP mcp_warmup_seconds Seconds taken by a startup warmer",
+        "# TYPE mcp_warmup_seconds gauge",
+    ]
+    for name, result in state.warmers.items():
+        if "seconds" in result:
+            lines.append(
+                f'mcp_warmup_seconds{{warmer="{name}",status="{result["status"]}"}} '
+                f"{result['seconds']}"
+            )
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,267 @@
+"""
+Multi-worker serving mode.
+
+The supervisor binds the public socket once and spawns worker processes that
+all accept connections from it. MCP sessions are stateful and live in the
+worker that created them, so every worker additionally listens on a private
+Unix socket and forwards requests belonging to another worker's session:
+
+- SSE clients post to a per-worker message path (/sse/messages/<worker>/).
+- Streamable HTTP sessions are looked up by their mcp-session-id header in a
+  registry shared by all workers.
+"""
+
+import logging
+import multiprocessing
+import os
+import re
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+from typing import Dict, Optional
+
+import httpx
+import uvicorn
+
+from . import settings
+from .app import create_app
+from .logging_setup import setup_logging
+from .server import remove_blacklisted_tools
+
+logger = logging.getLogger("mcp_server_c8y")
+
+SESSION_HEADER = b"mcp-session-id"
+SSE_MESSAGE_PATH = re.compile(r"/messages/(\d+)/?$")
+SESSION_ID = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+
+# Headers which must not be copied by the forwarding proxy
+HOP_BY_HOP_HEADERS = {b"connection", b"keep-alive", b"transfer-encoding", b"upgrade"}
+
+
+def worker_socket_path(run_dir: str, worker_id: int) -> str:
+    return os.path.join(run_dir, f"worker-{worker_id}.sock")
+
+
+class SessionRegistry:
+    """Maps session IDs to the worker owning them, shared through the run directory."""
+
+    def __init__(self, run_dir: str):
+        self.directory = os.path.join(run_dir, "sessions")
+        os.makedirs(self.directory, exist_ok=True)
+
+    def register(self, session_id: str, worker_id: int) -> None:
+        if not SESSION_ID.match(session_id):
+            return
+        path = os.path.join(self.directory, session_id)
+        tmp_path = f"{path}.{worker_id}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(str(worker_id))
+        os.replace(tmp_path, path)
+
+    def lookup(self, session_id: str) -> Optional[int]:
+        if not SESSION_ID.match(session_id):
+            return None
+        try:
+            with open(os.path.join(self.directory, session_id)) as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def unregister(self, session_id: str) -> None:
+        if not SESSION_ID.match(session_id):
+            return
+        try:
+            os.unlink(os.path.join(self.directory, session_id))
+        except OSError:
+            pass
+
+
+class SessionAffinityMiddleware:
+    """ASGI middleware forwarding requests to the worker owning their MCP session."""
+
+    def __init__(self, app, worker_id: int, run_dir: str):
+        self.app = app
+        self.worker_id = worker_id
+        self.run_dir = run_dir
+        self.registry = SessionRegistry(run_dir)
+        self._clients: Dict[int, httpx.AsyncClient] = {}
+
+    def _owner(self, scope) -> tuple[Optional[int], Optional[str]]:
+        match = SSE_MESSAGE_PATH.search(scope["path"])
+        if match:
+            return int(match.group(1)), None
+        for key, value in scope["headers"]:
+            if key.lower() == SESSION_HEADER:
+                session_id = value.decode("latin-1")
+                return self.registry.lookup(session_id), session_id
+        return None, None
+
+    def _client(self, worker_id: int) -> httpx.AsyncClient:
+        client = self._clients.get(worker_id)
+        if client is None:
+            transport = httpx.AsyncHTTPTransport(
+                uds=worker_socket_path(self.run_dir, worker_id)
+            )
+            client = httpx.AsyncClient(transport=transport, timeout=None)
+            self._clients[worker_id] = client
+        return client
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        owner, session_id = self._owner(scope)
+        if owner is not None and owner != self.worker_id:
+            await self._forward(owner, scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and session_id is None:
+                for key, value in message.get("headers", []):
+                    if key.lower() == SESSION_HEADER:
+                        self.registry.register(value.decode("latin-1"), self.worker_id)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+        if session_id is not None and scope["method"] == "DELETE":
+            self.registry.unregister(session_id)
+
+    async def _forward(self, worker_id: int, scope, receive, send):
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+        path = scope.get("raw_path") or scope["path"].encode("utf-8")
+        url = "http://worker" + path.decode("latin-1")
+        if scope.get("query_string"):
+            url += "?" + scope["query_string"].decode("latin-1")
+        headers = [
+            (key, value)
+            for key, value in scope["headers"]
+            if key.lower() not in HOP_BY_HOP_HEADERS
+            and key.lower() != b"content-length"
+        ]
+
+        client = self._client(worker_id)
+        request = client.build_request(
+            scope["method"], url, headers=headers, content=body
+        )
+        try:
+            response = await client.send(request, stream=True)
+        except httpx.HTTPError as e:
+            logger.warning(f"Could not forward request to worker {worker_id}: {str(e)}")
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 502,
+                    "headers": [(b"content-type", b"text/plain")],
+                }
+            )
+            await send({"type": "http.response.body", "body": b"Bad Gateway"})
+            return
+
+        try:
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": response.status_code,
+                    "headers": [
+                        (key, value)
+                        for key, value in response.headers.raw
+                        if key.lower() not in HOP_BY_HOP_HEADERS
+                    ],
+                }
+            )
+            async for chunk in response.aiter_raw():
+                await send(
+                    {"type": "http.response.body", "body": chunk, "more_body": True}
+                )
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            await response.aclose()
+
+
+def _run_worker(
+    worker_id: int,
+    sock: socket.socket,
+    run_dir: str,
+    transport: str,
+    root_path: str,
+    verbose: int,
+) -> None:
+    """Entry point of a worker process."""
+    setup_logging(verbose)
+    settings.init()
+    settings.selected_transport = transport
+    remove_blacklisted_tools()
+
+    uds_path = worker_socket_path(run_dir, worker_id)
+    if os.path.exists(uds_path):
+        os.unlink(uds_path)
+    uds = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    uds.bind(uds_path)
+
+    app = create_app(transport, sse_message_path=f"/messages/{worker_id}/")
+    config = uvicorn.Config(
+        SessionAffinityMiddleware(app, worker_id, run_dir), root_path=root_path
+    )
+    logger.info(f"Worker {worker_id} started (pid {os.getpid()})")
+    uvicorn.Server(config).run(sockets=[sock, uds])
+
+
+def run_workers(
+    transport: str, host: str, port: int, root_path: str, workers: int, verbose: int
+) -> None:
+    """Serve the HTTP transports with several worker processes."""
+    shm_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+    run_dir = tempfile.mkdtemp(prefix="mcp-server-c8y-", dir=shm_dir)
+
+    # Share the caches between the workers instead of warming one copy per process
+    if settings.cache_backend == "memory":
+        logger.info("Using the file cache backend to share caches between workers")
+        os.environ["MCP_CACHE_BACKEND"] = "file"
+        if not settings.cache_dir:
+            os.environ["MCP_CACHE_DIR"] = os.path.join(run_dir, "cache")
+
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.set_inheritable(True)
+
+    # Turn SIGTERM into a regular exit so the workers and run directory are cleaned up
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(
+            target=_run_worker,
+            args=(worker_id, sock, run_dir, transport, root_path, verbose),
+            name=f"mcp-server-c8y-worker-{worker_id}",
+        )
+        for worker_id in range(workers)
+    ]
+    logger.info(f"Starting {workers} workers on {host}:{port}")
+    try:
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join()
+        sock.close()
+        shutil.rmtree(run_dir, ignore_errors=True)
@@ -0,0 +1,16 @@
+"""
+Tests of the MCP Cumulocity server against local stand-ins for the platform.
+
+    python -m unittest discover -s tests -t .
+
+The tests are run as the ``tests`` package from the repository root, so
+this module sets the environment before the server module is imported.
+"""
+
+import os
+
+# The server module reads its configuration when imported
+os.environ.setdefault("C8Y_BASEURL", "http://127.0.0.1:1")
+os.environ.setdefault("C8Y_TENANT", "t0")
+os.environ.setdefault("C8Y_USER", "test")
+os.environ.setdefault("C8Y_PASSWORD", "test")
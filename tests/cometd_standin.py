@@ -0,0 +1,115 @@
+"""
+Local stand-in for the Cumulocity realtime notification endpoint.
+
+Implements the parts of CometD/Bayeux with long-polling used by
+``realtime.RealtimeSubscriber``: handshake, subscribe, connect and
+disconnect on /notification/realtime. Notifications are queued with
+``publish`` and delivered with the reply to the next connect. A connect
+without pending notifications is held open for ``hold`` seconds.
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+
+class CometdStandIn:
+    """Bayeux server on a free local port, run in a background thread."""
+
+    def __init__(self, hold: float = 0.5):
+        self.hold = hold
+        # Reply to connects with this advice and an error instead of notifications
+        self.reject_connects: Optional[Dict[str, Any]] = None
+        self.handshakes = 0
+        self.connects = 0
+        self.subscriptions: List[str] = []
+        self._pending: List[Dict[str, Any]] = []
+        self._condition = threading.Condition()
+        self._clients = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def start(self) -> "CometdStandIn":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        with self._condition:
+            self._condition.notify_all()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def publish(self, channel: str, action: str, data: Any) -> None:
+        """Queue a notification for the next connect."""
+        with self._condition:
+            self._pending.append(
+                {"channel": channel, "data": {"realtimeAction": action, "data": data}}
+            )
+            self._condition.notify_all()
+
+    def _reply(self, message: Dict[str, Any]) -> List[Dict[str, Any]]:
+        channel = message.get("channel")
+        reply = {"channel": channel, "id": message.get("id")}
+        if channel == "/meta/handshake":
+            with self._condition:
+                self.handshakes += 1
+                self._clients += 1
+                client_id = f"client{self._clients}"
+            return [{**reply, "successful": True, "clientId": client_id}]
+        if channel == "/meta/subscribe":
+            self.subscriptions.append(message["subscription"])
+            return [
+                {
+                    **reply,
+                    "successful": True,
+                    "subscription": message["subscription"],
+                }
+            ]
+        if channel == "/meta/connect":
+            with self._condition:
+                self.connects += 1
+                if self.reject_connects is not None:
+                    return [
+                        {
+                            **reply,
+                            "successful": False,
+                            "error": "402::Unknown client",
+                            "advice": self.reject_connects,
+                        }
+                    ]
+                if not self._pending:
+                    self._condition.wait(self.hold)
+                notifications, self._pending = self._pending, []
+            return [{**reply, "successful": True}] + notifications
+        return [{**reply, "successful": True}]
+
+    def _handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                messages = json.loads(self.rfile.read(length))
+                replies = []
+                for message in messages:
+                    replies += stand_in._reply(message)
+                body = json.dumps(replies).encode()
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The subscriber was stopped during a held connect
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,109 @@
+"""
+Local stand-in for the Cumulocity measurement API.
+
+Serves GET /measurement/measurements for one device, which has a measurement
+every ``step`` seconds. Supports dateFrom, dateTo, revert and the paging
+parameters. Each measurement carries ``padding`` bytes of text in an extra
+fragment, to produce responses of any size. The query parameters of all
+requests are recorded in ``requests``.
+"""
+
+import json
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+from urllib.parse import parse_qsl, urlsplit
+
+
+def _parse_time(value: str) -> float:
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def _format_time(timestamp: float) -> str:
+    parsed = datetime.fromtimestamp(timestamp, timezone.utc)
+    return parsed.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+class MeasurementStandIn:
+    """Measurement API on a free local port, run in a background thread."""
+
+    def __init__(self, device_id: str = "42", step: float = 60.0, padding: int = 0):
+        self.device_id = device_id
+        self.step = step
+        self.padding = padding
+        self.requests: List[Dict[str, str]] = []
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def start(self) -> "MeasurementStandIn":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _measurement(self, timestamp: float) -> Dict[str, Any]:
+        measurement = {
+            "id": str(int(timestamp)),
+            "time": _format_time(timestamp),
+            "source": {"id": self.device_id},
+            "type": "c8y_Temperature",
+            "c8y_Temperature": {"T": {"value": timestamp % 100, "unit": "C"}},
+        }
+        if self.padding:
+            measurement["c8y_Padding"] = {"text": "x" * self.padding}
+        return measurement
+
+    def _page(self, params: Dict[str, str]) -> Dict[str, Any]:
+        self.requests.append(params)
+        page_size = int(params.get("pageSize", 5))
+        current_page = int(params.get("currentPage", 1))
+        times = []
+        if params.get("source") == self.device_id:
+            date_from = _parse_time(params["dateFrom"])
+            date_to = _parse_time(params["dateTo"])
+            first = -(-date_from // self.step) * self.step
+            count = max(int(-(-(date_to - first) // self.step)), 0)
+            times = [first + i * self.step for i in range(count)]
+        if params.get("revert") == "true":
+            times.reverse()
+        offset = (current_page - 1) * page_size
+        page = times[offset : offset + page_size]
+        result = {
+            "measurements": [self._measurement(t) for t in page],
+            "statistics": {"pageSize": page_size, "currentPage": current_page},
+        }
+        if params.get("withTotalPages") == "true":
+            result["statistics"]["totalPages"] = max(-(-len(times) // page_size), 1)
+        return result
+
+    def _handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlsplit(self.path)
+                if url.path != "/measurement/measurements":
+                    self.send_error(404)
+                    return
+                body = json.dumps(stand_in._page(dict(parse_qsl(url.query)))).encode()
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The reader stopped once its memory budget was used up
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,182 @@
+"""
+Local stand-in for the Cumulocity REST API.
+
+Requests are answered by handlers registered per method and path pattern.
+A handler receives the ``Request`` and returns the JSON body to send with
+status 200, or a ``Response`` to control the status, headers and latency.
+All requests are recorded in ``requests``. ``collection`` serves a paged
+collection from a list of items and ``inventory`` the managed object
+resources from a dict of managed objects.
+"""
+
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+
+class Request(NamedTuple):
+    method: str
+    path: str
+    params: Dict[str, str]
+    body: Any
+    match: Optional[re.Match]
+
+
+class Response(NamedTuple):
+    body: Any = None
+    status: int = 200
+    headers: Dict[str, str] = {}
+    # Seconds to wait before answering
+    delay: float = 0.0
+
+
+Handler = Callable[[Request], Any]
+
+
+def page_of(request: Request, array_key: str, items: List[dict]) -> dict:
+    """Page of items requested by pageSize and currentPage, with statistics."""
+    page_size = int(request.params.get("pageSize", 5))
+    current_page = int(request.params.get("currentPage", 1))
+    offset = (current_page - 1) * page_size
+    return {
+        array_key: items[offset : offset + page_size],
+        "statistics": {
+            "pageSize": page_size,
+            "currentPage": current_page,
+            "totalPages": max(-(-len(items) // page_size), 1),
+            "totalElements": len(items),
+        },
+    }
+
+
+class PlatformStandIn:
+    """REST API on a free local port, run in a background thread."""
+
+    def __init__(self):
+        self.requests: List[Request] = []
+        self._routes: List[Tuple[str, re.Pattern, Handler]] = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def start(self) -> "PlatformStandIn":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def route(self, method: str, pattern: str, handler: Handler) -> None:
+        """Answer requests whose path fully matches pattern (later routes win)."""
+        self._routes.insert(0, (method.upper(), re.compile(pattern), handler))
+
+    def paths(self, method: str = "GET") -> List[str]:
+        return [r.path for r in self.requests if r.method == method]
+
+    def inventory(self, managed_objects: Dict[str, dict]) -> None:
+        """Serve managed objects by ID, ids= queries and their supported measurements."""
+
+        def collection(request: Request):
+            ids = request.params.get("ids")
+            if ids is not None:
+                found = [
+                    managed_objects[i] for i in ids.split(",") if i in managed_objects
+                ]
+            elif "bygroupid" in request.params.get("query", ""):
+                found = []
+            else:
+                found = list(managed_objects.values())
+            return page_of(request, "managedObjects", found)
+
+        def single(request: Request):
+            managed_object = managed_objects.get(request.match[1])
+            if managed_object is None:
+                return Response({"error": "inventory/Not Found"}, 404)
+            return managed_object
+
+        def supported_measurements(request: Request):
+            return {"c8y_SupportedMeasurements": ["c8y_Temperature"]}
+
+        self.route("GET", "/inventory/managedObjects", collection)
+        self.route("GET", r"/inventory/managedObjects/([^/]+)", single)
+        self.route(
+            "GET",
+            r"/inventory/managedObjects/([^/]+)/supportedMeasurements",
+            supported_measurements,
+        )
+
+    def collection(self, resource: str, array_key: str, items: List[dict]) -> None:
+        """Serve items as a paged collection, e.g. '/event/events' and 'events'."""
+        self.route("GET", resource, lambda request: page_of(request, array_key, items))
+
+    def _answer(self, method: str, raw_path: str, body: Any) -> Response:
+        url = urlsplit(raw_path)
+        for route_method, pattern, handler in self._routes:
+            match = pattern.fullmatch(url.path)
+            if route_method == method and match is not None:
+                request = Request(
+                    method, url.path, dict(parse_qsl(url.query)), body, match
+                )
+                with self._lock:
+                    self.requests.append(request)
+                result = handler(request)
+                return result if isinstance(result, Response) else Response(result)
+        return Response({"error": "Not Found"}, 404)
+
+    def _handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _handle(self, method: str):
+                length = int(self.headers.get("Content-Length", 0))
+                raw = self.rfile.read(length) if length else b""
+                body = json.loads(raw) if raw else None
+                response = stand_in._answer(method, self.path, body)
+                if response.delay:
+                    time.sleep(response.delay)
+                data = (
+                    b"" if response.body is None else json.dumps(response.body).encode()
+                )
+                try:
+                    self.send_response(response.status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    for name, value in response.headers.items():
+                        self.send_header(name, value)
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up waiting
+                    pass
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+            def do_PUT(self):
+                self._handle("PUT")
+
+            def do_DELETE(self):
+                self._handle("DELETE")
+
+            def do_PATCH(self):
+                self._handle("PATCH")
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
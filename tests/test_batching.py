@@ -0,0 +1,78 @@
+import asyncio
+import contextvars
+import unittest
+
+from mcp_server_c8y import batching
+
+credentials = contextvars.ContextVar("credentials", default="")
+
+
+class BatchLoaderTest(unittest.IsolatedAsyncioTestCase):
+    def loader(self, max_batch=200, fail=False):
+        self.batches = []
+
+        async def load_batch(keys):
+            self.batches.append((credentials.get(), keys))
+            await asyncio.sleep(0.01)
+            if fail:
+                raise ValueError("unavailable")
+            return {key: f"value {key}" for key in keys if key != "missing"}
+
+        loader = batching.BatchLoader(
+            "test", load_batch, max_batch=max_batch, scope=credentials.get
+        )
+        self.addCleanup(batching._loaders.remove, loader)
+        return loader
+
+    async def test_lookups_of_one_iteration_are_coalesced(self):
+        loader = self.loader()
+        results = await asyncio.gather(
+            loader.load("1"), loader.load("2"), loader.load("1"), loader.load("missing")
+        )
+        self.assertEqual(results, ["value 1", "value 2", "value 1", None])
+        self.assertEqual(self.batches, [("", ["1", "2", "missing"])])
+        self.assertEqual((loader.lookups_total, loader.keys_total), (4, 3))
+
+        # Lookups of a later iteration go into the next batch
+        await loader.load("3")
+        self.assertEqual(self.batches[-1], ("", ["3"]))
+        self.assertIn(
+            'mcp_batch_size_bucket{loader="test",le="5"} 2', batching.render_metrics()
+        )
+
+    async def test_batches_are_split_at_max_batch(self):
+        loader = self.loader(max_batch=2)
+        await asyncio.gather(*(loader.load(str(key)) for key in range(5)))
+        self.assertEqual(
+            [keys for _, keys in self.batches], [["0", "1"], ["2", "3"], ["4"]]
+        )
+
+    async def test_scopes_are_never_mixed(self):
+        loader = self.loader()
+
+        async def load(user, key):
+            credentials.set(user)
+            return await loader.load(key)
+
+        await asyncio.gather(load("a", "1"), load("b", "1"), load("a", "2"))
+        self.assertEqual(sorted(self.batches), [("a", ["1", "2"]), ("b", ["1"])])
+
+    async def test_errors_reach_all_callers(self):
+        loader = self.loader(fail=True)
+        results = await asyncio.gather(
+            loader.load("1"), loader.load("2"), return_exceptions=True
+        )
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+
+    async def test_cancelled_caller_does_not_cancel_the_others(self):
+        loader = self.loader()
+        first = asyncio.ensure_future(loader.load("1"))
+        second = asyncio.ensure_future(loader.load("1"))
+        await asyncio.sleep(0)
+        first.cancel()
+        self.assertEqual(await second, "value 1")
+        self.assertTrue(first.cancelled())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+import httpx
+
+from mcp_server_c8y import cache, realtime, settings
+
+from .cometd_standin import CometdStandIn
+
+
+class MarkStaleTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def backends(self):
+        path = os.path.join(self.directory.name, "cache.sqlite3")
+        return {
+            "memory": cache.MemoryCache(ttl=60),
+            "file": cache.FileCache(os.path.join(self.directory.name, "files"), ttl=60),
+            "sqlite": cache.SqliteCache(path, "inventory", ttl=60),
+        }
+
+    def test_stale_entries_are_only_returned_when_asked_for(self):
+        for name, backend in self.backends().items():
+            with self.subTest(backend=name):
+                backend.set("1", {"id": "1"})
+                backend.mark_stale()
+                self.assertIsNone(backend.get("1"))
+                self.assertEqual(backend.get("1", stale=True), {"id": "1"})
+                # Entries stored afterwards are fresh
+                backend.set("1", {"id": "1", "name": "new"})
+                self.assertEqual(backend.get("1")["name"], "new")
+
+    def test_sqlite_entries_stay_stale_after_a_restart(self):
+        path = os.path.join(self.directory.name, "cache.sqlite3")
+        cache.SqliteCache(path, "inventory", ttl=60).set("1", {"id": "1"})
+        cache.SqliteCache(path, "inventory", ttl=60).mark_stale()
+        # Other namespaces are not affected
+        cache.SqliteCache(path, "hierarchy", ttl=60).set("1", [])
+        cache.SqliteCache(path, "hierarchy", ttl=60).set("2", [])
+
+        restarted = cache.SqliteCache(path, "inventory", ttl=60)
+        self.assertIsNone(restarted.get("1"))
+        self.assertEqual(restarted.get("1", stale=True), {"id": "1"})
+        self.assertEqual(cache.SqliteCache(path, "hierarchy", ttl=60).get("2"), [])
+
+    def test_file_cache_prune_keeps_the_stale_marker(self):
+        backend = cache.FileCache(
+            os.path.join(self.directory.name, "files"), ttl=60, maxsize=2
+        )
+        backend.set("1", 1)
+        backend.mark_stale()
+        for key in range(2, 70):
+            backend.set(str(key), key)
+        self.assertTrue(os.path.exists(os.path.join(backend.directory, "stale")))
+
+
+class CachedTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        os.environ["MCP_CACHE_BACKEND"] = "sqlite"
+        os.environ["MCP_CACHE_DIR"] = self.directory.name
+        settings.init()
+        cache._caches.clear()
+
+    async def asyncTearDown(self):
+        del os.environ["MCP_CACHE_BACKEND"]
+        del os.environ["MCP_CACHE_DIR"]
+        settings.init()
+        cache._caches.clear()
+        self.directory.cleanup()
+
+    async def test_stale_entries_are_served_and_revalidated(self):
+        cache.get_cache("inventory").set("1", {"name": "old"})
+        cache.get_cache("inventory").mark_stale()
+        loaded = asyncio.Event()
+
+        async def load():
+            loaded.set()
+            return {"name": "new"}
+
+        self.assertEqual(await cache.cached("inventory", "1", load), {"name": "old"})
+        await asyncio.wait_for(loaded.wait(), 1)
+        await asyncio.sleep(0.05)
+        self.assertEqual(await cache.cached("inventory", "1", load), {"name": "new"})
+
+
+class HandshakeTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        settings.init()
+        cache._caches.clear()
+        self.stand_in = CometdStandIn(hold=0.2).start()
+        self.subscriber = realtime.RealtimeSubscriber(
+            self.stand_in.base_url, httpx.BasicAuth("t0/test", "test")
+        )
+
+    async def asyncTearDown(self):
+        await self.subscriber.stop()
+        self.stand_in.stop()
+        cache._caches.clear()
+
+    async def test_handshake_marks_cached_objects_stale(self):
+        inventory = cache.get_cache("inventory")
+        inventory.set("42", {"id": "42"})
+        await self.subscriber._handshake()
+        self.assertIsNone(inventory.get("42"))
+        self.assertEqual(inventory.get("42", stale=True), {"id": "42"})
+
+
+if __name__ == "__main__":
+    unittest.main()
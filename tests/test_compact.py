@@ -0,0 +1,109 @@
+import random
+import re
+import unittest
+
+from mcp_server_c8y.compact import compact_table
+
+HEADERS = ["Device", "Type", "Owner", "c8y_Temperature->T", "Text", "Count"]
+
+VALUES = {
+    "Device": ["Pump 1", "Pump 2", "Valve 7", "Boiler Hall A 3"],
+    "Type": ["c8y_Pump"],
+    "Owner": ["device_4711", "service_cep", ""],
+    "c8y_Temperature->T": ["21.5 C", "-3 C", "1e-3 C", ""],
+    "Text": [
+        "Temperature threshold exceeded on sensor",
+        "Connection to the gateway lost",
+        "MAJOR",
+        "",
+    ],
+    "Count": ["1", "12", "300"],
+}
+
+
+def decode(text: str, headers):
+    """Rebuild the rows of a compact table with the given column headers."""
+    lines = text.split("\n")
+    hoisted, codes, empty = {}, {}, []
+    count = None
+    while lines and lines[0].startswith("# "):
+        name, _, value = lines.pop(0)[2:].partition(": ")
+        if name == "Empty":
+            empty = value.split(", ")
+        elif name == "Rows":
+            count = int(value)
+        elif re.fullmatch(r"\$\d+", name):
+            codes[name] = value
+        else:
+            hoisted[name] = value
+    kept = lines.pop(0).split("\t") if lines else []
+    rows = [line.split("\t") for line in lines]
+    if count is None:
+        count = len(rows)
+
+    columns = []
+    for header in headers:
+        if header in hoisted:
+            columns.append([hoisted[header]] * count)
+        elif header in empty:
+            columns.append([""] * count)
+        else:
+            index, unit = next(
+                (i, name[len(header) + 2 : -1])
+                for i, name in enumerate(kept)
+                if name == header or name.startswith(f"{header} [")
+            )
+            values = [codes.get(row[index], row[index]) for row in rows]
+            if unit:
+                values = [f"{value} {unit}" if value else "" for value in values]
+            columns.append(values)
+    return [list(row) for row in zip(*columns)]
+
+
+class CompactTableTest(unittest.TestCase):
+    def test_random_tables_round_trip(self):
+        rng = random.Random(1)
+        for seed in range(200):
+            count = rng.choice([0, 1, 2, 5, 30])
+            rows = [
+                [rng.choice(VALUES[header]) for header in HEADERS] for _ in range(count)
+            ]
+            with self.subTest(seed=seed, rows=count):
+                text = compact_table(HEADERS, rows)
+                self.assertEqual(decode(text, HEADERS), rows)
+
+    def test_repeated_texts_are_encoded(self):
+        text = "Temperature threshold exceeded on sensor"
+        rows = [
+            [str(i), text if i % 2 else "Door open", "MAJOR" if i % 2 else "MINOR"]
+            for i in range(10)
+        ]
+        compact = compact_table(["Id", "Text", "Severity"], rows)
+        self.assertIn(f"# $1: {text}", compact)
+        self.assertEqual(compact.count(text), 1)
+        self.assertEqual(compact.count("Door open"), 5)
+        # Single words do not pay for a legend entry
+        self.assertIn("\tMAJOR", compact)
+
+    def test_shared_values_units_and_empty_columns(self):
+        rows = [["Pump", "", "21.5 C"], ["Pump", "", "22 C"]]
+        self.assertEqual(
+            compact_table(["Type", "Owner", "T"], rows),
+            "# Type: Pump\n# Empty: Owner\nT [C]\n21.5\n22",
+        )
+
+    def test_columns_with_code_like_values_are_not_encoded(self):
+        text = "Connection to the gateway lost"
+        rows = [["$1", text] for _ in range(5)] + [["x", text]]
+        compact = compact_table(["Price", "Text"], rows)
+        lines = compact.split("\n")
+        self.assertEqual(lines[0], f"# Text: {text}")
+        self.assertEqual(lines[2:], ["$1"] * 5 + ["x"])
+
+    def test_cells_keep_the_table_structure(self):
+        compact = compact_table(["A", "B"], [["x\ty", "1"], ["line\nbreak", None]])
+        self.assertEqual(compact.split("\n"), ["A\tB", "x y\t1", "line break\t"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import types
+import unittest
+
+from c8y_api import CumulocityApi
+from requests.auth import HTTPBasicAuth
+
+from mcp_server_c8y import cache, server, sessions, settings
+
+from .platform_standin import PlatformStandIn
+
+
+class Session:
+    """Stands in for an MCP client session."""
+
+
+DEVICE = {
+    "id": "42",
+    "name": "Pump 42",
+    "type": "c8y_Pump",
+    "c8y_IsDevice": {},
+    "lastUpdated": "2024-05-01T10:00:00.000Z",
+}
+
+
+class DeviceContextTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        settings.init()
+        cache._caches.clear()
+        self.stand_in = PlatformStandIn().start()
+        self.stand_in.inventory({"42": DEVICE})
+        server.c8y = CumulocityApi(
+            base_url=self.stand_in.base_url,
+            tenant_id="t0",
+            auth=HTTPBasicAuth("t0/test", "test"),
+        )
+        self.ctx = types.SimpleNamespace(session=Session())
+
+    async def asyncTearDown(self):
+        server.c8y = None
+        self.stand_in.stop()
+        cache._caches.clear()
+
+    async def test_repeated_calls_return_the_full_document_by_default(self):
+        first = await server.get_device_context.fn(self.ctx, "42")
+        second = await server.get_device_context.fn(self.ctx, "42")
+        self.assertIn("Pump 42", first)
+        self.assertEqual(first, second)
+
+    async def test_previous_context_without_last_updated(self):
+        sessions.set_context(
+            self.ctx.session,
+            "42",
+            sessions.DeviceContext("", "", 20, {"Device": "## Device\nold"}),
+        )
+        document = await server.get_device_context.fn(self.ctx, "42")
+        self.assertIn("Pump 42", document)
+        diff = await server.get_device_context.fn(self.ctx, "42", incremental=True)
+        self.assertIn("Device context of 42", diff)
+
+
+if __name__ == "__main__":
+    unittest.main()
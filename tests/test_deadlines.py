@@ -0,0 +1,140 @@
+import asyncio
+import time
+import unittest
+
+import requests
+from fastmcp.exceptions import ToolError
+
+from mcp_server_c8y import deadlines, governor, resilience, settings
+
+from .platform_standin import PlatformStandIn, Response
+
+
+def counter(name: str, label: str = "") -> int:
+    return deadlines._counters[name].get(label, 0)
+
+
+class TimeoutForTest(unittest.TestCase):
+    def setUp(self):
+        settings.init()
+        settings.tool_timeout = 300
+        settings.tool_timeouts = {"get_fleet_health": 600}
+
+    def tearDown(self):
+        settings.init()
+
+    def test_requested_timeouts_only_shorten_the_deadline(self):
+        self.assertEqual(deadlines.timeout_for("get_alarms"), 300)
+        self.assertEqual(deadlines.timeout_for("get_fleet_health"), 600)
+        self.assertEqual(deadlines.timeout_for("get_alarms", 20), 20)
+        self.assertEqual(deadlines.timeout_for("get_alarms", 900), 300)
+        settings.tool_timeout = 0
+        self.assertEqual(deadlines.timeout_for("get_alarms"), 0)
+        self.assertEqual(deadlines.timeout_for("get_alarms", 20), 20)
+
+
+class RunTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        settings.init()
+        settings.tool_timeout = 0.2
+
+    async def asyncTearDown(self):
+        settings.init()
+
+    async def test_scope_reaches_worker_threads(self):
+        async def call():
+            return await asyncio.to_thread(deadlines.cap_timeout, 30)
+
+        remaining = await deadlines.run("get_alarms", None, call)
+        self.assertLessEqual(remaining, 0.2)
+        self.assertIsNone(deadlines.current_scope.get())
+        self.assertEqual(deadlines.cap_timeout(30), 30)
+
+    async def test_calls_fail_at_their_deadline(self):
+        cancelled = counter("cancelled_calls", "deadline")
+        with self.assertRaisesRegex(ToolError, "deadline of 0.2s"):
+            await deadlines.run("get_alarms", None, lambda: asyncio.sleep(5))
+        self.assertEqual(counter("cancelled_calls", "deadline"), cancelled + 1)
+
+    async def test_client_cancellation_cancels_the_scope(self):
+        scopes = []
+
+        async def call():
+            scopes.append(deadlines.current_scope.get())
+            await asyncio.sleep(5)
+
+        task = asyncio.ensure_future(deadlines.run("get_alarms", 10, call))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertEqual(scopes[0].reason, "client")
+        skipped = counter("skipped_requests")
+        with self.assertRaises(deadlines.CallCancelled):
+            scopes[0].check()
+        self.assertEqual(counter("skipped_requests"), skipped + 1)
+
+
+class UpstreamDeadlineTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        settings.init()
+        settings.tool_timeout = 0.3
+        governor._governors.clear()
+        governor._adapters.clear()
+        resilience._breakers.clear()
+        self.stand_in = PlatformStandIn().start()
+        self.stand_in.route(
+            "GET", "/alarm/alarms", lambda request: Response({"alarms": []}, delay=2)
+        )
+        self.session = requests.Session()
+        governor.install(self.session, "t0")
+
+    async def asyncTearDown(self):
+        self.session.close()
+        self.stand_in.stop()
+        governor._governors.clear()
+        governor._adapters.clear()
+        resilience._breakers.clear()
+        settings.init()
+
+    async def test_requests_do_not_outlive_their_call(self):
+        url = f"{self.stand_in.base_url}/alarm/alarms"
+        errors = []
+
+        def get():
+            try:
+                self.session.get(url)
+            except Exception as e:
+                errors.append(e)
+
+        start = time.monotonic()
+        with self.assertRaises(ToolError):
+            await deadlines.run("get_alarms", None, lambda: asyncio.to_thread(get))
+        # The request timed out with its call instead of waiting for the response
+        await asyncio.sleep(0.3)
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertIsInstance(errors[0], requests.exceptions.RequestException)
+
+    async def test_queued_requests_of_cancelled_calls_are_not_sent(self):
+        limits = governor.get_governor("t0")
+        # Occupy all upstream slots
+        for _ in range(int(limits.concurrency)):
+            limits.acquire()
+        errors = []
+
+        def get():
+            try:
+                self.session.get(f"{self.stand_in.base_url}/alarm/alarms")
+            except Exception as e:
+                errors.append(e)
+
+        with self.assertRaises(ToolError):
+            await deadlines.run("get_alarms", None, lambda: asyncio.to_thread(get))
+        await asyncio.sleep(0.1)
+        self.assertIsInstance(errors[0], deadlines.CallCancelled)
+        self.assertEqual(self.stand_in.requests, [])
+        self.assertEqual(limits.queue_depth, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
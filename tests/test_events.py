@@ -0,0 +1,47 @@
+import unittest
+from datetime import datetime, timezone
+
+from c8y_api import CumulocityApi
+from requests.auth import HTTPBasicAuth
+
+from mcp_server_c8y import server, settings
+
+from .platform_standin import PlatformStandIn
+
+
+def event(number: int) -> dict:
+    return {
+        "id": str(number),
+        "type": "c8y_Test",
+        "text": f"Event {number}",
+        "time": f"2026-01-01T00:{number // 60 % 60:02}:{number % 60:02}.000Z",
+        "creationTime": "2026-01-01T00:00:00.000Z",
+        "source": {"id": "42"},
+    }
+
+
+class GetEventsTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        settings.init()
+        self.stand_in = PlatformStandIn().start()
+        self.stand_in.collection("/event/events", "events", [event(1), event(2)])
+        server.c8y = CumulocityApi(
+            base_url=self.stand_in.base_url,
+            tenant_id="t0",
+            auth=HTTPBasicAuth("t0/test", "test"),
+        )
+
+    async def asyncTearDown(self):
+        server.c8y = None
+        self.stand_in.stop()
+
+    async def test_date_from_defaults_to_the_start_of_today_in_utc(self):
+        before = datetime.now(timezone.utc).strftime("%Y-%m-%dT00:00:00.000Z")
+        table = await server.get_events.fn(None, "42")
+        after = datetime.now(timezone.utc).strftime("%Y-%m-%dT00:00:00.000Z")
+        self.assertIn("Event 1", table)
+        self.assertIn(self.stand_in.requests[-1].params["dateFrom"], (before, after))
+
+
+if __name__ == "__main__":
+    unittest.main()
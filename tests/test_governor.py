@@ -0,0 +1,156 @@
+import threading
+import time
+import unittest
+
+import requests
+
+from mcp_server_c8y import governor, resilience, settings
+
+from .platform_standin import PlatformStandIn, Response
+
+
+def reset():
+    governor._governors.clear()
+    governor._adapters.clear()
+    resilience._breakers.clear()
+    resilience._latencies.clear()
+
+
+class GovernorLimitsTest(unittest.TestCase):
+    def test_throttling_halves_the_limits_which_then_grow_back(self):
+        limits = governor.Governor(rate=8, burst=100, concurrency=4)
+        limits.acquire()
+        limits.release(429, retry_after=0.2)
+        self.assertEqual((limits.rate, limits.concurrency), (4, 2))
+        self.assertGreater(limits.paused_until, time.monotonic() + 0.1)
+
+        for _ in range(40):
+            limits.acquire()
+            limits.release(200)
+        self.assertEqual((limits.rate, limits.concurrency), (8, 4))
+
+    def test_server_errors_reduce_the_concurrency_only(self):
+        limits = governor.Governor(rate=8, burst=8, concurrency=4)
+        limits.acquire()
+        limits.release(503)
+        limits.acquire()
+        limits.release(None)
+        self.assertEqual(limits.rate, 8)
+        self.assertEqual(limits.concurrency, 4 * 0.75 * 0.75)
+        self.assertEqual(limits.errors_total, 2)
+        # Never below one request at a time
+        for _ in range(10):
+            limits.acquire()
+            limits.release(500)
+        self.assertEqual(limits.concurrency, 1)
+
+    def test_token_bucket_limits_the_rate(self):
+        limits = governor.Governor(rate=20, burst=2, concurrency=10)
+        start = time.monotonic()
+        for _ in range(6):
+            limits.acquire()
+            limits.release(200)
+        # The burst passes at once, the other four wait 1/20 s each
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+
+    def test_waiting_requests_are_admitted_in_arrival_order(self):
+        limits = governor.Governor(rate=1000, burst=1000, concurrency=1)
+        limits.acquire()
+        admitted = []
+
+        def request(number):
+            limits.acquire(timeout=5)
+            admitted.append(number)
+            limits.release(200)
+
+        threads = []
+        for number in range(5):
+            thread = threading.Thread(target=request, args=(number,))
+            thread.start()
+            threads.append(thread)
+            # Let it queue up before the next one arrives
+            while limits.queue_depth < number + 1:
+                time.sleep(0.001)
+        limits.release(200)
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(admitted, [0, 1, 2, 3, 4])
+
+    def test_queued_request_times_out(self):
+        limits = governor.Governor(rate=1000, burst=1000, concurrency=1)
+        limits.acquire()
+        with self.assertRaises(governor.QueueTimeout):
+            limits.acquire(timeout=0.05)
+        self.assertEqual(limits.queue_depth, 0)
+        self.assertEqual(limits.queue_timeouts_total, 1)
+
+    def test_retry_after_header(self):
+        self.assertEqual(governor.parse_retry_after("2"), 2.0)
+        self.assertIsNone(governor.parse_retry_after("soon"))
+        self.assertIsNone(governor.parse_retry_after(None))
+        self.assertEqual(
+            governor.parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0.0
+        )
+
+
+class GovernedAdapterTest(unittest.TestCase):
+    def setUp(self):
+        settings.init()
+        reset()
+        self.stand_in = PlatformStandIn().start()
+        self.session = requests.Session()
+        governor.install(self.session, "t0")
+
+    def tearDown(self):
+        self.session.close()
+        self.stand_in.stop()
+        reset()
+
+    def respond(self, *responses: Response):
+        """Answer the requests with the given responses, then with 200."""
+        pending = list(responses)
+        self.stand_in.route(
+            "GET",
+            "/alarm/alarms",
+            lambda request: pending.pop(0) if pending else {"alarms": []},
+        )
+
+    def test_throttled_requests_are_retried_after_the_pause(self):
+        self.respond(Response({}, 429, {"Retry-After": "0.3"}))
+        start = time.monotonic()
+        response = self.session.get(f"{self.stand_in.base_url}/alarm/alarms")
+        self.assertEqual(response.status_code, 200)
+        self.assertGreaterEqual(time.monotonic() - start, 0.3)
+        self.assertEqual(len(self.stand_in.paths()), 2)
+
+        limits = governor.get_governor("t0")
+        self.assertEqual(limits.throttled_total, 1)
+        # Halved by the 429, then grown a little by the successful retry
+        self.assertAlmostEqual(limits.rate, settings.upstream_rate / 2, delta=0.1)
+        self.assertAlmostEqual(
+            limits.concurrency, settings.upstream_concurrency / 2, delta=0.3
+        )
+
+    def test_retry_after_pauses_the_other_requests(self):
+        settings.upstream_retries = 0
+        self.respond(Response({}, 429, {"Retry-After": "0.3"}))
+        response = self.session.get(f"{self.stand_in.base_url}/alarm/alarms")
+        self.assertEqual(response.status_code, 429)
+        start = time.monotonic()
+        self.session.get(f"{self.stand_in.base_url}/alarm/alarms")
+        self.assertGreaterEqual(time.monotonic() - start, 0.25)
+
+    def test_server_errors_shrink_the_concurrency(self):
+        self.respond(Response({}, 503), Response({}, 503))
+        for _ in range(3):
+            self.session.get(f"{self.stand_in.base_url}/alarm/alarms")
+        limits = governor.get_governor("t0")
+        self.assertEqual(limits.errors_total, 2)
+        self.assertLess(limits.concurrency, settings.upstream_concurrency * 0.75)
+        self.assertEqual(limits.rate, settings.upstream_rate)
+        # 5xx responses are not retried
+        self.assertEqual(len(self.stand_in.paths()), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+from types import SimpleNamespace
+
+from mcp_server_c8y import grouping
+from mcp_server_c8y.grouping import AlarmGrouper, parse_group_by, text_template
+
+
+def alarm(text, source="1", time="2026-01-01T00:00:00.000Z", count=1, **fields):
+    return SimpleNamespace(
+        **{"type": "c8y_Alarm", "severity": "MAJOR", **fields},
+        text=text,
+        source=source,
+        time=time,
+        count=count,
+    )
+
+
+class AlarmGrouperTest(unittest.TestCase):
+    def test_text_templates_replace_numbers_and_ids(self):
+        self.assertEqual(
+            text_template("Temperature 81.5 C exceeded on 0a1b2c3d4e"),
+            "Temperature # C exceeded on #",
+        )
+
+    def test_group_keys(self):
+        self.assertEqual(parse_group_by("Type, text"), ("type", "text"))
+        with self.assertRaisesRegex(ValueError, "Invalid group_by"):
+            parse_group_by("type,device")
+        with self.assertRaises(ValueError):
+            parse_group_by(" , ")
+
+    def test_alarms_with_the_same_template_are_grouped(self):
+        grouper = AlarmGrouper(("type", "text"))
+        grouper.add(
+            [
+                alarm("Pressure 3 bar", "1", "2026-01-02T00:00:00.000Z", count=4),
+                alarm("Pressure 5 bar", "2", "2026-01-01T00:00:00.000Z"),
+                alarm("Door open", "1"),
+            ]
+        )
+        group = grouper.groups[("c8y_Alarm", "Pressure # bar")]
+        self.assertEqual((group.alarms, group.occurrences), (2, 5))
+        self.assertEqual(list(group.devices), ["1", "2"])
+        self.assertEqual(group.first[1], "2026-01-01T00:00:00.000Z")
+        self.assertEqual(group.last[1], "2026-01-02T00:00:00.000Z")
+        self.assertEqual(grouper.total, 3)
+
+    def test_devices_listed_per_group_are_bounded(self):
+        grouper = AlarmGrouper(("type",))
+        grouper.add(
+            [alarm("Door open", str(i)) for i in range(grouping.MAX_DEVICES + 5)]
+        )
+        group = grouper.groups[("c8y_Alarm",)]
+        self.assertEqual(len(group.devices), grouping.MAX_DEVICES)
+        self.assertTrue(group.more_devices)
+        self.assertIn(", ...", grouper.to_table())
+
+    def test_groups_beyond_the_limit_are_counted_as_other(self):
+        grouper = AlarmGrouper(("type", "severity"))
+        grouper.add(
+            [
+                alarm("Door open", type=f"type{i}")
+                for i in range(grouping.MAX_GROUPS + 50)
+            ]
+        )
+        self.assertEqual(len(grouper.groups), grouping.MAX_GROUPS + 1)
+        self.assertEqual(grouper.groups[("(other)", "(other)")].alarms, 50)
+        # Existing groups still count their alarms
+        grouper.add([alarm("Door open", type="type0")])
+        self.assertEqual(grouper.groups[("type0", "MAJOR")].alarms, 2)
+        self.assertEqual(grouper.total, grouping.MAX_GROUPS + 51)
+        # The largest group comes first
+        self.assertTrue(grouper.to_table().split("\n")[1].startswith("(other)"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import sys
+import unittest
+
+from mcp_server_c8y.hierarchy import Node, Subtree
+
+
+def build(nodes, root_id="1", max_depth=100_000):
+    """Subtree of the given nodes, expanded like load_subtree does."""
+    subtree = Subtree(root_id)
+    subtree.nodes = {node.id: node for node in nodes}
+    level = [root_id]
+    while level:
+        next_level = []
+        for node_id in level:
+            next_level += subtree.expand(subtree.nodes[node_id], max_depth, 10_000)
+        level = next_level
+    return subtree
+
+
+class ToTreeTest(unittest.TestCase):
+    def test_children_are_rendered_in_order_below_their_parent(self):
+        subtree = build(
+            [
+                Node("1", "Site", "c8y_Site", [("2", "asset"), ("3", "asset")]),
+                Node("2", "Hall A", "c8y_Hall", [("4", "device"), ("1", "asset")]),
+                Node("3", "Hall B", "c8y_Hall", [("4", "device")]),
+                Node("4", "Pump", "c8y_Pump", []),
+            ]
+        )
+        self.assertEqual(
+            subtree.to_tree().split("\n"),
+            [
+                "1 Site (c8y_Site)",
+                "  2 Hall A (c8y_Hall)",
+                "    4 Pump (c8y_Pump) [device]",
+                "    1 Site (c8y_Site) [cycle, see above]",
+                "  3 Hall B (c8y_Hall)",
+                "    4 Pump (c8y_Pump) [device] [shared, see above]",
+            ],
+        )
+
+    def test_deep_chains_do_not_exhaust_the_stack(self):
+        # Some dependencies raise the limit, so use the default of the interpreter
+        self.addCleanup(sys.setrecursionlimit, sys.getrecursionlimit())
+        sys.setrecursionlimit(1000)
+        depth = 5000
+        subtree = build(
+            [
+                Node(str(i), f"Level {i}", "c8y_Asset", [(str(i + 1), "asset")])
+                for i in range(1, depth)
+            ]
+            + [Node(str(depth), f"Level {depth}", "c8y_Asset", [])]
+        )
+        lines = subtree.to_tree().split("\n")
+        self.assertEqual(len(lines), depth)
+        self.assertEqual(
+            lines[-1], " " * 2 * (depth - 1) + f"{depth} Level {depth} (c8y_Asset)"
+        )
+
+    def test_unexpanded_children_are_counted(self):
+        subtree = build(
+            [
+                Node("1", "Site", "c8y_Site", [("2", "asset")]),
+                Node("2", "Hall", "c8y_Hall", [("3", "asset"), ("4", "asset")]),
+            ],
+            max_depth=1,
+        )
+        self.assertEqual(
+            subtree.to_tree().split("\n")[-1], "  2 Hall (c8y_Hall) [+2 children]"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
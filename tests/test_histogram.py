@@ -0,0 +1,137 @@
+import unittest
+
+from c8y_api import CumulocityApi
+from requests.auth import HTTPBasicAuth
+
+from mcp_server_c8y import server, settings
+from mcp_server_c8y.histogram import EventHistogram, OTHER, parse_interval
+from mcp_server_c8y.records import EventRecord
+from mcp_server_c8y.timeseries import format_time, parse_time
+
+from .platform_standin import PlatformStandIn, page_of
+
+HOUR = 3600.0
+START = parse_time("2026-01-01T00:00:00.000Z")
+
+
+def event(seconds: float, event_type: str = "c8y_Test") -> EventRecord:
+    return EventRecord("1", "42", event_type, format_time(START + seconds), "", "")
+
+
+class EventHistogramTest(unittest.TestCase):
+    def test_intervals(self):
+        self.assertEqual(parse_interval("15m"), 900)
+        self.assertEqual(parse_interval("hour"), HOUR)
+        self.assertEqual(parse_interval(" 2 D "), 2 * 24 * HOUR)
+        for invalid in ("0h", "1y", "h"):
+            with self.assertRaises(ValueError):
+                parse_interval(invalid)
+
+    def test_last_interval_ends_with_the_window(self):
+        histogram = EventHistogram(START, START + 2.5 * HOUR, HOUR)
+        self.assertEqual(histogram.size, 3)
+        self.assertEqual(histogram.bounds(2), (START + 2 * HOUR, START + 2.5 * HOUR))
+        with self.assertRaisesRegex(ValueError, "at most 1000"):
+            EventHistogram(START, START + 1001 * HOUR, HOUR)
+
+    def test_events_are_counted_per_type_and_interval(self):
+        histogram = EventHistogram(START, START + 3 * HOUR, HOUR)
+        histogram.add(
+            [
+                event(10),
+                event(20, "c8y_Alert"),
+                event(2 * HOUR + 5),
+                # Outside of the window
+                event(-1),
+                event(3 * HOUR),
+            ]
+        )
+        self.assertEqual(
+            histogram.counts, {"c8y_Test": [1, 0, 1], "c8y_Alert": [1, 0, 0]}
+        )
+        # Empty intervals are omitted
+        self.assertEqual(
+            histogram.to_table("json"),
+            '[["2026-01-01T00:00:00.000Z", 1, 1, 2], '
+            '["2026-01-01T02:00:00.000Z", 1, 0, 1]]',
+        )
+
+    def test_rare_types_are_counted_as_other(self):
+        histogram = EventHistogram(START, START + HOUR, HOUR)
+        histogram.add([event(1, f"type{i}") for i in range(25)])
+        self.assertEqual(len(histogram.counts), 21)
+        self.assertEqual(histogram.counts[OTHER], [5])
+        self.assertEqual(histogram.total, 25)
+
+
+class GetEventHistogramTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        settings.init()
+        # Events reported by count-only queries per minute of the window
+        self.per_minute = 100
+        self.events = [
+            {"id": "1", "type": "c8y_Test", "time": "2026-01-01T00:10:00.000Z"},
+            {"id": "2", "type": "c8y_Test", "time": "2026-01-01T01:10:00.000Z"},
+        ]
+        self.stand_in = PlatformStandIn().start()
+        self.stand_in.route("GET", "/event/events", self.answer)
+        server.c8y = CumulocityApi(
+            base_url=self.stand_in.base_url,
+            tenant_id="t0",
+            auth=HTTPBasicAuth("t0/test", "test"),
+        )
+
+    async def asyncTearDown(self):
+        server.c8y = None
+        self.stand_in.stop()
+
+    def answer(self, request):
+        if request.params.get("withTotalElements") == "true":
+            seconds = parse_time(request.params["dateTo"]) - parse_time(
+                request.params["dateFrom"]
+            )
+            total = int(seconds // 60) * self.per_minute
+            return {"events": [], "statistics": {"totalElements": total}}
+        return page_of(request, "events", self.events)
+
+    def count_queries(self):
+        return sum(
+            r.params.get("withTotalElements") == "true" for r in self.stand_in.requests
+        )
+
+    async def histogram(self, hours: float, event_type=None) -> str:
+        return await server.get_event_histogram.fn(
+            None,
+            "42",
+            format_time(START),
+            format_time(START + hours * HOUR),
+            "1h",
+            event_type=event_type,
+        )
+
+    async def test_many_events_of_a_type_are_counted_per_interval(self):
+        # 18,000 events would take 9 pages, more than the 3 count queries
+        table = await self.histogram(3, "c8y_Test")
+        self.assertIn("18000 events per 1h interval (3 count queries)", table)
+        self.assertEqual(self.count_queries(), 4)
+        self.assertEqual(len(self.stand_in.requests), 4)
+
+    async def test_few_events_are_scanned(self):
+        self.per_minute = 1
+        table = await self.histogram(3, "c8y_Test")
+        self.assertIn("2 events per 1h interval (scan of all events)", table)
+        self.assertEqual(self.count_queries(), 1)
+
+    async def test_too_many_intervals_are_scanned(self):
+        table = await self.histogram(server.MAX_COUNT_QUERIES + 1, "c8y_Test")
+        self.assertIn("(scan of all events)", table)
+        self.assertEqual(self.count_queries(), 1)
+
+    async def test_events_of_all_types_are_scanned(self):
+        table = await self.histogram(3)
+        self.assertIn("(scan of all events)", table)
+        self.assertEqual(self.count_queries(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,202 @@
+import importlib.util
+import json
+import os
+import unittest
+
+from c8y_api import CumulocityApi
+from requests.auth import HTTPBasicAuth
+
+from mcp_server_c8y import openapi, server, settings
+
+from .platform_standin import PlatformStandIn
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_compiler():
+    spec = importlib.util.spec_from_file_location(
+        "compile_oas", os.path.join(ROOT, "scripts", "compile_oas.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+SPEC = {
+    "paths": {
+        "/inventory/managedObjects/{id}": {
+            "parameters": [{"$ref": "#/components/parameters/id"}],
+            "get": {
+                "operationId": "getManagedObject",
+                "summary": "Retrieve a managed object",
+                "tags": ["Managed objects"],
+                "parameters": [
+                    {
+                        "name": "withChildren",
+                        "in": "query",
+                        "schema": {"type": "boolean"},
+                        "description": "<b>Include</b> the `children`",
+                    },
+                    {"name": "Accept", "in": "header", "schema": {"type": "string"}},
+                ],
+                "responses": {
+                    "200": {
+                        "content": {
+                            "application/json": {
+                                "schema": {"$ref": "#/components/schemas/managedObject"}
+                            }
+                        }
+                    }
+                },
+            },
+            "patch": {"summary": "Patch a managed object"},
+        }
+    },
+    "components": {
+        "parameters": {
+            "id": {"name": "id", "in": "path", "schema": {"type": "string"}}
+        },
+        "schemas": {
+            "managedObject": {
+                "allOf": [
+                    {"properties": {"id": {"type": "string"}}},
+                    {
+                        "properties": {
+                            "childDevices": {
+                                "type": "array",
+                                "items": {"$ref": "#/components/schemas/reference"},
+                            },
+                            "owner": {"type": "string", "enum": ["a", "b"]},
+                        }
+                    },
+                ]
+            },
+            "reference": {"properties": {"self": {"type": "string"}}},
+        },
+    },
+}
+
+
+class CompileSpecTest(unittest.TestCase):
+    def test_operations_are_indexed_by_operation_id(self):
+        operations = load_compiler().compile_spec(SPEC)
+        self.assertEqual(
+            set(operations),
+            {"getManagedObject", "patch /inventory/managedObjects/{id}"},
+        )
+        method, path, summary, tags, parameters, response = operations[
+            "getManagedObject"
+        ]
+        self.assertEqual((method, path), ("get", "/inventory/managedObjects/{id}"))
+        self.assertEqual(tags, ("Managed objects",))
+        # Path parameters are always required, header parameters are left out
+        self.assertEqual(
+            parameters,
+            (
+                ("id", "path", True, "string", ""),
+                ("withChildren", "query", False, "boolean", "Include the children"),
+            ),
+        )
+        self.assertEqual(
+            response,
+            (
+                ("childDevices", "array<reference>"),
+                ("id", "string"),
+                ("owner", "string (a|b)"),
+            ),
+        )
+
+
+OPERATION = openapi.Operation(
+    "getMeasurements",
+    "get",
+    "/inventory/managedObjects/{id}/children/{childId}",
+    "",
+    (),
+    (
+        openapi.Parameter("id", "path", True, "string", ""),
+        openapi.Parameter("childId", "path", True, "string", ""),
+        openapi.Parameter("withChildren", "query", False, "boolean", ""),
+        openapi.Parameter("ids", "query", False, "array<string>", ""),
+        openapi.Parameter("type", "query", True, "string", ""),
+    ),
+    (),
+)
+
+
+class BuildRequestTest(unittest.TestCase):
+    def test_path_parameters_are_quoted(self):
+        path, params = openapi.build_request(
+            OPERATION, {"id": "1/2", "childId": 3}, {"type": "a b"}
+        )
+        self.assertEqual(path, "/inventory/managedObjects/1%2F2/children/3")
+        self.assertEqual(params, {"type": "a b"})
+
+    def test_booleans_and_lists_are_encoded(self):
+        path, params = openapi.build_request(
+            OPERATION,
+            {"id": "1", "childId": "2"},
+            {"type": "t", "withChildren": False, "ids": ["1", 2]},
+        )
+        self.assertEqual(params, {"type": "t", "withChildren": "false", "ids": "1,2"})
+
+    def test_missing_parameters_are_rejected(self):
+        with self.assertRaisesRegex(ValueError, "Missing required .*: childId, type"):
+            openapi.build_request(OPERATION, {"id": "1", "childId": ""}, {})
+
+    def test_unknown_parameters_are_rejected(self):
+        with self.assertRaisesRegex(ValueError, "Unknown query parameters .*: id"):
+            openapi.build_request(
+                OPERATION, {"id": "1", "childId": "2"}, {"type": "t", "id": "1"}
+            )
+
+
+class CallApiOperationTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        settings.init()
+        settings.methodWhitelist = ["get", "patch"]
+        openapi._operations = {
+            "patchManagedObject": openapi.Operation(
+                "patchManagedObject",
+                "patch",
+                "/inventory/managedObjects/{id}",
+                "",
+                (),
+                (openapi.Parameter("id", "path", True, "string", ""),),
+                (),
+            )
+        }
+        self.stand_in = PlatformStandIn().start()
+        self.stand_in.route(
+            "PATCH",
+            r"/inventory/managedObjects/(\d+)",
+            lambda request: {"id": request.match[1], **request.body},
+        )
+        server.c8y = CumulocityApi(
+            base_url=self.stand_in.base_url,
+            tenant_id="t0",
+            auth=HTTPBasicAuth("t0/test", "test"),
+        )
+
+    async def asyncTearDown(self):
+        server.c8y = None
+        self.stand_in.stop()
+        openapi._operations = None
+        settings.init()
+
+    async def test_patch_operations_are_sent(self):
+        result = await server.call_api_operation.fn(
+            "patchManagedObject", {"id": "42"}, body={"name": "Pump"}
+        )
+        self.assertEqual(json.loads(result), {"id": "42", "name": "Pump"})
+        self.assertEqual(self.stand_in.paths("PATCH"), ["/inventory/managedObjects/42"])
+
+    async def test_patch_errors_are_reported(self):
+        with self.assertRaisesRegex(ValueError, "Failed to call patchManagedObject"):
+            await server.call_api_operation.fn(
+                "patchManagedObject", {"id": "x"}, body={"name": "Pump"}
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+import asyncio
+import time
+import unittest
+
+from c8y_api import CumulocityApi
+from requests.auth import HTTPBasicAuth
+
+from mcp_server_c8y import operations, settings
+from mcp_server_c8y.timeseries import format_time, parse_time
+
+from .platform_standin import PlatformStandIn, Response
+
+
+class OperationWatchTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        settings.init()
+        settings.operations_poll_min = 0.05
+        settings.operations_poll_max = 0.2
+        operations._pollers.clear()
+        self.operations = {}
+        self.stand_in = PlatformStandIn().start()
+        self.stand_in.route("GET", r"/devicecontrol/operations/(\d+)", self.single)
+        self.stand_in.route("GET", "/devicecontrol/operations", self.collection)
+        self.c8y = CumulocityApi(
+            base_url=self.stand_in.base_url,
+            tenant_id="t0",
+            auth=HTTPBasicAuth("t0/test", "test"),
+        )
+
+    async def asyncTearDown(self):
+        self.stand_in.stop()
+        operations._pollers.clear()
+        settings.init()
+
+    def operation(self, operation_id, status, device_id="42", age=0.0):
+        self.operations[operation_id] = {
+            "id": operation_id,
+            "deviceId": device_id,
+            "status": status,
+            "creationTime": format_time(time.time() - age),
+        }
+
+    def single(self, request):
+        operation = self.operations.get(request.match[1])
+        return operation or Response({"error": "Not Found"}, 404)
+
+    def collection(self, request):
+        params = request.params
+        found = [
+            operation
+            for operation in self.operations.values()
+            if operation["deviceId"] == params.get("deviceId")
+            and params.get("status", operation["status"]) == operation["status"]
+            and parse_time(operation["creationTime"])
+            >= parse_time(params.get("dateFrom", "1970-01-01T00:00:00.000Z"))
+        ]
+        return {"operations": found}
+
+    def polls(self):
+        return [
+            r for r in self.stand_in.requests if r.path == "/devicecontrol/operations"
+        ]
+
+    async def test_watches_of_the_same_operation_share_the_polling(self):
+        self.operation("1", "EXECUTING")
+
+        async def finish():
+            await asyncio.sleep(0.2)
+            self.operation("1", "SUCCESSFUL")
+
+        results = await asyncio.gather(
+            operations.watch(self.c8y, ["1"], None, 2),
+            operations.watch(self.c8y, ["1"], None, 2),
+            finish(),
+        )
+        for transitions, current in results[:2]:
+            self.assertEqual(
+                [(t.id, t.previousStatus, t.status) for t in transitions],
+                [("1", "EXECUTING", "SUCCESSFUL")],
+            )
+            self.assertEqual(current[0].status, "SUCCESSFUL")
+        # The operation was fetched once, and polled once per interval for both
+        self.assertEqual(self.stand_in.paths().count("/devicecontrol/operations/1"), 1)
+        self.assertLessEqual(len(self.polls()), 4)
+        self.assertEqual(operations._pollers, {})
+
+    async def test_finished_operations_are_not_polled(self):
+        self.operation("1", "FAILED")
+        transitions, current = await operations.watch(self.c8y, ["1"], None, 2)
+        self.assertEqual(transitions, [])
+        self.assertEqual(current[0].status, "FAILED")
+        self.assertEqual(self.polls(), [])
+
+    async def test_polling_backs_off_while_nothing_changes(self):
+        self.operation("1", "PENDING")
+        await operations.watch(self.c8y, ["1"], None, 0.6)
+        # 0.05, 0.1, 0.2, 0.2 s apart instead of every 0.05 s
+        self.assertLessEqual(len(self.polls()), 5)
+        self.assertGreaterEqual(len(self.polls()), 3)
+
+    async def test_device_watches_report_new_operations_only(self):
+        self.operation("1", "SUCCESSFUL", age=3600)
+        self.operation("2", "PENDING", age=60)
+
+        async def create():
+            await asyncio.sleep(0.1)
+            self.operation("3", "PENDING")
+
+        (transitions, current), _ = await asyncio.gather(
+            operations.watch(self.c8y, [], "42", 2), create()
+        )
+        self.assertEqual(
+            [(t.id, t.previousStatus, t.status) for t in transitions],
+            [("3", None, "PENDING")],
+        )
+        self.assertEqual([o.id for o in current], ["2", "3"])
+
+    async def test_notifications_update_the_watches_right_away(self):
+        settings.operations_poll_min = 10
+        self.operation("1", "EXECUTING")
+
+        async def notify():
+            await asyncio.sleep(0.1)
+            operations.apply_notification({**self.operations["1"], "status": "FAILED"})
+
+        start = time.monotonic()
+        (transitions, _), _ = await asyncio.gather(
+            operations.watch(self.c8y, ["1"], None, 5), notify()
+        )
+        self.assertEqual(transitions[0].status, "FAILED")
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(self.polls(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
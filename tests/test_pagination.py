@@ -0,0 +1,90 @@
+import time
+import unittest
+
+from c8y_api import CumulocityApi
+from requests.auth import HTTPBasicAuth
+
+from mcp_server_c8y import server, settings
+from mcp_server_c8y.pagination import fetch_pages, query_params
+
+from .platform_standin import PlatformStandIn, Response, page_of
+from .test_events import event
+
+
+class QueryParamsTest(unittest.TestCase):
+    def test_unset_values_are_dropped(self):
+        self.assertEqual(
+            query_params(source="42", type=None, dateTo="", revert=True),
+            {"source": "42", "revert": "true"},
+        )
+
+
+class FetchPagesTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        settings.init()
+        self.events = [event(number) for number in range(1, 51)]
+        self.stand_in = PlatformStandIn().start()
+        self.stand_in.route("GET", "/event/events", self.answer)
+        server.c8y = CumulocityApi(
+            base_url=self.stand_in.base_url,
+            tenant_id="t0",
+            auth=HTTPBasicAuth("t0/test", "test"),
+        )
+
+    async def asyncTearDown(self):
+        server.c8y = None
+        self.stand_in.stop()
+
+    def answer(self, request):
+        # Later pages answer sooner
+        page = int(request.params.get("currentPage", 1))
+        return Response(
+            page_of(request, "events", self.events), delay=0.05 * (6 - page)
+        )
+
+    async def test_pages_are_fetched_concurrently_and_delivered_in_order(self):
+        settings.page_concurrency = 4
+        start = time.monotonic()
+        events = await fetch_pages(
+            server.c8y, "/event/events", "events", {}, page_size=10, pages=5
+        )
+        elapsed = time.monotonic() - start
+        self.assertEqual([e["id"] for e in events], [str(n) for n in range(1, 51)])
+        # The first page, then the other four at the same time
+        self.assertLess(elapsed, 0.25 + 0.2 + 0.15)
+        # The first page asks for the number of pages, which bounds the others
+        self.assertEqual(self.stand_in.requests[0].params["withTotalPages"], "true")
+
+    async def test_pages_beyond_max_rows_are_not_requested(self):
+        events = await fetch_pages(
+            server.c8y,
+            "/event/events",
+            "events",
+            {},
+            page_size=10,
+            pages=5,
+            max_rows=15,
+        )
+        self.assertEqual(len(events), 15)
+        self.assertEqual(len(self.stand_in.requests), 2)
+
+    async def test_all_pages_are_cut_off_at_the_row_limit(self):
+        settings.page_max_rows = 20
+        table = await server.get_events.fn(
+            None, "42", date_from="2026-01-01T00:00:00.000Z", all_pages=True
+        )
+        self.assertIn("Event 20\t", table)
+        self.assertNotIn("Event 21\t", table)
+        self.assertIn("[TRUNCATED: only the first 20 rows are shown", table)
+        self.assertEqual(self.stand_in.requests[0].params["pageSize"], "2000")
+
+        # No note if all rows fit
+        settings.page_max_rows = 50
+        table = await server.get_events.fn(
+            None, "42", date_from="2026-01-01T00:00:00.000Z", all_pages=True
+        )
+        self.assertNotIn("TRUNCATED", table)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import asyncio
+import unittest
+
+import httpx
+
+from mcp_server_c8y import realtime, settings
+from mcp_server_c8y.cache import get_cache
+
+from .cometd_standin import CometdStandIn
+
+
+class RealtimeSubscriberTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        settings.init()
+        self.stand_in = CometdStandIn(hold=0.2).start()
+        self.subscriber = realtime.RealtimeSubscriber(
+            self.stand_in.base_url, httpx.BasicAuth("t0/test", "test")
+        )
+
+    async def asyncTearDown(self):
+        await self.subscriber.stop()
+        self.stand_in.stop()
+
+    async def wait_for(self, condition, timeout: float = 5.0):
+        for _ in range(int(timeout / 0.05)):
+            if condition():
+                return
+            await asyncio.sleep(0.05)
+        self.fail("Condition not met in time")
+
+    async def test_subscribes_to_all_channels(self):
+        self.subscriber.start()
+        await self.wait_for(lambda: self.subscriber.client_id is not None)
+        self.assertEqual(self.stand_in.subscriptions, realtime.CHANNELS)
+
+    async def test_managed_object_notifications_update_the_cache(self):
+        inventory = get_cache("inventory")
+        self.subscriber.start()
+        await self.wait_for(lambda: self.subscriber.client_id is not None)
+
+        self.stand_in.publish(
+            "/managedobjects/42", "UPDATE", {"id": "42", "name": "Pump 42"}
+        )
+        await self.wait_for(lambda: inventory.get("42") is not None)
+        self.assertEqual(inventory.get("42")["name"], "Pump 42")
+
+        self.stand_in.publish("/managedobjects/42", "DELETE", "42")
+        await self.wait_for(lambda: inventory.get("42") is None)
+
+    async def test_rejected_connects_back_off(self):
+        self.stand_in.reject_connects = {"reconnect": "handshake", "interval": 500}
+        self.subscriber.start()
+        await asyncio.sleep(1.2)
+        # Without backing off, every rejected connect is followed by a new
+        # handshake right away
+        self.assertLessEqual(self.stand_in.handshakes, 2)
+        self.assertGreaterEqual(self.stand_in.handshakes, 1)
+        self.assertIsNone(self.subscriber.client_id)
+
+    async def test_connect_interval_advice_is_respected(self):
+        self.subscriber.start()
+        await self.wait_for(lambda: self.subscriber.client_id is not None)
+        self.stand_in.reject_connects = None
+        self.subscriber.interval = 0.5
+        connects = self.stand_in.connects
+        await asyncio.sleep(1.0)
+        # The stand-in holds connects for 0.2s, plus 0.5s between them
+        self.assertLessEqual(self.stand_in.connects - connects, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import time
+import unittest
+
+from c8y_api import CumulocityApi
+from requests.auth import HTTPBasicAuth
+
+from mcp_server_c8y import cache, governor, resilience, server, settings
+
+from .platform_standin import PlatformStandIn, Response
+
+
+def reset():
+    governor._governors.clear()
+    governor._adapters.clear()
+    resilience._breakers.clear()
+    resilience._latencies.clear()
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        settings.init()
+        settings.breaker_min_requests = 4
+        settings.breaker_window = 4
+        settings.breaker_open_seconds = 0.05
+        self.breaker = resilience.CircuitBreaker("GET /alarm/alarms")
+
+    def tearDown(self):
+        settings.init()
+
+    def test_opens_once_most_requests_failed(self):
+        for success in (True, False, False):
+            self.breaker.record(success)
+        self.assertEqual(self.breaker.state, "closed")
+        self.breaker.record(False)
+        self.assertEqual(self.breaker.state, "open")
+        with self.assertRaises(resilience.CircuitOpenError):
+            self.breaker.before_request()
+
+    def test_single_probe_decides_when_half_open(self):
+        for _ in range(4):
+            self.breaker.record(False)
+        time.sleep(0.06)
+        self.breaker.before_request()
+        self.assertEqual(self.breaker.state, "half-open")
+        # Only one probe at a time
+        with self.assertRaisesRegex(resilience.CircuitOpenError, "probed"):
+            self.breaker.before_request()
+        self.breaker.record(False)
+        self.assertEqual(self.breaker.state, "open")
+
+        time.sleep(0.06)
+        self.breaker.before_request()
+        self.breaker.record(True)
+        self.assertEqual(self.breaker.state, "closed")
+        self.breaker.before_request()
+
+    def test_abandoned_probe_lets_the_next_one_through(self):
+        for _ in range(4):
+            self.breaker.record(False)
+        time.sleep(0.06)
+        self.breaker.before_request()
+        self.breaker.abandon()
+        self.breaker.before_request()
+
+
+class HedgeDelayTest(unittest.TestCase):
+    def setUp(self):
+        settings.init()
+
+    def test_hedge_delay_follows_the_latency_percentile(self):
+        tracker = resilience.LatencyTracker()
+        for _ in range(tracker.MIN_SAMPLES - 1):
+            tracker.record(0.1)
+        self.assertIsNone(tracker.hedge_delay())
+        for seconds in [0.1] * 80 + [2.0] * 20:
+            tracker.record(seconds)
+        settings.hedge_percentile = 50
+        self.assertEqual(tracker.hedge_delay(), 0.1)
+        settings.hedge_percentile = 95
+        self.assertEqual(tracker.hedge_delay(), 2.0)
+        settings.hedge_min_delay = 3.0
+        self.assertEqual(tracker.hedge_delay(), 3.0)
+        settings.hedge_percentile = 0
+        self.assertIsNone(tracker.hedge_delay())
+
+
+class UnavailableEndpointTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        settings.init()
+        settings.breaker_min_requests = 2
+        settings.breaker_window = 2
+        settings.upstream_retries = 0
+        reset()
+        cache._caches.clear()
+        self.stand_in = PlatformStandIn().start()
+        self.stand_in.route(
+            "GET", "/inventory/managedObjects", lambda request: Response({}, 503)
+        )
+        server.c8y = CumulocityApi(
+            base_url=self.stand_in.base_url,
+            tenant_id="t0",
+            auth=HTTPBasicAuth("t0/test", "test"),
+        )
+        governor.install(server.c8y.session, "t0")
+
+    async def asyncTearDown(self):
+        server.c8y = None
+        self.stand_in.stop()
+        settings.init()
+        reset()
+        cache._caches.clear()
+
+    async def test_stale_entries_are_served_while_the_circuit_is_open(self):
+        inventory = cache.get_cache("inventory")
+        inventory.set("42", {"id": "42", "name": "Cached device"})
+        inventory.mark_stale()
+        settings.cache_max_stale = 0
+
+        # The failing batched lookups open the circuit of the collection
+        for _ in range(2):
+            with self.assertRaises(resilience.UNAVAILABLE_ERRORS):
+                await server.get_managed_object("43")
+        self.assertEqual(
+            resilience.open_circuits(),
+            {("t0", "GET /inventory/managedObjects"): "open"},
+        )
+        sent = len(self.stand_in.requests)
+
+        device = await server.get_managed_object("42")
+        self.assertEqual(device.name, "Cached device")
+        # The endpoint was not called while the circuit is open
+        self.assertEqual(len(self.stand_in.requests), sent)
+        self.assertIn("mcp_upstream_circuit_open", governor.render_metrics())
+
+
+if __name__ == "__main__":
+    unittest.main()
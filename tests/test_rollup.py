@@ -0,0 +1,73 @@
+import unittest
+from types import SimpleNamespace
+
+from mcp_server_c8y import rollup
+from mcp_server_c8y.rollup import FleetHealth, parse_group_by
+
+
+def device(device_id, status=None, type="c8y_Pump", owner="jane", **alarms):
+    fragments = {}
+    if status is not None:
+        fragments["c8y_Availability"] = SimpleNamespace(status=status)
+    if alarms:
+        fragments["c8y_ActiveAlarmsStatus"] = SimpleNamespace(**alarms)
+    return SimpleNamespace(
+        id=device_id, name=f"Device {device_id}", type=type, owner=owner, **fragments
+    )
+
+
+class FleetHealthTest(unittest.TestCase):
+    def test_group_keys(self):
+        self.assertEqual(parse_group_by("Owner, type"), ("owner", "type"))
+        with self.assertRaises(ValueError):
+            parse_group_by("severity")
+
+    def test_devices_are_counted_per_group(self):
+        health = FleetHealth(("type",))
+        health.add(
+            [
+                device("1", "AVAILABLE"),
+                device("2", "UNAVAILABLE", major=2, minor=1),
+                device("3", type="c8y_Valve", critical=1),
+            ]
+        )
+        pumps = health.groups[("c8y_Pump",)]
+        self.assertEqual(pumps.devices, 2)
+        self.assertEqual(pumps.availability, {"AVAILABLE": 1, "UNAVAILABLE": 1})
+        self.assertEqual(pumps.alarms, [0, 2, 1, 0])
+        self.assertEqual(pumps.alarming, 1)
+        self.assertEqual(health.groups[("c8y_Valve",)].availability, {"UNKNOWN": 1})
+        self.assertEqual(health.total, 3)
+
+    def test_worst_devices_come_first(self):
+        health = FleetHealth(("type",), top=3)
+        health.add(
+            [
+                device("1", "AVAILABLE"),
+                device("2", "UNAVAILABLE"),
+                device("3", "AVAILABLE", warning=9),
+                device("4", "AVAILABLE", major=1),
+                device("5", "AVAILABLE", critical=1),
+            ]
+        )
+        self.assertEqual(
+            [
+                row.split("\t")[0].strip()
+                for row in health.worst_table().split("\n")[1:]
+            ],
+            ["5", "4", "3"],
+        )
+
+    def test_groups_beyond_the_limit_are_counted_as_other(self):
+        health = FleetHealth(("type", "owner"), top=0)
+        health.add(
+            [device(str(i), type=f"type{i}") for i in range(rollup.MAX_GROUPS + 5)]
+        )
+        self.assertEqual(len(health.groups), rollup.MAX_GROUPS + 1)
+        self.assertEqual(health.groups[(rollup.OTHER, rollup.OTHER)].devices, 5)
+        # The other group is listed last
+        self.assertTrue(health.groups_table().split("\n")[-1].startswith("(other)"))
+
+
+if __name__ == "__main__":
+    unittest.main()
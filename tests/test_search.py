@@ -0,0 +1,38 @@
+import unittest
+
+from mcp_server_c8y import search
+
+
+def device(device_id: str, name: str):
+    return (device_id, name, "c8y_Pump", f"SN-{device_id}", "")
+
+
+class DeviceIndexTest(unittest.TestCase):
+    def test_finds_devices_despite_typos(self):
+        index = search.DeviceIndex(0)
+        index.add([device("1", "Pump-03"), device("2", "Valve 7")])
+        self.assertEqual(index.search("pmp3")[0][1], "1")
+
+    def test_removed_devices_give_back_their_size(self):
+        index = search.DeviceIndex(0)
+        index.add([device("1", "Pump-03")])
+        size = index.size
+        index.add([device("2", "Valve 7")])
+        index.remove("2")
+        self.assertLess(index.size, 2 * size)
+        self.assertEqual(index.search("valve"), [])
+
+    def test_removing_most_devices_compacts_the_index(self):
+        index = search.DeviceIndex(0)
+        index.add([device(str(i), f"Pump {i}") for i in range(3000)])
+        full = index.size
+        for i in range(2000):
+            index.remove(str(i))
+        self.assertEqual(len(index), 1000)
+        self.assertLess(len(index.documents), 3000)
+        self.assertLess(index.size, full / 2)
+        self.assertEqual(index.search("pump 2500")[0][1], "2500")
+
+
+if __name__ == "__main__":
+    unittest.main()
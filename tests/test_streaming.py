@@ -0,0 +1,108 @@
+import os
+import tempfile
+import time
+import unittest
+
+from c8y_api import CumulocityApi
+from requests.auth import HTTPBasicAuth
+
+from mcp_server_c8y import server, settings, timeseries
+from mcp_server_c8y.pagination import fetch_pages, query_params
+from mcp_server_c8y.streaming import MemoryBudget
+
+from .measurement_standin import MeasurementStandIn
+
+HOUR = 3600.0
+
+
+def window(hours: float):
+    now = time.time()
+    return timeseries.format_time(now - hours * HOUR), timeseries.format_time(now)
+
+
+class MemoryBudgetTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        os.environ["MCP_TIMESERIES_DIR"] = self.directory.name
+        settings.init()
+        timeseries._stores.clear()
+        # Measurements of 10 kB each, so a page of 2000 takes 20 MB
+        self.stand_in = MeasurementStandIn(padding=10_000).start()
+        server.c8y = CumulocityApi(
+            base_url=self.stand_in.base_url,
+            tenant_id="t0",
+            auth=HTTPBasicAuth("t0/test", "test"),
+        )
+
+    async def asyncTearDown(self):
+        server.c8y = None
+        self.stand_in.stop()
+        del os.environ["MCP_TIMESERIES_DIR"]
+        settings.init()
+        self.directory.cleanup()
+
+    async def test_oversized_page_is_truncated(self):
+        date_from, date_to = window(24)
+        budget = MemoryBudget(200_000)
+        rows = await fetch_pages(
+            server.c8y,
+            "/measurement/measurements",
+            "measurements",
+            query_params(source="42", dateFrom=date_from, dateTo=date_to),
+            page_size=2000,
+            pages=5,
+            budget=budget,
+        )
+        self.assertTrue(budget.exhausted)
+        self.assertGreater(len(rows), 0)
+        self.assertLess(len(rows), 20)
+        # Only the first page was requested
+        self.assertEqual(len(self.stand_in.requests), 1)
+
+    async def test_item_exceeding_the_budget_fails(self):
+        date_from, date_to = window(1)
+        with self.assertRaisesRegex(ValueError, "exceeds the memory budget"):
+            await fetch_pages(
+                server.c8y,
+                "/measurement/measurements",
+                "measurements",
+                query_params(source="42", dateFrom=date_from, dateTo=date_to),
+                page_size=100,
+                budget=MemoryBudget(5_000),
+            )
+
+    async def test_get_device_measurements_reports_truncation(self):
+        settings.request_memory_budget = 200_000
+        date_from, date_to = window(24)
+        table = await server.get_device_measurements.fn(
+            None, "42", date_from, date_to, page_size=2000
+        )
+        self.assertIn("[TRUNCATED: the result exceeded the memory budget", table)
+
+    async def test_stored_measurements_are_built_within_the_budget(self):
+        settings.timeseries_enabled = True
+        self.stand_in.padding = 0
+        date_from, date_to = window(6)
+        table = await server.get_device_measurements.fn(
+            None, "42", date_from, date_to, page_size=50
+        )
+        self.assertNotIn("[TRUNCATED", table)
+
+        # Served from the store, which only builds the rows fitting the budget
+        settings.request_memory_budget = 1_000
+        table = await server.get_device_measurements.fn(
+            None, "42", date_from, date_to, page_size=50
+        )
+        self.assertIn("[TRUNCATED: the result exceeded the memory budget", table)
+        budget = MemoryBudget(1_000)
+        start, end = timeseries.parse_time(date_from), timeseries.parse_time(date_to)
+        stored = await timeseries.measurements(
+            server.c8y, "42", start, end, limit=50, budget=budget
+        )
+        self.assertTrue(budget.exhausted)
+        self.assertLess(len(stored.rows), 50)
+        self.assertLessEqual(budget.used, 1_000)
+
+
+if __name__ == "__main__":
+    unittest.main()
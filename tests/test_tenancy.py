@@ -0,0 +1,117 @@
+import asyncio
+import base64
+import json
+import unittest
+
+from mcp_server_c8y import settings, tenancy
+
+
+def basic(username: str) -> str:
+    return "Basic " + base64.b64encode(f"{username}:secret".encode()).decode()
+
+
+def bearer(claims) -> str:
+    payload = base64.urlsafe_b64encode(json.dumps(claims).encode()).decode()
+    return f"Bearer e30.{payload.rstrip('=')}.signature"
+
+
+class TenantFromAuthorizationTest(unittest.TestCase):
+    def test_tenant_of_basic_credentials(self):
+        self.assertEqual(tenancy.tenant_from_authorization(basic("t42/jane")), "t42")
+        self.assertIsNone(tenancy.tenant_from_authorization(basic("jane")))
+        self.assertIsNone(tenancy.tenant_from_authorization(basic("/jane")))
+
+    def test_tenant_of_tokens(self):
+        self.assertEqual(
+            tenancy.tenant_from_authorization(bearer({"ten": "t42", "sub": "jane"})),
+            "t42",
+        )
+        self.assertIsNone(tenancy.tenant_from_authorization(bearer({"sub": "jane"})))
+        self.assertIsNone(tenancy.tenant_from_authorization(bearer(["t42"])))
+
+    def test_malformed_headers(self):
+        for authorization in (
+            None,
+            "",
+            "Basic !!!",
+            "Basic " + base64.b64encode(b"\xff/x:y").decode(),
+            "Bearer token-without-claims",
+            "Bearer e30.not-json.x",
+            "Digest t42/jane",
+        ):
+            with self.subTest(authorization=authorization):
+                self.assertIsNone(tenancy.tenant_from_authorization(authorization))
+
+    def test_scoped_names(self):
+        self.assertEqual(tenancy.scoped("inventory"), "inventory")
+        token = tenancy.current_tenant.set("t42")
+        try:
+            self.assertEqual(tenancy.scoped("inventory"), "inventory@t42")
+        finally:
+            tenancy.current_tenant.reset(token)
+
+
+class TenantSchedulerTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        settings.init()
+        self.admitted = []
+
+    async def admission_order(self, scheduler, calls):
+        """Tenants of the calls in the order they got the single slot."""
+        await scheduler.acquire("x")
+        tasks = []
+        for tenant in calls:
+            tasks.append(asyncio.ensure_future(self.call(scheduler, tenant)))
+            await asyncio.sleep(0)
+        scheduler.release("x")
+        await asyncio.gather(*tasks)
+        return self.admitted
+
+    async def call(self, scheduler, tenant):
+        await scheduler.acquire(tenant)
+        self.admitted.append(tenant)
+        await asyncio.sleep(0)
+        scheduler.release(tenant)
+
+    async def test_tenants_take_turns(self):
+        scheduler = tenancy.TenantScheduler(1, 10, 0)
+        order = await self.admission_order(scheduler, "aaaabb")
+        self.assertEqual("".join(order), "ababaa")
+
+    async def test_weights_share_the_slots(self):
+        scheduler = tenancy.TenantScheduler(1, 10, 0, {"b": 2.0})
+        order = await self.admission_order(scheduler, "aaaabbbb")
+        self.assertEqual("".join(order), "babbabaa")
+
+    async def test_tenant_concurrency_only_delays_the_tenant(self):
+        scheduler = tenancy.TenantScheduler(4, 1, 0)
+        await scheduler.acquire("a")
+        waiting = asyncio.ensure_future(scheduler.acquire("a"))
+        await asyncio.sleep(0)
+        self.assertFalse(waiting.done())
+        await asyncio.wait_for(scheduler.acquire("b"), 1)
+        scheduler.release("a")
+        await asyncio.wait_for(waiting, 1)
+
+    async def test_memory_quota_limits_the_calls(self):
+        settings.request_memory_budget = 8 * 1024 * 1024
+        scheduler = tenancy.TenantScheduler(10, 10, 20 * 1024 * 1024)
+        self.assertEqual(scheduler.limit("a"), 2)
+        settings.request_memory_budget = 0
+        self.assertEqual(scheduler.limit("a"), 10)
+
+    async def test_cancelled_calls_leave_the_queue(self):
+        scheduler = tenancy.TenantScheduler(1, 10, 0)
+        await scheduler.acquire("a")
+        waiting = asyncio.ensure_future(scheduler.acquire("b"))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiting
+        self.assertEqual(scheduler.tenants["b"].waiting, [])
+        scheduler.release("a")
+        self.assertEqual(scheduler.active, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
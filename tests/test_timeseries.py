@@ -0,0 +1,146 @@
+import os
+import tempfile
+import time
+import unittest
+
+from c8y_api import CumulocityApi
+from requests.auth import HTTPBasicAuth
+
+from mcp_server_c8y import server, settings, timeseries
+
+from .measurement_standin import MeasurementStandIn
+
+HOUR = 3600.0
+DAY = 24 * HOUR
+
+
+class SeriesStoreSyncTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        os.environ["MCP_TIMESERIES_DIR"] = self.directory.name
+        settings.init()
+        settings.timeseries_enabled = True
+        timeseries._stores.clear()
+        self.stand_in = MeasurementStandIn().start()
+        self.c8y = CumulocityApi(
+            base_url=self.stand_in.base_url,
+            tenant_id="t0",
+            auth=HTTPBasicAuth("t0/test", "test"),
+        )
+
+    async def asyncTearDown(self):
+        self.stand_in.stop()
+        del os.environ["MCP_TIMESERIES_DIR"]
+        settings.init()
+        self.directory.cleanup()
+
+    def fetched_from(self):
+        """Earliest dateFrom of the requests since the last call."""
+        requests, self.stand_in.requests = self.stand_in.requests, []
+        return min(timeseries.parse_time(r["dateFrom"]) for r in requests)
+
+    async def test_alternating_windows_are_not_refetched(self):
+        now = time.time()
+        recent = (now - 6 * HOUR, now)
+        older = (now - 48 * HOUR, now - 42 * HOUR)
+
+        await timeseries.sync(self.c8y, "42", *recent)
+        self.assertAlmostEqual(self.fetched_from(), recent[0], delta=1)
+        await timeseries.sync(self.c8y, "42", *older)
+        self.assertAlmostEqual(self.fetched_from(), older[0], delta=1)
+
+        # Only the newest measurements (with the overlap) are fetched again
+        held = await timeseries.sync(self.c8y, "42", recent[0], time.time())
+        self.assertGreater(self.fetched_from(), now - 2 * settings.timeseries_overlap)
+        self.assertAlmostEqual(held[0], recent[0], delta=1)
+        held = await timeseries.sync(self.c8y, "42", *older)
+        self.assertEqual(self.stand_in.requests, [])
+        self.assertEqual(held, older)
+
+        ranges = timeseries.get_store().load_meta("42")["ranges"]
+        self.assertEqual(len(ranges), 2)
+
+    async def test_window_spanning_synced_ranges_fetches_the_gaps_only(self):
+        now = time.time()
+        await timeseries.sync(self.c8y, "42", now - 2 * HOUR, now)
+        await timeseries.sync(self.c8y, "42", now - 10 * HOUR, now - 8 * HOUR)
+        self.stand_in.requests = []
+
+        held = await timeseries.sync(self.c8y, "42", now - 12 * HOUR, now)
+        self.assertEqual(held, (now - 12 * HOUR, now))
+        ranges = timeseries.get_store().load_meta("42")["ranges"]
+        self.assertEqual(len(ranges), 1)
+        # The gap before the older range and the one between both ranges
+        self.assertEqual(len(self.stand_in.requests), 2)
+
+        stored = await timeseries.measurements(self.c8y, "42", now - 12 * HOUR, now)
+        self.assertEqual(stored.covered_from, now - 12 * HOUR)
+        self.assertEqual(len(stored.rows), 12 * 60)
+
+    async def test_truncated_backfill_reports_the_covered_range(self):
+        settings.timeseries_max_pages = 1
+        now = time.time()
+        stored = await timeseries.measurements(
+            self.c8y, "42", now - 4 * DAY, now, limit=10
+        )
+        # One page of 2000 measurements, one per minute, newest first
+        self.assertAlmostEqual(stored.covered_from, now - 2000 * 60, delta=120)
+        self.assertEqual(len(stored.rows), 10)
+        self.assertGreater(timeseries.parse_time(stored.rows[0]["time"]), now - 60)
+
+        server.c8y = self.c8y
+        try:
+            table = await server.get_device_measurements.fn(
+                None,
+                "42",
+                timeseries.format_time(now - 4 * DAY),
+                timeseries.format_time(now),
+            )
+        finally:
+            server.c8y = None
+        # The second call extended the range by another page, still short of the start
+        self.assertIn("[TRUNCATED: the local store only holds", table)
+
+    async def test_window_without_its_end_in_the_store_is_fetched_directly(self):
+        now = time.time()
+        await timeseries.sync(self.c8y, "42", now - 6 * DAY, now - 5 * DAY)
+        # Extending the range forward stops after one page, short of the end
+        settings.timeseries_max_pages = 1
+        stored = await timeseries.measurements(self.c8y, "42", now - 6 * DAY, now)
+        self.assertIsNone(stored)
+
+        server.c8y = self.c8y
+        self.stand_in.requests = []
+        try:
+            table = await server.get_device_measurements.fn(
+                None,
+                "42",
+                timeseries.format_time(now - 6 * DAY),
+                timeseries.format_time(now),
+            )
+        finally:
+            server.c8y = None
+        self.assertNotIn("No measurements found", table)
+        self.assertNotIn("TRUNCATED", table)
+        self.assertEqual(self.stand_in.requests[-1]["revert"], "true")
+
+    @unittest.skipIf(timeseries.fcntl is None, "file locks not available")
+    async def test_device_lock_excludes_other_processes(self):
+        store = timeseries.get_store()
+        lock_file = store.lock("42")
+        try:
+            with open(lock_file.name, "w") as other:
+                with self.assertRaises(BlockingIOError):
+                    timeseries.fcntl.flock(
+                        other, timeseries.fcntl.LOCK_EX | timeseries.fcntl.LOCK_NB
+                    )
+        finally:
+            lock_file.close()
+        with open(lock_file.name, "w") as other:
+            timeseries.fcntl.flock(
+                other, timeseries.fcntl.LOCK_EX | timeseries.fcntl.LOCK_NB
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
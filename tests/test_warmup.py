@@ -0,0 +1,130 @@
+import asyncio
+import unittest
+
+from c8y_api import CumulocityApi
+from requests.auth import HTTPBasicAuth
+
+from mcp_server_c8y import app, cache, server, settings, warmup
+
+from .platform_standin import PlatformStandIn
+
+
+class WarmupTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        settings.init()
+        cache._caches.clear()
+        warmers = dict(warmup._warmers)
+        state = warmup.state
+        warmup.state = warmup.Warmup()
+
+        def restore():
+            warmup._warmers.clear()
+            warmup._warmers.update(warmers)
+            warmup.state = state
+
+        self.addCleanup(restore)
+
+    async def asyncTearDown(self):
+        cache._caches.clear()
+
+    async def test_no_warmers_by_default(self):
+        self.assertIsNone(warmup.start())
+        self.assertTrue(warmup.state.finished)
+
+    async def test_warmers_are_skipped_without_warm_up(self):
+        started = []
+
+        async def record():
+            started.append(True)
+            return ""
+
+        warmup._warmers["record"] = record
+        settings.warmers = ["record"]
+        async with app.background_services(warm_up=False):
+            await asyncio.sleep(0.01)
+        self.assertEqual(started, [])
+        async with app.background_services(warm_up=True):
+            await asyncio.sleep(0.01)
+        self.assertEqual(started, [True])
+
+    async def test_warmers_are_cancelled_after_the_budget(self):
+        async def done():
+            return "3 things"
+
+        async def failed():
+            raise ValueError("unavailable")
+
+        async def slow():
+            await asyncio.sleep(5)
+
+        warmup._warmers.update(done=done, failed=failed, slow=slow)
+        await warmup.run(["done", "failed", "slow", "missing"], budget=0.1)
+
+        self.assertTrue(warmup.state.finished)
+        warmers = warmup.state.report()["warmers"]
+        self.assertEqual(
+            {name: result["status"] for name, result in warmers.items()},
+            {
+                "done": "done",
+                "failed": "failed",
+                "slow": "cancelled",
+                "missing": "unknown",
+            },
+        )
+        self.assertEqual(warmers["done"]["detail"], "3 things")
+        self.assertEqual(warmers["failed"]["detail"], "unavailable")
+        self.assertIn(
+            'mcp_warmup_seconds{warmer="slow",status="cancelled"}',
+            warmup.render_metrics(),
+        )
+
+
+class HotDevicesTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        settings.init()
+        cache._caches.clear()
+        self.stand_in = PlatformStandIn().start()
+        self.stand_in.inventory(
+            {
+                device_id: {"id": device_id, "name": f"Pump {device_id}"}
+                for device_id in ("1", "2", "3")
+            }
+        )
+        # The warmers use the service credentials
+        server.service_call.set(True)
+        server.service_c8y = CumulocityApi(
+            base_url=self.stand_in.base_url,
+            tenant_id="t0",
+            auth=HTTPBasicAuth("t0/service", "test"),
+        )
+
+    async def asyncTearDown(self):
+        server.service_c8y = None
+        self.stand_in.stop()
+        cache._caches.clear()
+
+    async def test_listed_devices_are_preloaded(self):
+        settings.warmup_devices = "1, 3"
+        self.assertEqual(await warmup.warm_hot_devices(), "2 devices")
+        self.assertEqual(warmup.get_cache("inventory").get("3")["name"], "Pump 3")
+        self.assertIsNone(warmup.get_cache("inventory").get("2"))
+        # Both objects with one ids= query, then their supported measurements
+        self.assertEqual(
+            sorted(self.stand_in.paths()),
+            [
+                "/inventory/managedObjects",
+                "/inventory/managedObjects/1/supportedMeasurements",
+                "/inventory/managedObjects/3/supportedMeasurements",
+            ],
+        )
+
+    async def test_most_recently_updated_devices_are_preloaded(self):
+        settings.warmup_devices = "2"
+        self.assertEqual(await warmup.warm_hot_devices(), "2 devices")
+        request = self.stand_in.requests[0]
+        self.assertIn("$orderby=lastUpdated desc", request.params["query"])
+        self.assertEqual(request.params["pageSize"], "2")
+
+
+if __name__ == "__main__":
+    unittest.main()